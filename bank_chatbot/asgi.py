@@ -7,10 +7,45 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
+import gc
 import os
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bank_chatbot.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.LOAN_CATALOG_PRELOAD:
+    from chat.views import CATALOG_LOADER, SEMANTIC_FALLBACK, semantic_index  # noqa: E402
+
+    CATALOG_LOADER.preload()
+    if SEMANTIC_FALLBACK:
+        semantic_index(CATALOG_LOADER.get())
+    # Move everything loaded so far out of the GC's reach so collections in
+    # forked workers don't write to (and un-share) the preloaded pages.
+    gc.freeze()
+
+from chat.ollama import warm_model_in_background  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """The Django app, plus ASGI lifespan events (which Django doesn't handle).
+
+    Lifespan startup runs in each worker process (after the fork with
+    gunicorn --preload), so that is where the Ollama model is warmed, never
+    in the master.
+    """
+    if scope["type"] != "lifespan":
+        return await django_application(scope, receive, send)
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Load the model now so the first chat message doesn't pay for it.
+            warm_model_in_background()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
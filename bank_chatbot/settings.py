@@ -33,7 +33,8 @@ INSTALLED_APPS = [
 # ================= MIDDLEWARE =================
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise, async-capable so ASGI requests don't each hold a thread
+    'chat.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -92,9 +93,124 @@ USE_TZ = True
 # ================= STATIC FILES =================
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
-# Use WhiteNoise to serve static files efficiently in production
+# Use WhiteNoise to serve static files efficiently in production.
+# collectstatic writes content-hashed copies (chat/chat.3f2a….css) plus .gz
+# and, with Brotli installed, .br versions; WhiteNoise serves the best one the
+# browser accepts, with a ten-year "immutable" Cache-Control on hashed names
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# ================= LOAN CATALOG =================
+# CSV the chat app reads offers from; it is re-read automatically when it
+# changes, checked at most every LOAN_CATALOG_CHECK_INTERVAL seconds.
+LOAN_CATALOG_PATH = os.environ.get('LOAN_CATALOG_PATH', str(BASE_DIR / 'chat' / 'bank_loans.csv'))
+LOAN_CATALOG_CHECK_INTERVAL = float(os.environ.get('LOAN_CATALOG_CHECK_INTERVAL', '5'))
+# Compiled copy of the CSV written by `manage.py build_loan_catalog`; it is
+# memory-mapped instead of parsing the CSV while it matches the CSV's content.
+LOAN_CATALOG_SNAPSHOT = os.environ.get('LOAN_CATALOG_SNAPSHOT', str(BASE_DIR / 'chat' / 'bank_loans.catalog'))
+# Build the catalog when the ASGI/WSGI app loads. With `gunicorn --preload`
+# that happens once in the master and forked workers share it copy-on-write.
+LOAN_CATALOG_PRELOAD = os.environ.get('LOAN_CATALOG_PRELOAD', 'True').lower() in ('1', 'true', 'yes')
+
+# Largest applicant list accepted by /batch-match/ in one request, and the
+# largest request body in bytes (checked before the body is read)
+BATCH_MATCH_MAX_APPLICANTS = int(os.environ.get('BATCH_MATCH_MAX_APPLICANTS', '100000'))
+BATCH_MATCH_MAX_BYTES = int(os.environ.get('BATCH_MATCH_MAX_BYTES', str(20 * 1024 * 1024)))
+# Callers of /batch-match/ send this in an X-API-Key header; while it is
+# empty the endpoint rejects every request
+BATCH_MATCH_API_KEY = os.environ.get('BATCH_MATCH_API_KEY', '')
+# Same for /ollama-status/ and /metrics/ (give it to your Prometheus scraper)
+MONITORING_API_KEY = os.environ.get('MONITORING_API_KEY', '')
+
+# ================= CHAT CONTEXT =================
+# Seconds a conversation's details (salary, loan type, ...) are remembered
+# for follow-up messages, in a signed cookie; 0 disables
+CHAT_CONTEXT_TTL = int(os.environ.get('CHAT_CONTEXT_TTL', '1800'))
+
+# ================= OLLAMA =================
+OLLAMA_API_URL = os.environ.get('OLLAMA_API_URL', 'http://127.0.0.1:11434/api/generate')
+OLLAMA_MODEL = os.environ.get('OLLAMA_MODEL', 'tinyllama')
+# Max concurrent generations per worker; up to OLLAMA_MAX_QUEUE more wait (loan
+# questions first, small talk last) for OLLAMA_QUEUE_TIMEOUT seconds before
+# getting the static fallback reply
+OLLAMA_MAX_CONCURRENCY = int(os.environ.get('OLLAMA_MAX_CONCURRENCY', '2'))
+OLLAMA_MAX_QUEUE = int(os.environ.get('OLLAMA_MAX_QUEUE', '32'))
+OLLAMA_QUEUE_TIMEOUT = float(os.environ.get('OLLAMA_QUEUE_TIMEOUT', '5'))
+# Separate connect/read timeouts (seconds) and keep-alive pool size
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get('OLLAMA_CONNECT_TIMEOUT', '2'))
+OLLAMA_READ_TIMEOUT = float(os.environ.get('OLLAMA_READ_TIMEOUT', '30'))
+OLLAMA_POOL_SIZE = int(os.environ.get('OLLAMA_POOL_SIZE', '10'))
+# Circuit breaker: open after N consecutive failures, probe again after RESET seconds
+OLLAMA_BREAKER_THRESHOLD = int(os.environ.get('OLLAMA_BREAKER_THRESHOLD', '3'))
+OLLAMA_BREAKER_RESET = float(os.environ.get('OLLAMA_BREAKER_RESET', '30'))
+# Reply cache for repeated greetings/questions: 'local' (per worker), 'django'
+# (also shared through CACHES[OLLAMA_CACHE_ALIAS]) or 'none'
+OLLAMA_CACHE_BACKEND = os.environ.get('OLLAMA_CACHE_BACKEND', 'local')
+OLLAMA_CACHE_SIZE = int(os.environ.get('OLLAMA_CACHE_SIZE', '512'))
+OLLAMA_CACHE_TTL = int(os.environ.get('OLLAMA_CACHE_TTL', '3600'))
+OLLAMA_CACHE_ALIAS = os.environ.get('OLLAMA_CACHE_ALIAS', 'default')
+# Identical prompts in flight at the same time share one generation (across
+# workers too when OLLAMA_CACHE_BACKEND=django)
+OLLAMA_COALESCE = os.environ.get('OLLAMA_COALESCE', 'True').lower() in ('1', 'true', 'yes')
+# Keep the model loaded between requests (Ollama keep_alive, e.g. '30m' or
+# '-1' for ever) and re-prime it after OLLAMA_WARM_INTERVAL idle seconds (0
+# disables warming, including the warm-up at server start)
+OLLAMA_KEEP_ALIVE = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')
+OLLAMA_WARM_INTERVAL = float(os.environ.get('OLLAMA_WARM_INTERVAL', '240'))
+# Reuse the system prompt's token context instead of resending its text.
+# Opt-in: it sends raw prompts, which skip the model's chat template
+OLLAMA_REUSE_CONTEXT = os.environ.get('OLLAMA_REUSE_CONTEXT', 'False').lower() in ('1', 'true', 'yes')
+# Max reply tokens for greetings (other messages get 120)
+OLLAMA_GREETING_MAX_TOKENS = int(os.environ.get('OLLAMA_GREETING_MAX_TOKENS', '60'))
+
+# ================= SEMANTIC FALLBACK =================
+# Messages the keyword rules miss are matched against example questions and
+# the CSV's Purpose/Remarks text (chat/semantic.py) before going to Ollama.
+# A match needs a cosine score of SEMANTIC_THRESHOLD and a lead of
+# SEMANTIC_MARGIN over the nearest example with another answer
+SEMANTIC_FALLBACK = os.environ.get('SEMANTIC_FALLBACK', 'True').lower() in ('1', 'true', 'yes')
+SEMANTIC_THRESHOLD = float(os.environ.get('SEMANTIC_THRESHOLD', '0.4'))
+SEMANTIC_MARGIN = float(os.environ.get('SEMANTIC_MARGIN', '0.08'))
+
+# ================= QUERY LOG =================
+# Chat messages with their intent, salary, loan type, bank, latency and cache
+# hit are stored in ChatQueryLog. Rows are buffered in memory and written by a
+# background thread in batches of QUERY_LOG_BATCH_SIZE at least every
+# QUERY_LOG_FLUSH_INTERVAL seconds; `manage.py rollup_chat_queries` builds
+# hourly aggregates
+QUERY_LOG_ENABLED = os.environ.get('QUERY_LOG_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+QUERY_LOG_BATCH_SIZE = int(os.environ.get('QUERY_LOG_BATCH_SIZE', '200'))
+QUERY_LOG_FLUSH_INTERVAL = float(os.environ.get('QUERY_LOG_FLUSH_INTERVAL', '2'))
+QUERY_LOG_MAX_BUFFER = int(os.environ.get('QUERY_LOG_MAX_BUFFER', '10000'))
+
+# ================= LOGGING =================
+# Chat logs are written by a background thread (see chat/logs.py). INFO logs
+# one line per reply; DEBUG shows every pipeline step. CHAT_LOG_SAMPLE_RATE
+# keeps that fraction of requests' info/debug lines (warnings and errors are
+# always logged).
+CHAT_LOG_LEVEL = os.environ.get('CHAT_LOG_LEVEL', 'INFO').upper()
+CHAT_LOG_SAMPLE_RATE = float(os.environ.get('CHAT_LOG_SAMPLE_RATE', '1'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'sampled': {'()': 'chat.logs.SampledRequestFilter'},
+    },
+    'handlers': {
+        'chat_console': {
+            'class': 'chat.logs.BackgroundStreamHandler',
+            'filters': ['sampled'],
+        },
+    },
+    'loggers': {
+        'chat': {
+            'handlers': ['chat_console'],
+            'level': CHAT_LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
 # ================= DEFAULT PK =================
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
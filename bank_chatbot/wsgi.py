@@ -9,3 +9,14 @@ os.environ['DJANGO_SETTINGS_MODULE'] = 'bank_chatbot.settings'
 
 from django.core.wsgi import get_wsgi_application
 application = get_wsgi_application()
+
+from django.conf import settings
+if settings.LOAN_CATALOG_PRELOAD:
+    from chat.views import CATALOG_LOADER, SEMANTIC_FALLBACK, semantic_index
+    CATALOG_LOADER.preload()
+    if SEMANTIC_FALLBACK:
+        semantic_index(CATALOG_LOADER.get())
+if settings.OLLAMA_WARM_INTERVAL > 0:
+    # Not here: with --preload this is the gunicorn master.
+    from chat.ollama import warm_workers_after_fork
+    warm_workers_after_fork()
@@ -1,3 +1,18 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ChatQueryHourly, ChatQueryLog
+
+
+@admin.register(ChatQueryLog)
+class ChatQueryLogAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "route", "intent", "loan_type", "salary", "bank", "latency_ms", "cache_hit")
+    list_filter = ("intent", "loan_type", "route", "cache_hit")
+    search_fields = ("message", "bank")
+    date_hierarchy = "created_at"
+
+
+@admin.register(ChatQueryHourly)
+class ChatQueryHourlyAdmin(admin.ModelAdmin):
+    list_display = ("hour", "intent", "loan_type", "salary_band", "bank", "queries", "cache_hits", "avg_latency_ms")
+    list_filter = ("intent", "loan_type", "salary_band")
+    date_hierarchy = "hour"
@@ -0,0 +1,190 @@
+"""Admission control in front of Ollama.
+
+Ollama runs only a couple of generations at a time, and everything beyond
+that just queues inside it until the read timeout. ``AdmissionController``
+keeps that queue here, where it can be managed instead:
+
+- at most ``max_concurrency`` generations run at once (per worker, shared by
+  the blocking, streaming and async paths);
+- waiting requests are served by priority class (``PRIORITIES``), then in
+  arrival order;
+- at most ``max_queue`` requests wait. When the queue is full a newcomer
+  pushes out the lowest-priority waiter if it outranks it, otherwise it is
+  turned away;
+- a request that can't start within its budget is shed, so the caller can
+  answer with its static fallback. The controller keeps a moving average of
+  how long a generation holds a slot, and sheds at once when the queue ahead
+  clearly can't drain in time rather than waiting the whole budget first.
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import namedtuple
+from contextlib import asynccontextmanager, contextmanager
+
+# Lower is served first.
+PRIORITIES = {"loan": 0, "general": 1, "greeting": 2}
+DEFAULT_PRIORITY = "general"
+# Weight of the newest generation in the moving average of slot hold times.
+SERVICE_SMOOTHING = 0.2
+
+Admission = namedtuple("Admission", "admitted outcome waited")
+
+
+class _Waiter:
+    """One queued request; woken (under the controller lock) with its outcome."""
+
+    __slots__ = ("outcome", "_event", "_loop", "_future")
+
+    def __init__(self, loop=None):
+        self.outcome = None
+        self._loop = loop
+        if loop is None:
+            self._event = threading.Event()
+        else:
+            self._future = loop.create_future()
+
+    def wake(self, outcome):
+        self.outcome = outcome
+        if self._loop is None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(_resolve, self._future)
+
+    def wait(self, timeout):
+        self._event.wait(timeout)
+
+    async def await_(self, timeout):
+        try:
+            await asyncio.wait_for(asyncio.shield(self._future), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionController:
+    """Bounded priority queue with deadline shedding; see the module docstring."""
+
+    def __init__(self, max_concurrency=2, max_queue=32, timeout=5.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self.service_time = None
+        self._active = 0
+        self._queue = []  # heap of (rank, seq, waiter)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    # ---------- queue ----------
+    def _enter(self, priority, budget, loop=None):
+        """Admit now, shed now, or queue. Returns (outcome, waiter)."""
+        rank = PRIORITIES.get(priority, PRIORITIES[DEFAULT_PRIORITY])
+        with self._lock:
+            if self._active < self.max_concurrency and not self._queue:
+                self._active += 1
+                return "admitted", None
+            ahead = sum(1 for entry in self._queue if entry[0] <= rank)
+            if self.service_time is not None:
+                # Slots free up about every service_time / max_concurrency.
+                estimate = (ahead + 1) * self.service_time / self.max_concurrency
+                if estimate > budget:
+                    return "shed_estimate", None
+            if len(self._queue) >= self.max_queue:
+                worst = max(self._queue, default=None)
+                if worst is None or worst[0] <= rank:
+                    return "shed_full", None
+                self._queue.remove(worst)
+                heapq.heapify(self._queue)
+                worst[2].wake("shed_full")
+            waiter = _Waiter(loop)
+            heapq.heappush(self._queue, (rank, next(self._seq), waiter))
+            return None, waiter
+
+    def _give_up(self, waiter):
+        """Leave the queue after a timeout or cancellation; True if a slot was granted anyway."""
+        with self._lock:
+            if waiter.outcome is None:
+                self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+                heapq.heapify(self._queue)
+                waiter.outcome = "shed_timeout"
+                return False
+            return waiter.outcome == "queued"
+
+    def _release(self, held=None):
+        with self._lock:
+            if held is not None and self.service_time is None:
+                self.service_time = held
+            elif held is not None:
+                self.service_time += SERVICE_SMOOTHING * (held - self.service_time)
+            if self._queue:
+                # Hand the slot straight to the next waiter.
+                heapq.heappop(self._queue)[2].wake("queued")
+            else:
+                self._active -= 1
+
+    # ---------- public API ----------
+    def acquire(self, priority=DEFAULT_PRIORITY, budget=None):
+        """Block until a slot is free or the budget runs out; returns an ``Admission``."""
+        started = time.monotonic()
+        budget = self.timeout if budget is None else budget
+        outcome, waiter = self._enter(priority, budget)
+        if waiter is not None:
+            waiter.wait(budget)
+            outcome = "queued" if self._give_up(waiter) else waiter.outcome
+        return Admission(outcome in ("admitted", "queued"), outcome, time.monotonic() - started)
+
+    async def aacquire(self, priority=DEFAULT_PRIORITY, budget=None):
+        """``acquire`` that waits without blocking the event loop."""
+        started = time.monotonic()
+        budget = self.timeout if budget is None else budget
+        outcome, waiter = self._enter(priority, budget, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await waiter.await_(budget)
+            except asyncio.CancelledError:
+                if self._give_up(waiter):
+                    self._release()
+                raise
+            outcome = "queued" if self._give_up(waiter) else waiter.outcome
+        return Admission(outcome in ("admitted", "queued"), outcome, time.monotonic() - started)
+
+    @contextmanager
+    def slot(self, priority=DEFAULT_PRIORITY, budget=None):
+        """``with controller.slot("loan") as admission:`` - releases on exit if admitted."""
+        admission = self.acquire(priority, budget)
+        started = time.monotonic()
+        try:
+            yield admission
+        finally:
+            if admission.admitted:
+                self._release(time.monotonic() - started)
+
+    @asynccontextmanager
+    async def aslot(self, priority=DEFAULT_PRIORITY, budget=None):
+        admission = await self.aacquire(priority, budget)
+        started = time.monotonic()
+        try:
+            yield admission
+        finally:
+            if admission.admitted:
+                self._release(time.monotonic() - started)
+
+    def stats(self):
+        with self._lock:
+            waiting = {}
+            for rank, _, _ in self._queue:
+                waiting[rank] = waiting.get(rank, 0) + 1
+            return {
+                "active": self._active,
+                "max_concurrency": self.max_concurrency,
+                "waiting": {name: waiting.get(rank, 0) for name, rank in PRIORITIES.items()},
+                "max_queue": self.max_queue,
+                "timeout": self.timeout,
+                "service_time": round(self.service_time, 3) if self.service_time is not None else None,
+            }
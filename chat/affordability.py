@@ -0,0 +1,149 @@
+"""EMI, total-cost and affordability maths for loan offers.
+
+Every offer is evaluated for every tenure year up to the longest tenure in
+the catalog, in one NumPy pass over an offers x years grid, when the
+catalog is built. Per unit of principal the grid holds:
+
+- ``annuity``: the principal one rupee of monthly EMI repays,
+  ``(1 - (1 + r) ** -n) / r``;
+- ``cost``: the total repaid (all EMIs plus the processing fee).
+
+Offers are ranked by ``cost`` at a common comparison tenure, so a cheap
+rate with a heavy fee no longer beats a slightly higher all-in price.
+Affordability is the largest principal whose EMI stays within the offer's
+"EMI Percentage of Salary" at its longest tenure, capped by "Max Loan
+Amount".
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from .catalog import column_values
+
+RATE_COL = "Interest Rate (%)"
+TENURE_COL = "Tenure"
+FEE_COL = "Processing Fee (%)"
+MAX_LOAN_COL = "Max Loan Amount"
+EMI_PERCENT_COL = "EMI Percentage of Salary"
+
+# Offers are compared over this many years (clamped to each offer's range).
+COMPARISON_YEARS = 5
+# EMI cap used when an offer doesn't state one (a common FOIR limit).
+DEFAULT_EMI_PERCENT = 50.0
+
+_TENURE_RE = re.compile(r"(\d+(?:\.\d+)?)(?:\s*-\s*(\d+(?:\.\d+)?))?")
+
+Quote = namedtuple("Quote", "years emi total emi_percent max_years")
+Quote.__doc__ = "Figures for one offer per ₹1,00,000 borrowed over ``years``."
+
+PER_LAKH = 100000
+
+
+@lru_cache(maxsize=1024)
+def _parse_tenure(text):
+    match = _TENURE_RE.search(text)
+    if not match:
+        return None
+    low, high = sorted((int(float(match.group(1))), int(float(match.group(2) or match.group(1)))))
+    low = max(1, low)
+    return low, max(low, high)
+
+
+def parse_tenure(value):
+    """``"1-7"`` -> ``(1, 7)``, ``"20"`` -> ``(20, 20)``; None if unreadable."""
+    if value is None:
+        return None
+    # A catalog only has a handful of distinct tenure strings.
+    return _parse_tenure(str(value))
+
+
+def _column(records, name, default=np.nan):
+    # Columnar records (a mapped snapshot) hand numeric columns over as arrays.
+    numeric = getattr(records, "numeric_column", None)
+    values = numeric(name) if numeric is not None else None
+    if values is not None:
+        values[np.isnan(values)] = default
+        return values
+    cells = [np.nan if cell is None else cell for cell in column_values(records, name)]
+    try:
+        values = np.array(cells, dtype=np.float64)
+    except (TypeError, ValueError):
+        # Stray text in the column: convert cell by cell.
+        values = np.full(len(cells), np.nan)
+        for i, cell in enumerate(cells):
+            try:
+                values[i] = float(cell)
+            except (TypeError, ValueError):
+                pass
+    values[np.isnan(values)] = default
+    return values
+
+
+class OfferMath:
+    """Vectorised loan maths for a list of offer records (catalog rows)."""
+
+    def __init__(self, records, comparison_years=COMPARISON_YEARS):
+        count = len(records)
+        self.rate = _column(records, RATE_COL)
+        self.fee = _column(records, FEE_COL, 0.0) / 100.0
+        self.max_loan = _column(records, MAX_LOAN_COL, np.inf)
+        self.emi_percent = _column(records, EMI_PERCENT_COL, DEFAULT_EMI_PERCENT)
+
+        tenures = [parse_tenure(value) for value in column_values(records, TENURE_COL)]
+        self.min_years = np.array([t[0] if t else comparison_years for t in tenures], dtype=np.int64)
+        self.max_years = np.array([t[1] if t else comparison_years for t in tenures], dtype=np.int64)
+        horizon = int(self.max_years.max()) if count else 1
+
+        # offers x years grid, one column per tenure year
+        years = np.arange(1, horizon + 1)
+        months = 12.0 * years[None, :]
+        monthly = (self.rate / 1200.0)[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # (1 - (1 + r)^-n) / r, written with expm1/log1p so tiny rates
+            # stay accurate; zero-rate offers just repay principal / n.
+            annuity = np.where(monthly > 0, -np.expm1(-months * np.log1p(monthly)) / monthly, months)
+            annuity[np.isnan(self.rate)] = np.nan
+            self.annuity = annuity
+            self.cost = months / annuity + self.fee[:, None]
+
+        self.comparison_years = np.clip(comparison_years, self.min_years, self.max_years)
+        rows = np.arange(count)
+        comparison_cost = self.cost[rows, self.comparison_years - 1]
+        # Offers without a rate have no cost and rank last.
+        self.rank_cost = np.where(np.isnan(comparison_cost), np.inf, comparison_cost)
+        self._longest_annuity = self.annuity[rows, self.max_years - 1] if count else np.empty(0)
+
+    def __len__(self):
+        return len(self.rate)
+
+    def rank_key(self, offer_id):
+        """Total repaid per rupee at the comparison tenure (inf when unknown)."""
+        return float(self.rank_cost[offer_id])
+
+    def affordable(self, offer_ids, salaries):
+        """Largest principal each salary can borrow from each offer.
+
+        ``offer_ids`` and ``salaries`` broadcast against each other; the EMI
+        is capped at the offer's share of salary over its longest tenure.
+        """
+        ids = np.asarray(offer_ids)
+        emi_cap = np.asarray(salaries, dtype=np.float64) * self.emi_percent[ids] / 100.0
+        with np.errstate(invalid="ignore"):
+            principal = np.minimum(emi_cap * self._longest_annuity[ids], self.max_loan[ids])
+        return np.nan_to_num(principal, nan=0.0, posinf=0.0)
+
+    def quote(self, offer_id):
+        """``Quote`` for one offer at its comparison tenure, or None without a rate."""
+        years = int(self.comparison_years[offer_id])
+        total = self.cost[offer_id, years - 1]
+        if np.isnan(total):
+            return None
+        return Quote(
+            years=years,
+            emi=round(float(PER_LAKH / self.annuity[offer_id, years - 1])),
+            total=round(float(total * PER_LAKH)),
+            emi_percent=float(self.emi_percent[offer_id]),
+            max_years=int(self.max_years[offer_id]),
+        )
@@ -0,0 +1,362 @@
+"""Benchmark helpers: synthetic catalogs, message mixes, timing summaries,
+JSON reports and a stand-in Ollama server.
+
+Used by the ``benchmark_chat``, ``loadtest_chat`` and ``fake_ollama``
+management commands. A report is plain JSON with one entry per named case,
+so ``compare_reports`` can flag cases that got slower between two runs
+(e.g. the last release and this one).
+"""
+import json
+import platform
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .model_session import duration_seconds
+
+# ==================== SYNTHETIC CATALOG ====================
+BANKS = (
+    "ICICI", "HDFC", "SBI", "Axis", "Kotak", "PNB", "Bank of Baroda",
+    "Canara", "IDFC First", "Yes Bank", "IndusInd", "Union Bank",
+)
+# loan type -> (tenures, purpose), like the bundled CSV
+LOAN_TYPES = {
+    "Car": (("1-7", "1-5"), "Personal Vehicle"),
+    "Home": (("5-25", "5-20"), "Purchase / Construction"),
+    "Personal": (("1-5", "1-3"), "Any personal need"),
+}
+
+
+def synthetic_records(rows, seed=0):
+    """``rows`` catalog records with the bundled CSV's columns and value types."""
+    rng = random.Random(seed)
+    records = []
+    for _ in range(rows):
+        loan_type = rng.choice(tuple(LOAN_TYPES))
+        tenures, purpose = LOAN_TYPES[loan_type]
+        records.append({
+            "Bank": rng.choice(BANKS),
+            "Loan Type": loan_type,
+            "Interest Rate (%)": round(rng.uniform(7.5, 18.0), 2),
+            "Interest Type": rng.choice(("Fixed", "Floating")),
+            "Tenure": rng.choice(tenures),
+            "Processing Fee (%)": round(rng.uniform(0.0, 3.0), 2),
+            "Min Salary": rng.randrange(10000, 100001, 5000),
+            "Max Loan Amount": rng.randrange(100000, 10000001, 100000),
+            "Min Age": rng.choice((18, 21, 23, 25)),
+            "Max Age": rng.choice((55, 58, 60, 65, 70)),
+            "Employment Type": rng.choice(("Salaried", "Salaried/Self-employed", "Self-employed")),
+            "Credit Score Requirement": rng.choice((650, 680, 700, 720, 750)),
+            "Required Documents": "ID Proof; Address Proof; Salary Slip; Bank Statement",
+            "Eligibility": "Salaried; 1+ year stable employment",
+            "Collateral": "No",
+            "Prepayment Options": "Allowed after 6 months",
+            "Co-Applicant Allowed": rng.choice(("Yes", "No")),
+            "Purpose": purpose,
+            "EMI Percentage of Salary": rng.choice((40, 45, 50, 55)),
+            "Topup Loan Allowed": "No",
+            "Loan Sanction Time": "7-10 days",
+            "Remarks": "-",
+        })
+    return records
+
+
+class FixedLoader:
+    """Stands in for CatalogLoader so views answer from a given catalog."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def get(self):
+        return self.catalog
+
+    preload = get
+
+# ==================== MESSAGE MIX ====================
+GREETING_MESSAGES = ("hi", "hello", "hey", "good morning", "namaste", "hello!")
+GENERAL_MESSAGES = (
+    "what is a credit score",
+    "how does loan tenure work",
+    "what documents do banks usually ask for",
+    "fixed or floating interest, which is better",
+    "can I prepay my loan early",
+    "what is a processing fee",
+)
+DEFAULT_MIX = {"greeting": 0.2, "loan": 0.6, "general": 0.2}
+
+
+def loan_message(rng, salary=None):
+    salary = salary or rng.randrange(15000, 150001, 500)
+    loan = rng.choice(("car", "home", "personal"))
+    detail = rng.choice(("", f", I am {rng.randint(21, 60)}", f", cibil {rng.randrange(650, 850)}", ", salaried"))
+    return f"I earn {salary}, need {loan} loan{detail}"
+
+
+def message_for(kind, rng):
+    if kind == "greeting":
+        return rng.choice(GREETING_MESSAGES)
+    if kind == "loan":
+        return loan_message(rng)
+    return rng.choice(GENERAL_MESSAGES)
+
+
+def parse_mix(text):
+    """``"greeting=0.2,loan=0.6,general=0.2"`` -> weights dict."""
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in DEFAULT_MIX:
+            raise ValueError(f"unknown message kind {kind!r} (use {', '.join(DEFAULT_MIX)})")
+        mix[kind] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise ValueError("mix weights must add up to more than 0")
+    return mix
+
+# ==================== TIMING ====================
+def time_calls(fn, inputs):
+    """Seconds taken by ``fn(item)`` for each item."""
+    timings = []
+    for item in inputs:
+        start = time.perf_counter()
+        fn(item)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(name, seconds, **info):
+    """Report entry for one case: count, mean and percentiles in milliseconds."""
+    ordered = sorted(seconds)
+    count = len(ordered)
+
+    def percentile(p):
+        if not ordered:
+            return None
+        return round(ordered[min(count - 1, int(round(p / 100 * (count - 1))))] * 1000, 4)
+
+    total = sum(ordered)
+    return {
+        "name": name,
+        **info,
+        "count": count,
+        "mean_ms": round(total / count * 1000, 4) if count else None,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "min_ms": percentile(0),
+        "max_ms": percentile(100),
+        "per_second": round(count / total, 1) if total else None,
+    }
+
+# ==================== REPORTS ====================
+def build_report(suite, results, **settings):
+    return {
+        "suite": suite,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": settings,
+        "results": results,
+    }
+
+
+def write_report(report, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def load_report(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_reports(current, baseline, tolerance=0.15, metric="p50_ms"):
+    """Cases whose ``metric`` grew by more than ``tolerance`` (0.15 = 15%) over ``baseline``."""
+    before = {result["name"]: result for result in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        old = before.get(result["name"], {}).get(metric)
+        new = result.get(metric)
+        if not old or new is None:
+            continue
+        change = new / old - 1
+        if change > tolerance:
+            regressions.append({
+                "name": result["name"],
+                "metric": metric,
+                "baseline": old,
+                "current": new,
+                "change": round(change, 3),
+            })
+    return regressions
+
+
+def finish_report(command, report, options):
+    """Write ``report`` to --output and fail the command on regressions against --baseline."""
+    from django.core.management.base import CommandError
+
+    if options["output"]:
+        write_report(report, options["output"])
+        command.stdout.write(command.style.SUCCESS(f"✅ Wrote {options['output']}"))
+    if not options["baseline"]:
+        return
+    try:
+        baseline = load_report(options["baseline"])
+    except (OSError, ValueError) as e:
+        raise CommandError(f"Could not read baseline {options['baseline']}: {e}")
+    regressions = compare_reports(report, baseline, options["tolerance"])
+    for r in regressions:
+        command.stdout.write(command.style.WARNING(
+            f"⚠️ {r['name']}: {r['metric']} {r['baseline']} -> {r['current']} (+{r['change']:.0%})"
+        ))
+    if regressions:
+        raise CommandError(f"{len(regressions)} case(s) slower than {options['baseline']}")
+    command.stdout.write(command.style.SUCCESS(f"✅ No regressions against {options['baseline']}"))
+
+
+def add_report_arguments(parser):
+    parser.add_argument("--output", help="Write the JSON report here.")
+    parser.add_argument("--baseline", help="Earlier report to compare against.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.15,
+        help="Fail when a case's p50 is this much slower than the baseline (default: 0.15 = 15%%).",
+    )
+
+
+def format_results(results):
+    """Plain-text table of report entries for the terminal."""
+    lines = [f"{'case':<48} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'per sec':>10}"]
+    for r in results:
+        cells = [r.get(key) for key in ("p50_ms", "p95_ms", "p99_ms", "per_second")]
+        lines.append(f"{r['name']:<48} {r['count']:>7} " + " ".join(
+            f"{'-' if value is None else value:>10}" for value in cells
+        ))
+    return "\n".join(lines)
+
+# ==================== FAKE OLLAMA ====================
+FAKE_REPLY = (
+    "Hello! 👋 I'm happy to help you compare car, home and personal loans. "
+    "Tell me your monthly salary and the loan you need, and I'll find the "
+    "offers with the lowest total cost for you. 😊"
+)
+
+
+def make_fake_ollama(
+    host="127.0.0.1",
+    port=11434,
+    latency=0.2,
+    tokens_per_second=20.0,
+    max_tokens=60,
+    model="tinyllama",
+    load_seconds=0.0,
+):
+    """HTTP server speaking enough of Ollama's /api/generate for benchmarks.
+
+    Each generation waits ``latency`` seconds (prompt eval), then produces
+    up to ``max_tokens`` tokens (fewer if the request's ``num_predict`` is
+    lower) at ``tokens_per_second``, streamed as NDJSON or returned at once,
+    with Ollama's timing fields and a token ``context`` filled in. Like
+    Ollama, the model is unloaded once idle for longer than the last
+    request's ``keep_alive`` (5m by default); the next request then waits
+    ``load_seconds`` more for it to load.
+    """
+    words = FAKE_REPLY.split(" ")
+    state = {"loaded_until": None}
+    state_lock = threading.Lock()
+
+    def load_model(keep_alive):
+        """Seconds spent loading the model for this request."""
+        with state_lock:
+            now = time.monotonic()
+            cold = state["loaded_until"] is None or now > state["loaded_until"]
+            ttl = duration_seconds(keep_alive if keep_alive is not None else "5m")
+            state["loaded_until"] = float("inf") if ttl is None else now + ttl
+        if cold and load_seconds > 0:
+            time.sleep(load_seconds)
+            return load_seconds
+        return 0.0
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _write_chunk(self, payload):
+            data = json.dumps(payload).encode("utf-8") + b"\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._send_json(200, {"models": [{"name": model}]})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/api/generate":
+                self._send_json(404, {"error": "not found"})
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            limit = (request.get("options") or {}).get("num_predict") or max_tokens
+            count = max(1, min(max_tokens, limit))
+            tokens = [(" " if i else "") + words[i % len(words)] for i in range(count)]
+            per_token = 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0
+
+            started = time.perf_counter()
+            loading = load_model(request.get("keep_alive"))
+            time.sleep(latency)
+            prompt_tokens = len(str(request.get("prompt", "")).split())
+            context = list(request.get("context") or []) + list(range(prompt_tokens + count))
+            timings = {
+                "model": request.get("model", model),
+                "done": True,
+                "load_duration": int(loading * 1e9),
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(latency * 1e9),
+                "eval_count": count,
+                "context": context,
+            }
+
+            if request.get("stream", True):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                generating = time.perf_counter()
+                for token in tokens:
+                    time.sleep(per_token)
+                    self._write_chunk({"model": timings["model"], "response": token, "done": False})
+                now = time.perf_counter()
+                self._write_chunk({
+                    **timings, "response": "",
+                    "eval_duration": int((now - generating) * 1e9),
+                    "total_duration": int((now - started) * 1e9),
+                })
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                generating = time.perf_counter()
+                time.sleep(per_token * count)
+                now = time.perf_counter()
+                self._send_json(200, {
+                    **timings, "response": "".join(tokens),
+                    "eval_duration": int((now - generating) * 1e9),
+                    "total_duration": int((now - started) * 1e9),
+                })
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,174 @@
+"""Reply cache for Ollama generations.
+
+Greetings and common general questions repeat constantly, and each one
+costs a full TinyLlama generation. Replies are cached under the normalised
+message plus everything else that shapes the generation (model, options,
+system prompt). There are two layers: a bounded in-process LRU with TTL,
+and optionally a Django cache alias shared by all workers (set
+OLLAMA_CACHE_BACKEND=django and point CACHES at Redis/Memcached/a file
+cache; the default LocMemCache is per process).
+
+``SingleFlight`` lets identical concurrent generations share one call: the
+first caller leads, the rest wait on its future.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from django.core.cache import caches
+
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_message(text):
+    """Lowercase, drop punctuation/emoji and collapse whitespace: "Hi!!" -> "hi"."""
+    return " ".join(_NON_WORD_RE.sub(" ", text.lower()).split())
+
+
+class ResponseCache:
+    """LRU + TTL cache in front of an optional shared Django cache."""
+
+    def __init__(self, max_entries=512, ttl=3600, django_alias=None, prefix="ollama-reply"):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.django_alias = django_alias
+        self.prefix = prefix
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 or self.django_alias is not None
+
+    def key(self, message, *context):
+        """Stable key for a message generated under ``context`` (model, options, ...)."""
+        raw = json.dumps([normalize_message(message), *context], sort_keys=True, default=str)
+        return f"{self.prefix}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+    # ---------- local layer ----------
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _local_set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, value, shared=False):
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            elif shared:
+                self.shared_hits += 1
+            else:
+                self.hits += 1
+
+    # ---------- public API ----------
+    def get(self, key):
+        value = self._local_get(key)
+        if value is None and self.django_alias is not None:
+            value = caches[self.django_alias].get(key)
+            if value is not None:
+                self._local_set(key, value)
+                self._count(value, shared=True)
+                return value
+        self._count(value)
+        return value
+
+    def set(self, key, value):
+        self._local_set(key, value)
+        if self.django_alias is not None:
+            caches[self.django_alias].set(key, value, self.ttl)
+
+    async def aget(self, key):
+        value = self._local_get(key)
+        if value is None and self.django_alias is not None:
+            value = await caches[self.django_alias].aget(key)
+            if value is not None:
+                self._local_set(key, value)
+                self._count(value, shared=True)
+                return value
+        self._count(value)
+        return value
+
+    async def aset(self, key, value):
+        self._local_set(key, value)
+        if self.django_alias is not None:
+            await caches[self.django_alias].aset(key, value, self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "shared_backend": self.django_alias,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.shared_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+
+class SingleFlight:
+    """Deduplicate concurrent work by key within one process.
+
+    ``join(key)`` returns ``(future, True)`` to the first caller, which must
+    do the work and call ``finish``; later callers get ``(future, False)``
+    and wait on the same ``concurrent.futures.Future``. Threads wait with
+    ``future.result(timeout)`` and coroutines with
+    ``asyncio.wrap_future``, so both share one flight.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def join(self, key):
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self.followers += 1
+                return future, False
+            future = self._flights[key] = Future()
+            self.leaders += 1
+            return future, True
+
+    def finish(self, key, future, result):
+        """Publish the leader's ``result`` and let the next call for ``key`` start afresh."""
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+        if not future.done():
+            future.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._flights), "leaders": self.leaders, "followers": self.followers}
@@ -0,0 +1,559 @@
+"""Load-time loan catalog for the chat views.
+
+The CSV is normalised once when the catalog is built: column aliases are
+resolved, offers are grouped by loan type and ranked by total cost (EMIs
+plus processing fee, see ``affordability``), and each group keeps a sorted
+"Min Salary" index. Answering "best N offers of type T for salary S" is then
+a bisect plus a tuple lookup instead of a scan over the whole DataFrame.
+
+Age, credit score and employment type are indexed too. Each group stores
+its offers as bits of an int, in rank order. A sorted threshold column
+turns "offers whose minimum is <= x" into a bisect plus a precomputed
+prefix mask, and employment types map to masks directly. An applicant's
+eligible offers are then the AND of a few ints, and the lowest set bits
+are the best ones.
+
+``CatalogLoader`` watches the CSV and swaps in a freshly built catalog when
+the file changes, so rate updates don't need a worker restart.
+
+Loading stays light: the CSV is read with the ``csv`` module (pandas is
+never imported), NumPy is only imported once a catalog is built, and the
+first build happens on first use or at server start via ``preload()``.
+Management commands like ``migrate`` never pay for either. When a compiled
+snapshot from ``manage.py build_loan_catalog`` matches the CSV, it is
+memory-mapped instead of parsing the CSV (see ``snapshot``).
+"""
+import bisect
+import csv
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+from itertools import groupby
+
+logger = logging.getLogger(__name__)
+
+# ==================== COLUMN ALIASES ====================
+# Older exports of bank_loans.csv used underscore headers.
+COLUMN_ALIASES = {
+    "Loan_Type": "Loan Type",
+    "Interest_Rate": "Interest Rate (%)",
+    "Interest_Type": "Interest Type",
+    "Processing_Fee": "Processing Fee (%)",
+    "Min_Salary": "Min Salary",
+    "Max_Loan_Amount": "Max Loan Amount",
+    "Required_Documents": "Required Documents",
+    "Bank Name": "Bank",
+}
+
+LOAN_TYPE_COL = "Loan Type"
+RATE_COL = "Interest Rate (%)"
+MIN_SALARY_COL = "Min Salary"
+MIN_AGE_COL = "Min Age"
+MAX_AGE_COL = "Max Age"
+CREDIT_COL = "Credit Score Requirement"
+EMPLOYMENT_COL = "Employment Type"
+
+# JSON field -> catalog column for offers returned by the APIs.
+OFFER_FIELDS = (
+    ("bank", "Bank"),
+    ("interest_rate", "Interest Rate (%)"),
+    ("interest_type", "Interest Type"),
+    ("tenure", "Tenure"),
+    ("processing_fee", "Processing Fee (%)"),
+    ("max_loan_amount", "Max Loan Amount"),
+    ("min_salary", "Min Salary"),
+)
+
+# Size of the per-salary leaderboards kept for every loan type.
+LEADERBOARD_SIZE = 5
+
+# Cells pandas.read_csv treats as missing by default.
+NA_VALUES = frozenset([
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null",
+])
+_INT_RE = re.compile(r"\s*[+-]?\d+\s*\Z")
+_BOOLS = {"True": True, "TRUE": True, "true": True, "False": False, "FALSE": False, "false": False}
+
+
+def _to_number(value):
+    """Coerce a cell to float, or None when it is missing/non-numeric."""
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+_EMPLOYMENT_SPLIT_RE = re.compile(r"\s*(?:/|,|;|&|\bor\b)\s*")
+
+
+def normalize_employment(value):
+    """Canonical employment type: "salaried", "self-employed" or the lowercased text."""
+    text = str(value).strip().lower()
+    if "self" in text or "business" in text:
+        return "self-employed"
+    if "salar" in text:
+        return "salaried"
+    return text
+
+
+@lru_cache(maxsize=256)
+def employment_types(value):
+    """Set of canonical types in a cell like "Salaried/Self-employed" (empty = any)."""
+    if value is None:
+        return frozenset()
+    return frozenset(normalize_employment(part) for part in _EMPLOYMENT_SPLIT_RE.split(str(value)) if part.strip())
+
+
+_DOCUMENTS_SPLIT_RE = re.compile(r"[;,]")
+
+
+def split_documents(value):
+    """Items of a "Required Documents" cell ("ID Proof; Salary Slip" or comma separated)."""
+    if value is None:
+        return []
+    return [doc.strip() for doc in _DOCUMENTS_SPLIT_RE.split(str(value)) if doc.strip()]
+
+
+class _ThresholdIndex:
+    """Bitmask of offers whose threshold is <= a value: a bisect plus a lookup.
+
+    One mask per distinct threshold, so memory grows with offers x distinct
+    values (a handful of ages / credit cut-offs), not offers squared.
+    """
+
+    __slots__ = ("keys", "masks")
+
+    def __init__(self, thresholds):
+        by_key = sorted(range(len(thresholds)), key=thresholds.__getitem__)
+        # Bits are set in a bytearray and converted once per distinct key;
+        # OR-ing into a growing int per offer would be quadratic.
+        bits = bytearray((len(thresholds) + 7) // 8)
+        self.keys = []
+        self.masks = [0]
+        for key, positions in groupby(by_key, key=thresholds.__getitem__):
+            for pos in positions:
+                bits[pos >> 3] |= 1 << (pos & 7)
+            self.keys.append(key)
+            self.masks.append(int.from_bytes(bits, "little"))
+
+    def at_most(self, value):
+        return self.masks[bisect.bisect_right(self.keys, value)]
+
+
+def _bitmask(positions, size):
+    """Int with bit ``pos`` set for every position."""
+    bits = bytearray((size + 7) // 8)
+    for pos in positions:
+        bits[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _parse_float(cell):
+    if "_" in cell:  # float() takes "1_000", pandas doesn't
+        raise ValueError(cell)
+    return float(cell)
+
+
+def _infer_column(cells):
+    """Type one column's cells the way pandas.read_csv would.
+
+    All-integer columns become ints (floats if any cell is missing), numeric
+    ones floats, True/False ones bools, anything else stays text. Missing
+    cells are None. Keeping pandas' types keeps the rendered replies the same
+    ("12.0%", "₹1500000").
+    """
+    present = [cell for cell in cells if cell not in NA_VALUES]
+    if not present:
+        return [None] * len(cells)
+    if all(cell in _BOOLS for cell in present):
+        return [None if cell in NA_VALUES else _BOOLS[cell] for cell in cells]
+    if all(_INT_RE.match(cell) for cell in present):
+        convert = int if len(present) == len(cells) else float
+        return [None if cell in NA_VALUES else convert(int(cell)) for cell in cells]
+    try:
+        return [None if cell in NA_VALUES else _parse_float(cell) for cell in cells]
+    except ValueError:
+        return [None if cell in NA_VALUES else cell for cell in cells]
+
+
+def read_catalog_csv(path):
+    """Read a catalog CSV into (columns, records) without pandas."""
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        reader = csv.reader(fh)
+        header = next(reader, [])
+        rows = [row + [""] * (len(header) - len(row)) for row in reader if row]
+    columns = [COLUMN_ALIASES.get(name, name) for name in header]
+    typed = [_infer_column([row[i] for row in rows]) for i in range(len(columns))]
+    records = [
+        {col: values[r] for col, values in zip(columns, typed) if values[r] is not None}
+        for r in range(len(rows))
+    ]
+    return columns, records
+
+
+def offer_summary(record):
+    """The OFFER_FIELDS of one catalog row as a JSON-ready dict."""
+    return {key: record.get(column) for key, column in OFFER_FIELDS}
+
+
+def column_values(records, name):
+    """Every row's value for column ``name`` (None where missing).
+
+    Records may be a list of dicts or a columnar store (see ``snapshot``)
+    that can hand a column over without building row dicts.
+    """
+    values = getattr(records, "column_values", None)
+    if values is not None:
+        return values(name)
+    return [record.get(name) for record in records]
+
+
+def numeric_values(records, name):
+    """Column ``name`` as floats, None where missing or non-numeric."""
+    numeric = getattr(records, "numeric_column", None)
+    array = numeric(name) if numeric is not None else None
+    if array is not None:
+        return [None if value != value else value for value in array.tolist()]
+    return [_to_number(value) for value in column_values(records, name)]
+
+
+# ==================== LOAN GROUP ====================
+# A group's eligibility thresholds, one entry per offer in rank order, with
+# missing bounds already replaced by values that never exclude anyone
+# (except Min Salary, see LoanGroup). The bitset indexes and the batch
+# matcher (chat.matching) are both built from this.
+Thresholds = namedtuple("Thresholds", "min_salary min_age max_age min_credit employment")
+
+
+class LoanGroup:
+    """All offers of one loan type, ranked best-first by total cost."""
+
+    __slots__ = (
+        "rows", "thresholds", "salary_keys", "_rank_salaries", "_leaders",
+        "_all", "_salary", "_min_age", "_max_age", "_credit", "_employment", "_any_employment",
+    )
+
+    def __init__(self, rows, costs, rates, min_salaries, min_ages=None, max_ages=None,
+                 min_credits=None, employments=None):
+        # Rank by total cost, then rate; offers without a rate go last and
+        # ties keep CSV order.
+        order = sorted(
+            range(len(rows)),
+            key=lambda i: (rates[i] is None, costs[i], rates[i] or 0.0, i),
+        )
+        self.rows = tuple(rows[i] for i in order)
+        self._rank_salaries = [math.inf if min_salaries[i] is None else min_salaries[i] for i in order]
+
+        # Walk the offers cheapest-salary-first and snapshot the best ranks
+        # seen so far: _leaders[k] is the answer for any salary that clears
+        # exactly the first k thresholds.
+        by_salary = sorted(range(len(order)), key=self._rank_salaries.__getitem__)
+        self.salary_keys = [self._rank_salaries[pos] for pos in by_salary]
+        leaders = [()]
+        top = []
+        for pos in by_salary:
+            bisect.insort(top, pos)
+            del top[LEADERBOARD_SIZE:]
+            leaders.append(tuple(top))
+        self._leaders = leaders
+
+        # Eligibility bitsets: bit ``pos`` is the offer at rank ``pos``.
+        # Missing bounds never exclude anyone (except Min Salary, as above).
+        count = len(order)
+
+        def ranked(values, missing):
+            values = values or [None] * count
+            return [missing if values[i] is None else values[i] for i in order]
+
+        self.thresholds = Thresholds(
+            min_salary=self._rank_salaries,
+            min_age=ranked(min_ages, -math.inf),
+            max_age=ranked(max_ages, math.inf),
+            min_credit=ranked(min_credits, -math.inf),
+            employment=ranked(employments, frozenset()),
+        )
+        self._all = (1 << count) - 1
+        self._salary = _ThresholdIndex(self.thresholds.min_salary)
+        self._min_age = _ThresholdIndex(self.thresholds.min_age)
+        # max_age >= age  <=>  -max_age <= -age
+        self._max_age = _ThresholdIndex([-v for v in self.thresholds.max_age])
+        self._credit = _ThresholdIndex(self.thresholds.min_credit)
+        by_employment = {}
+        for pos, types in enumerate(self.thresholds.employment):
+            for kind in types or (None,):
+                by_employment.setdefault(kind, []).append(pos)
+        self._any_employment = _bitmask(by_employment.pop(None, ()), count)
+        self._employment = {kind: _bitmask(positions, count) for kind, positions in by_employment.items()}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def best(self, salary=None, limit=LEADERBOARD_SIZE):
+        """Return up to ``limit`` row ids, best first."""
+        if salary is None:
+            return self.rows[:limit]
+        if limit <= LEADERBOARD_SIZE:
+            eligible = bisect.bisect_right(self.salary_keys, salary)
+            return tuple(self.rows[pos] for pos in self._leaders[eligible][:limit])
+        # Rare wide queries fall back to a walk in rank order.
+        picked = [row for row, key in zip(self.rows, self._rank_salaries) if key <= salary]
+        return tuple(picked[:limit])
+
+    def eligible_mask(self, salary=None, age=None, credit_score=None, employment=None):
+        """Bitmask (bit = rank position) of offers the applicant qualifies for.
+
+        Criteria left as None don't filter.
+        """
+        mask = self._all
+        if salary is not None:
+            mask &= self._salary.at_most(salary)
+        if age is not None:
+            mask &= self._min_age.at_most(age) & self._max_age.at_most(-age)
+        if credit_score is not None:
+            mask &= self._credit.at_most(credit_score)
+        if employment is not None:
+            mask &= self._employment.get(normalize_employment(employment), 0) | self._any_employment
+        return mask
+
+    def eligible(self, salary=None, age=None, credit_score=None, employment=None, limit=LEADERBOARD_SIZE):
+        """Up to ``limit`` row ids the applicant qualifies for, best first."""
+        if age is None and credit_score is None and employment is None:
+            return self.best(salary, limit)
+        mask = self.eligible_mask(salary, age, credit_score, employment)
+        picked = []
+        while mask and len(picked) < limit:
+            low = mask & -mask
+            picked.append(self.rows[low.bit_length() - 1])
+            mask ^= low
+        return tuple(picked)
+
+
+# ==================== CATALOG ====================
+class LoanCatalog:
+    """Immutable, pre-indexed view of bank_loans.csv."""
+
+    def __init__(self, columns, records, version=""):
+        self.columns = list(columns)
+        self.version = version
+        self._records = records
+        # Rendered reply fragments keyed by the caller; lives and dies with
+        # this snapshot, so a reload invalidates it for free.
+        self.render_cache = {}
+        self._groups = {}
+        # EMI / cost / affordability figures for every row and tenure year.
+        # Imported here so NumPy only loads once a catalog is actually built.
+        from .affordability import OfferMath
+        self.terms = OfferMath(records)
+
+        if LOAN_TYPE_COL not in self.columns:
+            return
+
+        grouped = {}
+        for row_id, loan_type in enumerate(column_values(records, LOAN_TYPE_COL)):
+            if loan_type is None:
+                continue
+            grouped.setdefault(str(loan_type).strip().lower(), []).append(row_id)
+
+        numbers = {
+            name: numeric_values(records, name)
+            for name in (RATE_COL, MIN_SALARY_COL, MIN_AGE_COL, MAX_AGE_COL, CREDIT_COL)
+        }
+        employment = column_values(records, EMPLOYMENT_COL)
+
+        def column(rows, name):
+            values = numbers[name]
+            return [values[r] for r in rows]
+
+        for key, rows in grouped.items():
+            self._groups[key] = LoanGroup(
+                rows,
+                costs=[self.terms.rank_key(r) for r in rows],
+                rates=column(rows, RATE_COL),
+                min_salaries=column(rows, MIN_SALARY_COL),
+                min_ages=column(rows, MIN_AGE_COL),
+                max_ages=column(rows, MAX_AGE_COL),
+                min_credits=column(rows, CREDIT_COL),
+                employments=[employment_types(employment[r]) for r in rows],
+            )
+
+    @classmethod
+    def from_csv(cls, path, version=""):
+        columns, records = read_catalog_csv(path)
+        return cls(columns, records, version)
+
+    @classmethod
+    def from_snapshot(cls, path):
+        """Catalog over a memory-mapped ``build_loan_catalog`` snapshot."""
+        from .snapshot import SnapshotRecords
+        records = SnapshotRecords(path)
+        return cls(records.columns, records, records.source_digest)
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def empty(self):
+        return not self._records
+
+    def has_column(self, name):
+        return name in self.columns
+
+    def row(self, row_id):
+        """Return the offer as a dict of canonical column -> value (missing cells omitted)."""
+        return self._records[row_id]
+
+    def loan_types(self):
+        """Lowercased loan types present in the catalog."""
+        return list(self._groups)
+
+    def ranked_rows(self, loan_type):
+        """Row ids of every ``loan_type`` offer, best first."""
+        group = self._groups.get(loan_type.lower())
+        return group.rows if group else ()
+
+    def thresholds(self, loan_type):
+        """``Thresholds`` of every ``loan_type`` offer, in ``ranked_rows`` order (None if unknown)."""
+        group = self._groups.get(loan_type.lower())
+        return group.thresholds if group else None
+
+    def count(self, loan_type):
+        group = self._groups.get(loan_type.lower())
+        return len(group) if group else 0
+
+    def best_offer_ids(self, loan_type, salary=None, limit=LEADERBOARD_SIZE, age=None,
+                       credit_score=None, employment=None):
+        """Row ids of the best ``limit`` offers of ``loan_type`` the applicant qualifies for.
+
+        ``age``, ``credit_score`` and ``employment`` filter on "Min Age" /
+        "Max Age", "Credit Score Requirement" and "Employment Type" when given.
+        """
+        group = self._groups.get(loan_type.lower())
+        if group is None:
+            return ()
+        return group.eligible(salary, age, credit_score, employment, limit)
+
+    def best_offers(self, loan_type, salary=None, limit=LEADERBOARD_SIZE, **criteria):
+        """Best ``limit`` offers of ``loan_type`` the applicant qualifies for, best first."""
+        return [self._records[row_id] for row_id in self.best_offer_ids(loan_type, salary, limit, **criteria)]
+
+
+# ==================== HOT RELOAD ====================
+def _file_signature(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _file_digest(path):
+    with open(path, "rb") as fh:
+        return hashlib.sha1(fh.read()).hexdigest()
+
+
+class CatalogLoader:
+    """Serve the current catalog snapshot and rebuild it when the file changes.
+
+    Nothing is read until the first ``get()`` or ``preload()``. After that
+    ``get()`` costs an ``os.stat`` at most once every ``check_interval``
+    seconds. When the (mtime, size) signature moves, a daemon thread hashes
+    the file and, if the content really changed, builds a new catalog and
+    swaps the reference. Callers should grab the snapshot once per request
+    and use it throughout so they see a consistent catalog.
+    """
+
+    def __init__(self, path, check_interval=5.0, snapshot_path=None):
+        self.path = path
+        self.check_interval = check_interval
+        self.snapshot_path = snapshot_path
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._next_check = 0.0
+        self._signature = None
+        self._catalog = None
+        self._load_lock = threading.Lock()
+
+    def preload(self):
+        """Build the first snapshot now (e.g. in the gunicorn master before forking)."""
+        with self._load_lock:
+            if self._catalog is None:
+                self.reload()
+                self._next_check = time.monotonic() + self.check_interval
+        return self._catalog
+
+    def get(self):
+        if self._catalog is None:
+            return self.preload()
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self._maybe_rebuild()
+        return self._catalog
+
+    def reload(self):
+        """Rebuild synchronously (used at startup and by the watcher thread)."""
+        try:
+            signature = _file_signature(self.path)
+            digest = _file_digest(self.path)
+            if self._catalog is not None and digest == self._catalog.version:
+                self._signature = signature
+                return self._catalog
+            catalog, source = self._build(digest)
+        except Exception as e:
+            # Keep serving the previous snapshot; a half-written file will
+            # change signature again once the writer finishes.
+            logger.error("❌ Catalog reload failed for %s: %s", self.path, e)
+            try:
+                self._signature = _file_signature(self.path)
+            except OSError:
+                pass
+            if self._catalog is None:
+                self._catalog = LoanCatalog([], [])
+            return self._catalog
+
+        self._catalog = catalog
+        self._signature = signature
+        logger.info("✅ Loaded %d bank records%s", len(catalog), source)
+        logger.debug("✅ Columns: %s", catalog.columns)
+        return catalog
+
+    def _build(self, digest):
+        """Map the compiled snapshot if it was built from this CSV, else parse the CSV."""
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            from .snapshot import snapshot_digest
+            try:
+                if snapshot_digest(self.snapshot_path) == digest:
+                    catalog = LoanCatalog.from_snapshot(self.snapshot_path)
+                    return catalog, f" (mapped from {os.path.basename(self.snapshot_path)})"
+                logger.warning("⚠️ %s is out of date, reading the CSV. Run manage.py build_loan_catalog.", self.snapshot_path)
+            except Exception as e:
+                logger.error("❌ Catalog snapshot %s unreadable: %s", self.snapshot_path, e)
+        return LoanCatalog.from_csv(self.path, version=digest), ""
+
+    def _maybe_rebuild(self):
+        try:
+            signature = _file_signature(self.path)
+        except OSError:
+            return
+        if signature == self._signature:
+            return
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild, name="loan-catalog-reload", daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            self.reload()
+        finally:
+            with self._lock:
+                self._rebuilding = False
@@ -0,0 +1,127 @@
+"""Conversation context, so follow-up messages build on earlier ones.
+
+"I earn 40000" followed by "what about home loan?" should answer the second
+message with the salary from the first instead of falling through to
+Ollama. Each reply stores what the user has told us so far (salary, loan
+type, age, credit score, employment) plus the offer ids of the last answer.
+A follow-up that carries any loan detail is completed from it, and when it
+repeats the previous query against the same catalog the cached offers are
+reused without querying the catalog again. Age, credit score and employment
+only carry over to follow-ups: a message with a new salary or loan type
+starts a fresh query, and the applicant details told for the old one are
+dropped.
+
+The context is a compact signed cookie. There is no database write per
+message and no shared store, it works on the async path and across
+workers, and it expires after CHAT_CONTEXT_TTL seconds of inactivity.
+"""
+import json
+
+from django.conf import settings
+from django.core import signing
+
+COOKIE_NAME = "chat_ctx"
+SALT = "chat.context"
+FIELDS = ("salary", "loan_type", "age", "credit_score", "employment")
+# Details about the applicant rather than the query; see _is_new_query.
+APPLICANT_FIELDS = ("age", "credit_score", "employment")
+# Enough of the catalog digest to notice a reload.
+VERSION_CHARS = 12
+
+
+def context_ttl():
+    return getattr(settings, "CHAT_CONTEXT_TTL", 1800)
+
+
+def load_context(request):
+    """The conversation so far for this visitor ({} when new, expired or disabled)."""
+    ttl = context_ttl()
+    if ttl <= 0:
+        return {}
+    try:
+        raw = request.get_signed_cookie(COOKIE_NAME, default=None, salt=SALT, max_age=ttl)
+        context = json.loads(raw) if raw else {}
+    except (signing.BadSignature, ValueError):
+        return {}
+    return context if isinstance(context, dict) else {}
+
+
+def save_context(response, context):
+    """Store ``context`` on ``response`` (refreshing its expiry)."""
+    ttl = context_ttl()
+    if ttl <= 0 or not context:
+        return response
+    response.set_signed_cookie(
+        COOKIE_NAME,
+        json.dumps(context, separators=(",", ":")),
+        salt=SALT,
+        max_age=ttl,
+        httponly=True,
+        samesite="Lax",
+        secure=getattr(settings, "SESSION_COOKIE_SECURE", False),
+    )
+    return response
+
+
+def _carries_loan_details(parsed):
+    return (
+        parsed.is_loan_query
+        or parsed.wants_compare
+        or any(getattr(parsed, field) is not None for field in FIELDS)
+    )
+
+
+def _is_new_query(parsed, context):
+    """Whether ``parsed`` states a salary or loan type other than the remembered one."""
+    return any(
+        getattr(parsed, field) is not None and getattr(parsed, field) != context.get(field)
+        for field in ("salary", "loan_type")
+    )
+
+
+def apply_context(parsed, context):
+    """Complete a classified follow-up with details from earlier messages.
+
+    Returns ``parsed`` unchanged for greetings, first messages and messages
+    with no loan details (general questions still go to Ollama). Otherwise
+    missing fields come from ``context``, and once salary and loan type are
+    both known the message is answered as a loan query. A new query (see
+    ``_is_new_query``) takes only the salary or loan type from ``context``.
+    """
+    if not context or parsed.intent == "greeting" or not _carries_loan_details(parsed):
+        return parsed
+    carried = FIELDS
+    if _is_new_query(parsed, context):
+        carried = tuple(field for field in FIELDS if field not in APPLICANT_FIELDS)
+    merged = {field: getattr(parsed, field) for field in FIELDS}
+    for field in carried:
+        if merged[field] is None:
+            merged[field] = context.get(field)
+    intent = parsed.intent
+    if merged["salary"] is not None and merged["loan_type"] and intent == "general":
+        intent = "loan"
+    return parsed._replace(intent=intent, is_loan_query=parsed.is_loan_query or intent == "loan", **merged)
+
+
+def remember(context, parsed):
+    """Record the details in ``parsed`` (already merged with ``context``)."""
+    if _is_new_query(parsed, context):
+        for field in APPLICANT_FIELDS:
+            context.pop(field, None)
+    for field in FIELDS:
+        value = getattr(parsed, field)
+        if value is not None:
+            context[field] = value
+    return context
+
+
+def cached_offers(context, query, version):
+    """Offer ids of the last answer if it was for ``query`` on this catalog version."""
+    last = context.get("last") if context else None
+    if not last or last.get("query") != list(query) or last.get("version") != version[:VERSION_CHARS]:
+        return None
+    return tuple(last.get("offers", ()))
+
+
+def remember_offers(context, query, version, offer_ids):
+    context["last"] = {"query": list(query), "version": version[:VERSION_CHARS], "offers": list(offer_ids)}
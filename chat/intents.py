@@ -0,0 +1,249 @@
+"""Single-pass intent classification for chat messages.
+
+``classify`` lowercases the message once, finds every vocabulary keyword in
+one regex scan and returns intent, salary, loan type and any applicant
+details (age, credit score, employment type) together. All
+keywords live in ``KEYWORDS``, so the vocabulary can grow without adding
+scans per request.
+
+Matching keeps the substring semantics of the original checks ("car"
+matches inside "scary"). The keywords are compiled into one prefix-factored
+(trie-shaped) regex, so most positions fail on their first character. Each
+keyword carries the categories of every keyword contained in it. A keyword
+can also start inside a match and run past its end. Those joined strings
+are precomputed per keyword and checked with a plain substring test.
+Together this finds every occurrence, including overlapping ones, like an
+Aho-Corasick automaton, in one ``findall`` pass.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# ==================== VOCABULARY ====================
+# category -> keywords (matched as lowercase substrings)
+KEYWORDS = {
+    # is_loan_query: the message is about borrowing
+    "loan": ("loan", "emi", "borrow", "finance", "need buy", "want buy"),
+    # is_loan_query: mentions a loan product
+    "product": ("car", "home", "personal", "vehicle", "house"),
+    # is_loan_query: talks about income without a figure
+    "income": ("salary", "earn", "income"),
+    # is_greeting: any of these means it's not just small talk
+    "not_greeting": ("loan", "emi", "borrow", "salary", "earn", "need"),
+    # detect_loan_type, checked in this order
+    "car": ("car", "vehicle", "auto", "buy car"),
+    "home": ("home", "house", "property", "housing"),
+    "personal": ("personal",),
+    # "compare all banks" style requests
+    "compare": ("all banks", "compare"),
+    # employment type, for the eligibility filters
+    "self_employed": ("self employed", "self-employed", "business", "freelance"),
+    "salaried": ("salaried", "employee", "job"),
+}
+
+LOAN_TYPE_CATEGORIES = (("car", "Car"), ("home", "Home"), ("personal", "Personal"))
+EMPLOYMENT_CATEGORIES = (("self_employed", "self-employed"), ("salaried", "salaried"))
+
+GREETINGS = frozenset([
+    'hi', 'hello', 'hey', 'good morning', 'good afternoon',
+    'good evening', 'namaste', 'hola', 'sup', 'yo', 'hii', 'helloo',
+])
+LOAN_CATEGORIES = frozenset(["loan", "product"])
+# Any loan vocabulary, even in a question with no figures ("what is an EMI?")
+LOAN_TOPIC_CATEGORIES = frozenset(["loan", "product", "income", "compare"])
+
+# Tried in order; the first pattern that matches wins.
+SALARY_PATTERNS = tuple(re.compile(p) for p in (
+    r'earning\s+(\d+)',
+    r'earn[s]?\s+(?:rs\.?|₹)?\s*(\d+)',
+    r'salary[:\s]*(?:rs\.?|₹)?\s*(\d+)',
+    r'(\d{5,6})\s*(?:per\s+month|monthly|salary)?',
+))
+AGE_PATTERNS = tuple(re.compile(p) for p in (
+    r'\bage[d]?\s*(?:is|of|:)?\s*(\d{2})\b',
+    r'\b(\d{2})\s*(?:years?|yrs?)\s*old\b',
+    r"\b(?:i am|i'm|im)\s+(\d{2})\b(?!\s*(?:k\b|%|lakh|thousand))",
+))
+CREDIT_PATTERNS = tuple(re.compile(p) for p in (
+    r'(?:credit|cibil)(?:\s*score)?\s*(?:is|of|:)?\s*(\d{3})\b',
+    r'\b(\d{3})\s*(?:credit|cibil)',
+))
+# Plausible ranges; anything else is some other number.
+AGE_RANGE = (18, 100)
+CREDIT_RANGE = (300, 900)
+
+
+def _build_scanner(keywords):
+    categories = {}
+    for category, words in keywords.items():
+        for word in words:
+            categories.setdefault(word, set()).add(category)
+    # A match on "need buy" is also a match on every keyword inside it.
+    closed = {
+        word: frozenset().union(*(cats for other, cats in categories.items() if other in word))
+        for word in categories
+    }
+    # A keyword can start inside another and run past its end: "loan" then
+    # "need" in "loaneed". The scan resumes after "loan" and misses it, so
+    # each keyword lists those joined strings to test with a plain `in`.
+    spills = {
+        word: tuple(
+            (word[:offset] + other, closed[other])
+            for offset in range(1, len(word))
+            for other in categories
+            if other.startswith(word[offset:]) and len(other) > len(word) - offset
+        )
+        for word in categories
+    }
+    return re.compile(_trie_pattern(categories)), closed, spills
+
+
+def _trie_pattern(words):
+    """Prefix-factored alternation, longest match first: car|card -> car(?:d)?"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def render(node):
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return f"(?:{body})?"
+        return body
+
+    return render(trie)
+
+
+_SCANNER, _WORD_CATEGORIES, _SPILLS = _build_scanner(KEYWORDS)
+
+
+def scan_categories(text_lower):
+    """Set of KEYWORDS categories with at least one keyword in ``text_lower``."""
+    found = set()
+    for word in set(_SCANNER.findall(text_lower)):
+        found |= _WORD_CATEGORIES[word]
+        for joined, categories in _SPILLS[word]:
+            if joined in text_lower:
+                found |= categories
+    return found
+
+
+# ==================== CLASSIFIER ====================
+Classification = namedtuple(
+    "Classification",
+    "intent salary loan_type is_greeting is_loan_query wants_compare age credit_score employment",
+)
+
+
+def parse_salary(text_lower):
+    for pattern in SALARY_PATTERNS:
+        match = pattern.search(text_lower)
+        if match:
+            salary = int(match.group(1))
+            # "30k" / "earning 45" style figures are in thousands
+            if salary < 1000:
+                salary *= 1000
+            return salary
+    return None
+
+
+def _first_in_range(patterns, text_lower, bounds):
+    low, high = bounds
+    for pattern in patterns:
+        for match in pattern.finditer(text_lower):
+            value = int(match.group(1))
+            if low <= value <= high:
+                return value
+    return None
+
+
+def _greeting(text_lower, categories):
+    text_clean = text_lower.strip().replace('!', '').replace('?', '').replace('.', '').strip()
+    words = text_clean.split()
+    if len(words) > 3 or GREETINGS.isdisjoint(words):
+        return False
+    if text_clean != text_lower:
+        # Punctuation removal can join a keyword back together ("ne.ed").
+        categories = scan_categories(text_clean)
+    return "not_greeting" not in categories
+
+
+# Only short messages are memoised so the cache stays small.
+CACHEABLE_LENGTH = 200
+
+
+def classify(message):
+    """Classify one message.
+
+    ``intent`` is ``"greeting"``, ``"loan"``, ``"compare"`` or ``"general"``,
+    in the precedence generate_response has always used. Results are
+    immutable, and short messages are memoised since chat traffic repeats a lot.
+    """
+    if len(message) <= CACHEABLE_LENGTH:
+        return _classify_cached(message)
+    return _classify(message)
+
+
+def _classify(message):
+    text_lower = message.lower()
+    categories = scan_categories(text_lower)
+
+    loan_type = None
+    for category, name in LOAN_TYPE_CATEGORIES:
+        if category in categories:
+            loan_type = name
+            break
+    employment = None
+    for category, name in EMPLOYMENT_CATEGORIES:
+        if category in categories:
+            employment = name
+            break
+    has_digit = any(map(str.isdigit, message))
+    is_loan_query = not LOAN_CATEGORIES.isdisjoint(categories) and (has_digit or "income" in categories)
+    is_greeting = _greeting(text_lower, categories)
+    wants_compare = "compare" in categories
+
+    if is_greeting:
+        intent = "greeting"
+    elif is_loan_query:
+        intent = "loan"
+    elif wants_compare:
+        intent = "compare"
+    else:
+        intent = "general"
+
+    return Classification(
+        intent=intent,
+        # Every salary pattern needs a digit.
+        salary=parse_salary(text_lower) if has_digit else None,
+        loan_type=loan_type,
+        is_greeting=is_greeting,
+        is_loan_query=is_loan_query,
+        wants_compare=wants_compare,
+        age=_first_in_range(AGE_PATTERNS, text_lower, AGE_RANGE) if has_digit else None,
+        credit_score=_first_in_range(CREDIT_PATTERNS, text_lower, CREDIT_RANGE) if has_digit else None,
+        employment=employment,
+    )
+
+
+_classify_cached = lru_cache(maxsize=4096)(_classify)
+
+
+def classify_cache_info():
+    """Hit/miss counts of the classify memo (functools ``CacheInfo``)."""
+    return _classify_cached.cache_info()
+
+
+def mentions_loans(message):
+    """True when ``message`` uses loan vocabulary, whatever its intent."""
+    return not LOAN_TOPIC_CATEGORIES.isdisjoint(scan_categories(message.lower()))
+
+
+def classify_many(messages):
+    """Classify a batch of messages (e.g. a day of chat logs), in order."""
+    return [classify(message) for message in messages]
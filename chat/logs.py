@@ -0,0 +1,79 @@
+"""Logging plumbing for the chat app (wired up in settings.LOGGING).
+
+Request logs are sampled per request: ``sample_request()`` decides once,
+with probability CHAT_LOG_SAMPLE_RATE, whether the current request's
+DEBUG/INFO lines are kept, so a sampled request is logged whole. Warnings
+and errors always pass. Records are written to stdout by a background
+thread, so a request never blocks on a slow terminal or log pipe.
+"""
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+
+_sampled = contextvars.ContextVar("chat_log_sampled", default=True)
+
+
+def sample_request(decision=None):
+    """Decide (or pin, given ``decision``) whether this request's info logs are kept."""
+    if decision is None:
+        from django.conf import settings
+        rate = getattr(settings, "CHAT_LOG_SAMPLE_RATE", 1.0)
+        decision = rate >= 1.0 or random.random() < rate
+    _sampled.set(decision)
+    return decision
+
+
+class SampledRequestFilter(logging.Filter):
+    """Drop records below WARNING for requests that weren't sampled."""
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or _sampled.get()
+
+
+class BackgroundStreamHandler(logging.handlers.QueueHandler):
+    """StreamHandler whose writes happen on a listener thread.
+
+    The listener is started lazily in each process, so a handler configured
+    in the gunicorn master before forking still writes from the workers.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self._target = logging.StreamHandler(stream)
+        self._target.setFormatter(logging.Formatter("%(message)s"))
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        atexit.register(self._stop)
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # A forked child inherits the parent's queue but not its thread.
+            self.queue = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(self.queue, self._target)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def emit(self, record):
+        self._ensure_listener()
+        super().emit(record)
+
+    def _stop(self):
+        # Flush what's queued; only the process that started the thread can.
+        listener, self._listener = self._listener, None
+        if listener is not None and self._pid == os.getpid():
+            listener.stop()
+        self._pid = None
+
+    def close(self):
+        self._stop()
+        super().close()
@@ -0,0 +1,108 @@
+import logging
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chat import intents, views
+from chat.catalog import LoanCatalog
+from chat.bench import (
+    FixedLoader,
+    add_report_arguments,
+    build_report,
+    finish_report,
+    format_results,
+    loan_message,
+    message_for,
+    summarize,
+    synthetic_records,
+    time_calls,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmarks for salary extraction, intent checks and handle_bank_query "
+        "against synthetic catalogs. Writes a JSON report and can compare it with a baseline."
+    )
+
+    def add_arguments(self, parser):
+        # The defaults finish in a few seconds; a 100,000-row catalog takes
+        # longer to build and is opt-in (--rows 10,1000,10000,100000).
+        parser.add_argument(
+            "--rows",
+            default="10,1000,10000",
+            help="Comma-separated synthetic catalog sizes (default: 10,1000,10000).",
+        )
+        parser.add_argument("--iterations", type=int, default=500, help="Calls per case (default: 500).")
+        parser.add_argument("--seed", type=int, default=0, help="Seed for catalogs and messages.")
+        add_report_arguments(parser)
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options["rows"].split(",") if size.strip()]
+        except ValueError:
+            raise CommandError(f"--rows must be comma-separated integers, got {options['rows']!r}")
+        iterations = options["iterations"]
+        if iterations < 1 or not sizes or min(sizes) < 1:
+            raise CommandError("--iterations and --rows must be positive")
+
+        # Per-request logging would dominate sub-millisecond timings.
+        chat_logger = logging.getLogger("chat")
+        level = chat_logger.level
+        chat_logger.setLevel(logging.WARNING)
+        try:
+            results = self.run_cases(sizes, iterations, options["seed"])
+        finally:
+            chat_logger.setLevel(level)
+
+        report = build_report("micro", results, rows=sizes, iterations=iterations, seed=options["seed"])
+        self.stdout.write(format_results(results))
+        finish_report(self, report, options)
+
+    def run_cases(self, sizes, iterations, seed):
+        rng = random.Random(seed)
+        results = []
+
+        # Unique messages miss the classify memo; a small repeated pool hits it.
+        unique = [loan_message(rng, salary=20000 + i) for i in range(iterations)]
+        pool = [message_for(rng.choice(("greeting", "loan", "general")), rng) for _ in range(50)]
+        repeated = [pool[i % len(pool)] for i in range(iterations)]
+        for name, fn in (("extract_salary", views.extract_salary), ("is_loan_query", views.is_loan_query)):
+            intents._classify_cached.cache_clear()
+            results.append(summarize(f"{name}[unique]", time_calls(fn, unique)))
+            results.append(summarize(f"{name}[repeated]", time_calls(fn, repeated)))
+
+        loan_pool = [loan_message(rng) for _ in range(200)]
+        queries = [loan_pool[i % len(loan_pool)] for i in range(iterations)]
+        # The first build imports NumPy; keep that out of the timings.
+        warm = synthetic_records(1, seed)
+        LoanCatalog(list(warm[0]), warm)
+        original_loader = views.CATALOG_LOADER
+        try:
+            for rows in sizes:
+                records = synthetic_records(rows, seed)
+                start = time.perf_counter()
+                catalog = LoanCatalog(list(records[0]), records, version=f"synthetic-{rows}")
+                results.append(summarize(f"catalog_build[rows={rows}]", [time.perf_counter() - start], rows=rows))
+                views.CATALOG_LOADER = FixedLoader(catalog)
+
+                results.append(summarize(
+                    f"handle_bank_query[rows={rows}]",
+                    time_calls(views.handle_bank_query, queries),
+                    rows=rows,
+                ))
+
+                def uncached(message):
+                    catalog.render_cache.clear()
+                    views.handle_bank_query(message)
+
+                results.append(summarize(
+                    f"handle_bank_query[rows={rows},render_cache=off]",
+                    time_calls(uncached, queries),
+                    rows=rows,
+                ))
+                self.stdout.write(f"⏱️ Finished {rows:,}-row catalog")
+        finally:
+            views.CATALOG_LOADER = original_loader
+        return results
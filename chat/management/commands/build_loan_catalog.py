@@ -0,0 +1,37 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.catalog import _file_digest, read_catalog_csv
+from chat.snapshot import write_snapshot
+
+
+class Command(BaseCommand):
+    help = "Compile the loan CSV into the memory-mapped binary catalog snapshot."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            default=settings.LOAN_CATALOG_PATH,
+            help="CSV to compile (default: LOAN_CATALOG_PATH).",
+        )
+        parser.add_argument(
+            "--output",
+            default=settings.LOAN_CATALOG_SNAPSHOT,
+            help="Snapshot file to write (default: LOAN_CATALOG_SNAPSHOT).",
+        )
+
+    def handle(self, *args, **options):
+        source, output = options["source"], options["output"]
+        try:
+            digest = _file_digest(source)
+            columns, records = read_catalog_csv(source)
+            size = write_snapshot(output, columns, records, digest)
+        except OSError as e:
+            raise CommandError(f"Could not build {output} from {source}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Wrote {len(records)} offers x {len(columns)} columns to {output} "
+            f"({size:,} bytes, CSV {os.path.getsize(source):,} bytes, sha1 {digest[:12]})"
+        ))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.bench import make_fake_ollama
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a stand-in Ollama server with configurable latency and token rate, "
+        "for benchmarks and load tests (point OLLAMA_API_URL at it)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=11434)
+        parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token (default: 0.2).")
+        parser.add_argument("--tokens-per-second", type=float, default=20.0, help="Generation speed (default: 20).")
+        parser.add_argument("--max-tokens", type=int, default=60, help="Tokens per reply, capped by num_predict (default: 60).")
+        parser.add_argument(
+            "--load-seconds",
+            type=float,
+            default=0.0,
+            help="Model load time paid after the model idles past its keep_alive (default: 0).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            server = make_fake_ollama(
+                options["host"],
+                options["port"],
+                latency=options["latency"],
+                tokens_per_second=options["tokens_per_second"],
+                max_tokens=options["max_tokens"],
+                load_seconds=options["load_seconds"],
+            )
+        except OSError as e:
+            raise CommandError(f"Could not listen on {options['host']}:{options['port']}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Fake Ollama on http://{options['host']}:{options['port']}/api/generate "
+            f"({options['latency']}s latency, {options['tokens_per_second']} tokens/s). Ctrl-C to stop."
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,110 @@
+import asyncio
+import random
+import time
+from collections import Counter
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.bench import (
+    DEFAULT_MIX,
+    add_report_arguments,
+    build_report,
+    finish_report,
+    format_results,
+    message_for,
+    parse_mix,
+    summarize,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test a running /chat-api/ with a mix of greetings, loan queries and general "
+        "questions. Start the server (and `manage.py fake_ollama` for a repeatable LLM) first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000/chat-api/", help="Chat endpoint to hit.")
+        parser.add_argument("--requests", type=int, default=500, help="Requests to send (default: 500).")
+        parser.add_argument("--concurrency", type=int, default=10, help="Requests in flight (default: 10).")
+        parser.add_argument(
+            "--mix",
+            default=",".join(f"{kind}={weight}" for kind, weight in DEFAULT_MIX.items()),
+            help="Relative weights of message kinds (default: greeting=0.2,loan=0.6,general=0.2).",
+        )
+        parser.add_argument("--warmup", type=int, default=5, help="Untimed requests sent first (default: 5).")
+        parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds.")
+        parser.add_argument("--json", action="store_true", help="Ask for structured JSON replies.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed for the message sequence.")
+        add_report_arguments(parser)
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options["mix"])
+        except ValueError as e:
+            raise CommandError(f"Bad --mix: {e}")
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be positive")
+
+        rng = random.Random(options["seed"])
+        kinds = rng.choices(list(mix), weights=list(mix.values()), k=options["requests"] + options["warmup"])
+        plan = [(kind, message_for(kind, rng)) for kind in kinds]
+        warmup, plan = plan[:options["warmup"]], plan[options["warmup"]:]
+
+        self.stdout.write(f"🚀 {len(plan)} requests to {options['url']} at concurrency {options['concurrency']}")
+        samples, wall = asyncio.run(self.run_load(options, warmup, plan))
+
+        results = []
+        for kind in [*mix, "all"]:
+            picked = [s for s in samples if kind in ("all", s[0])]
+            if not picked:
+                continue
+            ok = [elapsed for _, status, elapsed in picked if status == 200]
+            entry = summarize(kind, ok)
+            entry["errors"] = len(picked) - len(ok)
+            entry["statuses"] = dict(Counter(str(status) for _, status, _ in picked))
+            results.append(entry)
+
+        report = build_report(
+            "load", results,
+            url=options["url"],
+            requests=len(plan),
+            concurrency=options["concurrency"],
+            mix=mix,
+            structured=options["json"],
+            wall_seconds=round(wall, 3),
+            throughput_rps=round(len(plan) / wall, 1) if wall else None,
+        )
+        self.stdout.write(format_results(results))
+        self.stdout.write(f"📈 {report['settings']['throughput_rps']} requests/s over {wall:.1f} s")
+        finish_report(self, report, options)
+
+    async def run_load(self, options, warmup, plan):
+        """Send ``plan`` with ``concurrency`` workers; returns ((kind, status, seconds), ...) and wall time."""
+        extra = {"format": "json"} if options["json"] else {}
+        limits = httpx.Limits(max_connections=options["concurrency"], max_keepalive_connections=options["concurrency"])
+        async with httpx.AsyncClient(timeout=options["timeout"], limits=limits) as client:
+
+            async def send(kind, message):
+                start = time.perf_counter()
+                try:
+                    response = await client.post(options["url"], json={"message": message, **extra})
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                return kind, status, time.perf_counter() - start
+
+            for kind, message in warmup:
+                await send(kind, message)
+
+            samples = []
+            pending = iter(plan)
+
+            async def worker():
+                for kind, message in pending:
+                    samples.append(await send(kind, message))
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(options["concurrency"])))
+            return samples, time.perf_counter() - start
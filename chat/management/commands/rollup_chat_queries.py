@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Avg, Case, CharField, Count, Max, Min, Q, Value, When
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from chat.models import ChatQueryHourly, ChatQueryLog
+from chat.querylog import SALARY_BANDS, TOP_SALARY_BAND, UNKNOWN_SALARY_BAND
+
+HOUR = timedelta(hours=1)
+
+
+def salary_band():
+    """SQL expression mapping ChatQueryLog.salary to its SALARY_BANDS label."""
+    return Case(
+        When(salary__isnull=True, then=Value(UNKNOWN_SALARY_BAND)),
+        *(When(salary__lt=upper, then=Value(label)) for upper, label in SALARY_BANDS),
+        default=Value(TOP_SALARY_BAND),
+        output_field=CharField(),
+    )
+
+
+def start_of_hour(moment):
+    return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll the chat query log up into hourly demand rows (ChatQueryHourly) by intent, "
+        "loan type, salary band and recommended bank. Only complete hours are rolled up; "
+        "re-running recomputes the hours it covers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            help="First hour to roll up (ISO date/time, local time). Default: the hour after the "
+                 "last rolled-up one, or the first logged query.",
+        )
+        parser.add_argument(
+            "--prune-days",
+            type=int,
+            default=0,
+            help="Afterwards delete rolled-up log rows older than this many days (default: keep).",
+        )
+
+    def handle(self, *args, **options):
+        end = start_of_hour(timezone.now())
+        start = self.first_hour(options["since"])
+        if start is None:
+            self.stdout.write("ℹ️ Nothing to roll up yet.")
+        elif start >= end:
+            self.stdout.write(f"ℹ️ Rolled up to {end:%Y-%m-%d %H:00} already.")
+        else:
+            self.rollup(start, end)
+
+        if options["prune_days"] > 0:
+            cutoff = min(end, timezone.now() - timedelta(days=options["prune_days"]))
+            deleted, _ = ChatQueryLog.objects.filter(created_at__lt=cutoff).delete()
+            self.stdout.write(f"🧹 Deleted {deleted} log rows before {timezone.localtime(cutoff):%Y-%m-%d %H:%M}")
+
+    def first_hour(self, since):
+        if since:
+            try:
+                moment = datetime.fromisoformat(since)
+            except ValueError:
+                raise CommandError(f"--since must be an ISO date or date/time, got {since!r}")
+            if timezone.is_naive(moment):
+                moment = timezone.make_aware(moment)
+            return start_of_hour(moment)
+        last = ChatQueryHourly.objects.aggregate(last=Max("hour"))["last"]
+        if last is not None:
+            return start_of_hour(last) + HOUR
+        first = ChatQueryLog.objects.aggregate(first=Min("created_at"))["first"]
+        return start_of_hour(first) if first is not None else None
+
+    def rollup(self, start, end):
+        groups = (
+            ChatQueryLog.objects
+            .filter(created_at__gte=start, created_at__lt=end)
+            .annotate(hour=TruncHour("created_at"), salary_band=salary_band())
+            .values("hour", "intent", "loan_type", "salary_band", "bank")
+            .annotate(
+                queries=Count("id"),
+                cache_hits=Count("id", filter=Q(cache_hit=True)),
+                avg_latency_ms=Avg("latency_ms"),
+                max_latency_ms=Max("latency_ms"),
+            )
+            .order_by()
+        )
+        rows = [ChatQueryHourly(**group) for group in groups]
+        with transaction.atomic():
+            ChatQueryHourly.objects.filter(hour__gte=start, hour__lt=end).delete()
+            ChatQueryHourly.objects.bulk_create(rows, batch_size=500)
+
+        queries = sum(row.queries for row in rows)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Rolled up {queries} queries into {len(rows)} hourly rows "
+            f"({start:%Y-%m-%d %H:00} to {end:%Y-%m-%d %H:00})"
+        ))
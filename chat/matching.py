@@ -0,0 +1,217 @@
+"""Vectorised bulk matching of applicants against the loan catalog.
+
+The partner portal screens tens of thousands of leads at once. Calling
+handle_bank_query once per lead would re-parse text and render HTML for
+every row. Instead, each loan type's offers become NumPy threshold arrays,
+in rank order, and applicants of that type are checked against all of them
+in one broadcast comparison. The first ``limit`` passing columns of each
+row are its best offers.
+
+The arrays come from the catalog's own ``Thresholds`` (the ones the chat
+path's bitset indexes are built from), so a lead gets the same offers here
+as in the chat.
+"""
+import csv
+import io
+import math
+import weakref
+
+import numpy as np
+
+from .catalog import normalize_employment, offer_summary
+from .intents import classify
+
+# Accepted spellings of applicant fields in JSON keys / CSV headers.
+FIELD_ALIASES = {
+    "salary": ("salary", "monthly_salary", "income", "monthly_income"),
+    "loan_type": ("loan_type", "loan type", "type", "product"),
+    "age": ("age",),
+    "credit_score": ("credit_score", "credit score", "cibil", "cibil_score"),
+    "employment": ("employment", "employment_type", "employment type"),
+}
+
+# Cap on applicants x offers booleans evaluated at once (~16 MB).
+CHUNK_CELLS = 16_000_000
+
+
+class ApplicantError(ValueError):
+    """An applicant record could not be parsed."""
+
+
+def _number(value):
+    if value is None or value == "":
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+# ==================== CATALOG ARRAYS ====================
+class _TypeArrays:
+    """Thresholds for one loan type, columns in catalog rank order."""
+
+    def __init__(self, catalog, loan_type):
+        self.rows = np.asarray(catalog.ranked_rows(loan_type), dtype=np.int64)
+        thresholds = catalog.thresholds(loan_type)
+        self.min_salary = np.asarray(thresholds.min_salary, dtype=np.float64)
+        self.min_age = np.asarray(thresholds.min_age, dtype=np.float64)
+        self.max_age = np.asarray(thresholds.max_age, dtype=np.float64)
+        self.min_credit = np.asarray(thresholds.min_credit, dtype=np.float64)
+        # Offers without an "Employment Type" take anyone.
+        self.any_employment = np.array([not types for types in thresholds.employment], dtype=bool)
+        kinds = set().union(*thresholds.employment)
+        self.employment = {
+            kind: np.array([kind in types for types in thresholds.employment], dtype=bool) | self.any_employment
+            for kind in kinds
+        }
+
+    def employment_mask(self, kind):
+        """Offers open to applicants of employment type ``kind``."""
+        return self.employment.get(kind, self.any_employment)
+
+
+_arrays_by_catalog = weakref.WeakKeyDictionary()
+
+
+def _catalog_arrays(catalog):
+    arrays = _arrays_by_catalog.get(catalog)
+    if arrays is None:
+        arrays = {loan_type: _TypeArrays(catalog, loan_type) for loan_type in catalog.loan_types()}
+        _arrays_by_catalog[catalog] = arrays
+    return arrays
+
+
+# ==================== APPLICANT PARSING ====================
+def _pick(lowered, field):
+    for alias in FIELD_ALIASES[field]:
+        if alias in lowered:
+            return lowered[alias]
+    return None
+
+
+def _normalize_loan_type(value, known_types):
+    if value is None:
+        return None
+    text = str(value).strip().lower()
+    if text in known_types:
+        return text
+    # "vehicle", "house loan", ... -> the chat vocabulary knows these
+    detected = classify(text).loan_type
+    return detected.lower() if detected else None
+
+
+def parse_applicants_csv(text):
+    """Parse CSV text with a header row into applicant dicts."""
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+def _normalize_employment(value):
+    if value is None or not str(value).strip():
+        return ""
+    return normalize_employment(value)
+
+
+def _applicant_arrays(applicants, known_types):
+    count = len(applicants)
+    salary = np.full(count, np.nan)
+    age = np.full(count, np.nan)
+    credit = np.full(count, np.nan)
+    employment = np.full(count, "", dtype=object)
+    types = []
+    for i, record in enumerate(applicants):
+        if not isinstance(record, dict):
+            raise ApplicantError(f"applicant {i} is not an object")
+        lowered = {str(k).strip().lower(): v for k, v in record.items()}
+        salary[i] = _number(_pick(lowered, "salary"))
+        age[i] = _number(_pick(lowered, "age"))
+        credit[i] = _number(_pick(lowered, "credit_score"))
+        employment[i] = _normalize_employment(_pick(lowered, "employment"))
+        types.append(_normalize_loan_type(_pick(lowered, "loan_type"), known_types))
+    return salary, age, credit, employment, types
+
+
+# ==================== MATCHING ====================
+def _top_k_eligible(eligible, limit):
+    """Column indexes of the first ``limit`` True cells per row (-1 = none)."""
+    picks = np.full((eligible.shape[0], limit), -1, dtype=np.int64)
+    if eligible.shape[1] == 0:
+        return picks
+    running = np.cumsum(eligible, axis=1, dtype=np.int32)
+    totals = running[:, -1]
+    for k in range(1, limit + 1):
+        has_k = totals >= k
+        if not has_k.any():
+            break
+        picks[has_k, k - 1] = np.argmax(running[has_k] >= k, axis=1)
+    return picks
+
+
+def _match_type(arrays, salary, age, credit, employment, limit):
+    """Top offers (catalog row ids, -1 padded) for applicants of one type.
+
+    Salaries must be known; an unknown age, credit score (NaN) or
+    employment ("") doesn't filter.
+    """
+    out = np.full((salary.shape[0], limit), -1, dtype=np.int64)
+    width = max(1, len(arrays.rows))
+    step = max(1, CHUNK_CELLS // width)
+    for start in range(0, salary.shape[0], step):
+        end = start + step
+        sal = salary[start:end, None]
+        ag = age[start:end, None]
+        cr = credit[start:end, None]
+        emp = employment[start:end]
+        eligible = (
+            (sal >= arrays.min_salary)
+            & (np.isnan(ag) | ((ag >= arrays.min_age) & (ag <= arrays.max_age)))
+            & (np.isnan(cr) | (cr >= arrays.min_credit))
+        )
+        for kind in set(emp) - {""}:
+            eligible[emp == kind] &= arrays.employment_mask(kind)
+        picks = _top_k_eligible(eligible, limit)
+        found = picks >= 0
+        out[start:end][found] = arrays.rows[picks[found]]
+    return out
+
+
+def match_applicants(catalog, applicants, limit=3):
+    """Best ``limit`` offers for every applicant, in input order.
+
+    Each applicant is a dict with ``salary``, ``loan_type`` and optionally
+    ``age``, ``credit_score`` and ``employment`` (see FIELD_ALIASES for
+    accepted spellings). Returns one result dict per applicant; applicants
+    without a known loan type or a salary get an ``error`` and no offers.
+    """
+    arrays_by_type = _catalog_arrays(catalog)
+    salary, age, credit, employment, types = _applicant_arrays(applicants, arrays_by_type)
+    type_codes = np.array([t or "" for t in types], dtype=object)
+    has_salary = ~np.isnan(salary)
+
+    matches = np.full((len(applicants), limit), -1, dtype=np.int64)
+    for loan_type, arrays in arrays_by_type.items():
+        idx = np.flatnonzero((type_codes == loan_type) & has_salary)
+        if idx.size:
+            matches[idx] = _match_type(arrays, salary[idx], age[idx], credit[idx], employment[idx], limit)
+
+    # Offers repeat across thousands of applicants; serialise each once.
+    offer_cache = {}
+
+    def offer(row_id):
+        if row_id not in offer_cache:
+            offer_cache[row_id] = offer_summary(catalog.row(row_id))
+        return offer_cache[row_id]
+
+    results = []
+    for i, loan_type in enumerate(types):
+        result = {"index": i, "loan_type": loan_type.title() if loan_type else None}
+        if loan_type is None or loan_type not in arrays_by_type:
+            result["error"] = "unknown or missing loan type"
+            result["offers"] = []
+        elif not has_salary[i]:
+            result["error"] = "missing or invalid salary"
+            result["offers"] = []
+        else:
+            result["offers"] = [offer(int(r)) for r in matches[i] if r >= 0]
+        results.append(result)
+    return results
@@ -0,0 +1,260 @@
+"""Latency histograms and counters for the chat pipeline.
+
+Every chat request is timed end to end into ``chat_request_seconds`` (by
+route and intent), and each stage of it (body parsing, intent
+classification, catalog lookup, rendering, the Ollama call) into
+``chat_stage_seconds`` with ``span``. Cache lookups and Ollama token counts
+are counters, so hit ratios and tokens per second are a ``rate()`` division
+away. ``GET /metrics/`` serves everything in the Prometheus text format.
+
+Histograms use fixed buckets, so recording is a bisect and two additions
+under a lock. The registry is per process: with several gunicorn workers
+each scrape reaches one of them, so give every worker its own port or
+read the numbers as a sample.
+"""
+import bisect
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans the sub-millisecond CSV path up to slow LLM generations.
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 20, 35, 50, 75, 100, 150, 250)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+# ==================== METRIC TYPES ====================
+class Metric:
+    """A counter or gauge: one value per combination of label values."""
+
+    def __init__(self, name, help_text, kind, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._sources = []
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def collect_from(self, source):
+        """Also report ``source()``, a ``{label values tuple: value}`` dict read at scrape time.
+
+        For numbers another object already keeps (cache stats, pool
+        counters), so they aren't counted twice.
+        """
+        self._sources.append(source)
+        return source
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        for source in self._sources:
+            try:
+                values.update(source())
+            except Exception as e:
+                logger.warning("Metric source for %s failed: %s", self.name, e)
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for key in sorted(values):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(values[key])}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram per combination of label values."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key in sorted(series):
+            counts, total = series[key]
+            running = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                running += count
+                le = (("le", _number(float(bound))),)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {running}")
+        return lines
+
+
+class Registry:
+    """Named metrics of one process, rendered together for a scrape."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Metric(name, help_text, "counter", labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._add(Metric(name, help_text, "gauge", labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+# ==================== CHAT METRICS ====================
+REQUEST_SECONDS = REGISTRY.histogram(
+    "chat_request_seconds", "End-to-end chat request latency.", ("route", "intent"),
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "chat_stage_seconds", "Time spent in each stage of the chat pipeline.", ("stage",),
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "chat_cache_lookups_total", "Cache lookups by cache and result (hit, shared_hit, miss).", ("cache", "result"),
+)
+CONTEXT_FOLLOWUPS = REGISTRY.counter(
+    "chat_context_followups_total", "Messages completed with details from earlier turns.", ("intent",),
+)
+SEMANTIC_MATCHES = REGISTRY.counter(
+    "chat_semantic_matches_total", "Semantic fallback lookups by outcome (loan, faq, miss).", ("outcome",),
+)
+OLLAMA_CALLS = REGISTRY.counter(
+    "chat_ollama_calls_total", "Ollama generations by mode and outcome.", ("mode", "outcome"),
+)
+OLLAMA_ADMISSIONS = REGISTRY.counter(
+    "chat_ollama_admissions_total",
+    "Admission decisions for Ollama generations (admitted, queued, shed_*).",
+    ("priority", "outcome"),
+)
+OLLAMA_QUEUE_SECONDS = REGISTRY.histogram(
+    "chat_ollama_queue_seconds", "Time spent waiting for an Ollama slot.", ("priority",),
+)
+OLLAMA_COALESCED = REGISTRY.counter(
+    "chat_ollama_coalesced_total", "Prompts that shared another request's generation.", ("scope",),
+)
+OLLAMA_TOKENS = REGISTRY.counter(
+    "chat_ollama_tokens_total", "Tokens generated by Ollama.", ("mode",),
+)
+OLLAMA_EVAL_SECONDS = REGISTRY.counter(
+    "chat_ollama_eval_seconds_total", "Time Ollama reports spending on generating tokens.", ("mode",),
+)
+OLLAMA_TOKEN_RATE = REGISTRY.histogram(
+    "chat_ollama_tokens_per_second", "Generation throughput per Ollama call.", ("mode",), buckets=TOKEN_RATE_BUCKETS,
+)
+OLLAMA_PROMPT_TOKENS = REGISTRY.counter(
+    "chat_ollama_prompt_tokens_total", "Prompt tokens Ollama had to evaluate (cached prefixes excluded).", ("mode",),
+)
+OLLAMA_PHASE_SECONDS = REGISTRY.histogram(
+    "chat_ollama_phase_seconds",
+    "Ollama-reported durations per call: model load, prompt eval, eval and total.",
+    ("mode", "phase"),
+)
+# Ollama's response field -> phase label
+GENERATION_PHASES = (
+    ("load_duration", "load"),
+    ("prompt_eval_duration", "prompt_eval"),
+    ("eval_duration", "eval"),
+    ("total_duration", "total"),
+)
+
+
+@contextmanager
+def span(stage):
+    """Time the block into ``chat_stage_seconds{stage=...}``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def record_generation(mode, data):
+    """Token counters and phase durations from the fields Ollama sends with a finished generation."""
+    tokens = data.get("eval_count") or 0
+    seconds = (data.get("eval_duration") or 0) / 1e9
+    if tokens:
+        OLLAMA_TOKENS.inc(tokens, mode=mode)
+    if data.get("prompt_eval_count"):
+        OLLAMA_PROMPT_TOKENS.inc(data["prompt_eval_count"], mode=mode)
+    for field, phase in GENERATION_PHASES:
+        if data.get(field) is not None:
+            OLLAMA_PHASE_SECONDS.observe(data[field] / 1e9, mode=mode, phase=phase)
+    if tokens and seconds > 0:
+        OLLAMA_EVAL_SECONDS.inc(seconds, mode=mode)
+        OLLAMA_TOKEN_RATE.observe(tokens / seconds, mode=mode)
+
+
+def render_metrics():
+    return REGISTRY.render()
@@ -0,0 +1,61 @@
+"""Async-capable static file middleware.
+
+WhiteNoiseMiddleware is sync-only, and one sync middleware makes Django
+adapt the whole chain with ``sync_to_async``: under ASGI every request then
+holds a worker thread for its full duration, including a chat request that
+is only awaiting Ollama. ``AsyncWhiteNoiseMiddleware`` serves the same files
+with the same headers, but in async mode it stays a coroutine: the file
+lookup is an in-memory dict, and the file body is read off the event loop.
+"""
+import asyncio
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings as django_settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+# Bytes per read when streaming a static file under ASGI.
+CHUNK_SIZE = 64 * 1024
+
+
+async def _read_chunks(file):
+    if file is None:
+        # HEAD and 304 responses have no body.
+        return
+    try:
+        while True:
+            chunk = await asyncio.to_thread(file.read, CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file.close()
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware that runs natively in both sync and async mode."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=django_settings):
+        super().__init__(get_response, settings)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await asyncio.to_thread(self.find_file, request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is None:
+            return await self.get_response(request)
+        response = await asyncio.to_thread(self.serve, static_file, request)
+        # Django reads sync file iterators in one go (with a warning) under ASGI.
+        response.streaming_content = _read_chunks(response.file_to_stream)
+        return response
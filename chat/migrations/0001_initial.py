@@ -0,0 +1,55 @@
+# Generated by Django 4.2.27 on 2026-10-16 23:21
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatQueryHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(db_index=True)),
+                ('intent', models.CharField(max_length=20)),
+                ('loan_type', models.CharField(blank=True, max_length=20)),
+                ('salary_band', models.CharField(max_length=20)),
+                ('bank', models.CharField(blank=True, max_length=100)),
+                ('queries', models.PositiveIntegerField()),
+                ('cache_hits', models.PositiveIntegerField()),
+                ('avg_latency_ms', models.FloatField()),
+                ('max_latency_ms', models.FloatField()),
+            ],
+            options={
+                'ordering': ['-hour', 'intent', 'loan_type', 'salary_band', 'bank'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChatQueryLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('route', models.CharField(max_length=20)),
+                ('message', models.TextField()),
+                ('intent', models.CharField(max_length=20)),
+                ('salary', models.PositiveIntegerField(blank=True, null=True)),
+                ('loan_type', models.CharField(blank=True, max_length=20)),
+                ('bank', models.CharField(blank=True, max_length=100)),
+                ('latency_ms', models.FloatField()),
+                ('cache_hit', models.BooleanField(default=False)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='chatqueryhourly',
+            constraint=models.UniqueConstraint(fields=('hour', 'intent', 'loan_type', 'salary_band', 'bank'), name='chat_query_hourly_unique'),
+        ),
+    ]
@@ -0,0 +1,219 @@
+"""Keeps the Ollama model warm and the system prompt pre-processed.
+
+Two things make a chat reply slow besides the generation itself:
+
+- **Cold loads.** Ollama unloads an idle model after its keep-alive (5
+  minutes by default), so the first message after a quiet spell waits for
+  the model to load again. Every request now asks for ``keep_alive``, and a
+  background thread sends a one-token "prime" request whenever no
+  generation has happened for ``warm_interval`` seconds.
+- **Re-reading the system prompt.** With ``reuse_context`` the prime
+  request sends only the system prompt (raw, no template) and keeps the
+  token ``context`` Ollama returns for it. Later requests send that context
+  plus just the user's turn, so the prompt prefix is identical token for
+  token, and Ollama reuses its KV cache for it instead of evaluating it
+  again. Raw prompts bypass the model's own chat template, so this is
+  opt-in; by default every request sends the full templated prompt.
+
+Each request also gets a token budget. ``num_predict`` depends on the kind
+of message (greetings get short replies), and the user's message is cut so
+prefix + message + reply fit in ``num_ctx``.
+"""
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Rough characters per token for English text with the Llama tokenizer; on
+# the low side, so estimates err towards more tokens.
+CHARS_PER_TOKEN = 3
+# Tokens the turn markers ("User: ... Assistant:") add around a message.
+TURN_OVERHEAD_TOKENS = 8
+# A generation whose load_duration exceeds this loaded the model from scratch.
+COLD_LOAD_SECONDS = 0.5
+# Seconds between warm-up attempts while Ollama is unreachable.
+RETRY_SECONDS = 30.0
+# Stop before the model starts writing the user's next turn itself.
+STOP_SEQUENCES = ("\nUser:",)
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def duration_seconds(value):
+    """Ollama keep_alive value ("30m", "1h", "90s", 300, -1) in seconds; None means forever."""
+    if isinstance(value, str):
+        value = value.strip()
+        units = {"s": 1, "m": 60, "h": 3600}
+        if value[-1:] in units:
+            return float(value[:-1]) * units[value[-1]]
+        value = float(value)
+    return None if value < 0 else float(value)
+
+
+class ModelSession:
+    """Builds Ollama payloads and keeps the model and prompt prefix warm.
+
+    ``post(payload)`` sends one non-streaming /api/generate request and
+    returns the decoded response; the session never talks HTTP itself.
+    """
+
+    def __init__(
+        self,
+        post,
+        model,
+        system_prompt,
+        options,
+        keep_alive="30m",
+        warm_interval=240.0,
+        reuse_context=False,
+        max_tokens=None,
+    ):
+        self.post = post
+        self.model = model
+        self.system_prompt = system_prompt
+        self.options = dict(options)
+        self.keep_alive = keep_alive
+        self.warm_interval = warm_interval
+        self.reuse_context = reuse_context
+        # priority/kind -> num_predict; anything else uses options["num_predict"]
+        self.max_tokens = dict(max_tokens or {})
+        self.context = None
+        self.last_used = 0.0
+        self.last_timings = {}
+        self.primes = 0
+        self.cold_loads = 0
+        self._lock = threading.Lock()
+        self._thread_pid = None
+
+    # ---------- payloads ----------
+    @property
+    def prefix(self):
+        return f"{self.system_prompt}\n\n"
+
+    def num_predict(self, kind=None):
+        return self.max_tokens.get(kind, self.options.get("num_predict", 120))
+
+    def fit_message(self, user_message, num_predict):
+        """``user_message`` cut to the tokens left in ``num_ctx`` after the prefix and reply."""
+        context = self.context
+        prefix_tokens = len(context) if context else estimate_tokens(self.prefix)
+        budget = self.options.get("num_ctx", 2048) - num_predict - prefix_tokens - TURN_OVERHEAD_TOKENS
+        max_chars = max(budget, 0) * CHARS_PER_TOKEN
+        if len(user_message) <= max_chars:
+            return user_message
+        logger.debug("✂️ Message cut from %s to %s characters to fit num_ctx", len(user_message), max_chars)
+        return user_message[:max_chars].rstrip() + "…"
+
+    def payload(self, user_message, stream=False, kind=None):
+        """The /api/generate request for one message."""
+        num_predict = self.num_predict(kind)
+        message = self.fit_message(user_message, num_predict)
+        options = {**self.options, "num_predict": num_predict}
+        payload = {"model": self.model, "stream": stream, "keep_alive": self.keep_alive, "options": options}
+        if not self.reuse_context:
+            payload["prompt"] = f"{self.system_prompt}\n\nUser: {message}\nAssistant:"
+            return payload
+        options["stop"] = list(STOP_SEQUENCES)
+        turn = f"User: {message}\nAssistant:"
+        context = self.context
+        payload["raw"] = True
+        if context:
+            payload["context"] = context
+            payload["prompt"] = turn
+        else:
+            # Same tokens as prefix + turn, so Ollama's prompt cache still helps.
+            payload["prompt"] = self.prefix + turn
+        return payload
+
+    # ---------- timings ----------
+    def observe(self, data):
+        """Note a finished generation's timing fields (seconds)."""
+        timings = {
+            field: data[field] / 1e9
+            for field in ("load_duration", "prompt_eval_duration", "eval_duration", "total_duration")
+            if data.get(field)
+        }
+        timings["prompt_eval_count"] = data.get("prompt_eval_count")
+        timings["eval_count"] = data.get("eval_count")
+        with self._lock:
+            self.last_used = time.monotonic()
+            self.last_timings = timings
+            if timings.get("load_duration", 0) > COLD_LOAD_SECONDS:
+                self.cold_loads += 1
+                logger.info("🧊 Ollama cold load took %.2fs", timings["load_duration"])
+
+    # ---------- warming ----------
+    def prime(self):
+        """Load the model (if needed) and cache the system prompt's token context."""
+        payload = {
+            "model": self.model,
+            "prompt": self.prefix,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": {**self.options, "num_predict": 1},
+        }
+        if self.reuse_context:
+            payload["raw"] = True
+        data = self.post(payload)
+        context = data.get("context")
+        generated = data.get("eval_count") or 0
+        with self._lock:
+            if self.reuse_context and context:
+                # The context ends with the primed token(s); keep just the prompt.
+                self.context = list(context[:len(context) - generated]) if generated else list(context)
+            self.primes += 1
+        self.observe(data)
+        logger.debug("🔥 Ollama model %s primed (%s context tokens)", self.model, len(self.context or ()))
+        return data
+
+    def forget_context(self):
+        """Drop the cached context (e.g. Ollama rejected it); the next prime rebuilds it."""
+        with self._lock:
+            self.context = None
+
+    def idle_for(self):
+        return time.monotonic() - self.last_used if self.last_used else math.inf
+
+    def start(self):
+        """Start the keep-warm thread in this process (once per pid, so it survives forks)."""
+        if self.warm_interval <= 0 or self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+        threading.Thread(target=self._keep_warm, name="ollama-keep-warm", daemon=True).start()
+
+    def _keep_warm(self):
+        failing = False
+        while True:
+            wait = self.warm_interval - self.idle_for()
+            if wait <= 0 or (self.reuse_context and self.context is None and not failing):
+                try:
+                    self.prime()
+                    failing = False
+                    wait = self.warm_interval
+                except Exception as e:
+                    if not failing:
+                        logger.warning("⚠️ Ollama warm-up failed: %s", e)
+                    failing = True
+                    wait = min(self.warm_interval, RETRY_SECONDS)
+            time.sleep(max(1.0, wait))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "model": self.model,
+                "keep_alive": self.keep_alive,
+                "warm_interval": self.warm_interval,
+                "context_tokens": len(self.context) if self.context else 0,
+                "primes": self.primes,
+                "cold_loads": self.cold_loads,
+                "idle_seconds": round(self.idle_for(), 1) if self.last_used else None,
+                "last_timings": dict(self.last_timings),
+            }
@@ -1,3 +1,50 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class ChatQueryLog(models.Model):
+    """One answered chat message. Written in batches by chat.querylog, never inline."""
+
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    route = models.CharField(max_length=20)
+    message = models.TextField()
+    intent = models.CharField(max_length=20)
+    salary = models.PositiveIntegerField(null=True, blank=True)
+    loan_type = models.CharField(max_length=20, blank=True)
+    # Top recommended bank, when the catalog answered
+    bank = models.CharField(max_length=100, blank=True)
+    latency_ms = models.FloatField()
+    # Answered from a cache (conversation offers, rendered offers or an Ollama reply)
+    cache_hit = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{timezone.localtime(self.created_at):%Y-%m-%d %H:%M} {self.intent}: {self.message[:50]}"
+
+
+class ChatQueryHourly(models.Model):
+    """Hourly demand rollup of ChatQueryLog (``manage.py rollup_chat_queries``)."""
+
+    hour = models.DateTimeField(db_index=True)
+    intent = models.CharField(max_length=20)
+    loan_type = models.CharField(max_length=20, blank=True)
+    salary_band = models.CharField(max_length=20)
+    bank = models.CharField(max_length=100, blank=True)
+    queries = models.PositiveIntegerField()
+    cache_hits = models.PositiveIntegerField()
+    avg_latency_ms = models.FloatField()
+    max_latency_ms = models.FloatField()
+
+    class Meta:
+        ordering = ["-hour", "intent", "loan_type", "salary_band", "bank"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hour", "intent", "loan_type", "salary_band", "bank"],
+                name="chat_query_hourly_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{timezone.localtime(self.hour):%Y-%m-%d %H:%M} {self.intent} {self.loan_type or '-'} {self.salary_band}: {self.queries}"
@@ -0,0 +1,881 @@
+"""Ollama client used as the chat fallback for greetings and general questions.
+
+All calls go through pooled keep-alive connections (a ``requests.Session``
+for the sync paths, one ``httpx.AsyncClient`` per event loop for the async
+and ASGI streaming paths) and share one circuit breaker: after OLLAMA_BREAKER_THRESHOLD
+consecutive failures calls fail fast, so callers drop straight to their
+static fallback reply until a probe succeeds again. Successful replies are
+cached (see chat.cache) and served without calling Ollama at all.
+
+Identical prompts that arrive while one is being generated don't start
+their own generation: within a worker they wait on the in-flight one
+(``SingleFlight``), and with OLLAMA_CACHE_BACKEND=django the first worker
+to take a lock in the shared cache generates while the others poll for its
+cached reply.
+
+Generations go through admission control (chat.admission): at most
+OLLAMA_MAX_CONCURRENCY run at once per worker, the rest wait by priority for
+up to OLLAMA_QUEUE_TIMEOUT seconds and are otherwise shed to the fallback.
+
+Payloads come from a ``ModelSession`` (chat.model_session), which keeps the
+model loaded, reuses the system prompt's token context and applies the
+per-request token budget.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from requests.adapters import HTTPAdapter
+
+from . import querylog
+from .admission import DEFAULT_PRIORITY, AdmissionController
+from .cache import ResponseCache, SingleFlight
+from .model_session import ModelSession
+from .metrics import (
+    CACHE_LOOKUPS,
+    OLLAMA_ADMISSIONS,
+    OLLAMA_CALLS,
+    OLLAMA_COALESCED,
+    OLLAMA_QUEUE_SECONDS,
+    REGISTRY,
+    record_generation,
+    span,
+)
+
+logger = logging.getLogger(__name__)
+
+# ==================== OLLAMA CONFIG ====================
+OLLAMA_API_URL = getattr(settings, "OLLAMA_API_URL", "http://127.0.0.1:11434/api/generate")
+OLLAMA_MODEL = getattr(settings, "OLLAMA_MODEL", "tinyllama")
+# Connecting to a local Ollama should be instant; only generation is slow.
+OLLAMA_CONNECT_TIMEOUT = getattr(settings, "OLLAMA_CONNECT_TIMEOUT", 2.0)
+OLLAMA_TIMEOUT = getattr(settings, "OLLAMA_READ_TIMEOUT", 30.0)
+# Generations allowed in flight per worker (blocking, streaming and async).
+OLLAMA_MAX_CONCURRENCY = getattr(settings, "OLLAMA_MAX_CONCURRENCY", 2)
+# Requests allowed to wait for a slot, and how long (seconds) before the fallback
+OLLAMA_MAX_QUEUE = getattr(settings, "OLLAMA_MAX_QUEUE", 32)
+OLLAMA_QUEUE_TIMEOUT = getattr(settings, "OLLAMA_QUEUE_TIMEOUT", 5.0)
+OLLAMA_POOL_SIZE = getattr(settings, "OLLAMA_POOL_SIZE", 10)
+OLLAMA_BREAKER_THRESHOLD = getattr(settings, "OLLAMA_BREAKER_THRESHOLD", 3)
+OLLAMA_BREAKER_RESET = getattr(settings, "OLLAMA_BREAKER_RESET", 30.0)
+# Reply cache: "local" (per-process LRU), "django" (LRU + shared cache alias) or "none".
+OLLAMA_CACHE_BACKEND = getattr(settings, "OLLAMA_CACHE_BACKEND", "local")
+OLLAMA_CACHE_SIZE = getattr(settings, "OLLAMA_CACHE_SIZE", 512)
+OLLAMA_CACHE_TTL = getattr(settings, "OLLAMA_CACHE_TTL", 3600)
+OLLAMA_CACHE_ALIAS = getattr(settings, "OLLAMA_CACHE_ALIAS", "default")
+# Share one generation between identical concurrent prompts.
+OLLAMA_COALESCE = getattr(settings, "OLLAMA_COALESCE", True)
+# How long Ollama keeps the model loaded after a request, and how often an
+# idle worker re-primes it (seconds, 0 = never).
+OLLAMA_KEEP_ALIVE = getattr(settings, "OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_WARM_INTERVAL = getattr(settings, "OLLAMA_WARM_INTERVAL", 240.0)
+# Send the system prompt's cached token context instead of its text (raw
+# prompts, so the model's chat template is skipped; off unless enabled).
+OLLAMA_REUSE_CONTEXT = getattr(settings, "OLLAMA_REUSE_CONTEXT", False)
+# Reply budget for greetings; other messages use OLLAMA_OPTIONS["num_predict"].
+OLLAMA_GREETING_MAX_TOKENS = getattr(settings, "OLLAMA_GREETING_MAX_TOKENS", 60)
+
+SYSTEM_PROMPT = (
+    "You are Neuro, a friendly banking assistant. "
+    "Reply in a warm, conversational tone. "
+    "Keep responses short (2-4 sentences). "
+    "Use emojis occasionally. "
+    "Never make up bank data."
+)
+
+OLLAMA_OPTIONS = {
+    "temperature": 0.7,
+    "num_predict": 120,
+    "num_ctx": 512,
+}
+
+# Role lines TinyLlama likes to hallucinate after its answer.
+ROLE_LINE_RE = re.compile(r"(User:.*|Neuro:.*|Assistant:.*)", re.IGNORECASE)
+
+
+class OllamaUnavailable(Exception):
+    """Raised instead of calling Ollama while the circuit breaker is open."""
+
+
+class OllamaBusy(OllamaUnavailable):
+    """Raised when admission control sheds a request (queue full or over budget)."""
+
+
+def build_payload(user_message, stream=False, kind=None):
+    """The /api/generate request for ``user_message``; ``kind`` picks the reply budget."""
+    session.start()
+    return session.payload(user_message, stream, kind)
+
+
+def clean_reply(text):
+    """Strip role lines from a raw generation; None if nothing useful is left."""
+    reply = ROLE_LINE_RE.sub("", text.strip()).strip()
+    return reply if reply else None
+
+
+# ==================== CIRCUIT BREAKER ====================
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open -> closed.
+
+    While open, ``allow()`` is False until ``reset_timeout`` has passed; then
+    a single probe call is let through (half-open). Its success closes the
+    breaker, its failure re-opens it for another ``reset_timeout``. A probe
+    that never gets an answer (shed by admission control, cancelled) must be
+    handed back with ``abandon()`` so the next call can probe instead.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    # allow() returns this (truthy) for the half-open probe call.
+    PROBE = "probe"
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.short_circuited = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return self.PROBE
+            self.short_circuited += 1
+            return False
+
+    def abandon(self, permit):
+        """Hand back ``allow()``'s permit for a call that never reached Ollama.
+
+        An abandoned probe puts the breaker back to open with its timeout
+        already spent, so the next call probes again.
+        """
+        if permit != self.PROBE:
+            return
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = 0.0
+            if self.state == self.OPEN:
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "times_opened": self.times_opened,
+                "short_circuited": self.short_circuited,
+                "retry_in_seconds": round(retry_in, 1),
+            }
+
+
+breaker = CircuitBreaker(OLLAMA_BREAKER_THRESHOLD, OLLAMA_BREAKER_RESET)
+
+# ==================== REPLY CACHE ====================
+reply_cache = ResponseCache(
+    max_entries=0 if OLLAMA_CACHE_BACKEND == "none" else OLLAMA_CACHE_SIZE,
+    ttl=OLLAMA_CACHE_TTL,
+    django_alias=OLLAMA_CACHE_ALIAS if OLLAMA_CACHE_BACKEND == "django" else None,
+)
+
+
+def _cache_key(user_message):
+    return reply_cache.key(user_message, OLLAMA_MODEL, OLLAMA_OPTIONS, SYSTEM_PROMPT)
+
+
+def cached_ollama_reply(user_message):
+    """Cached cleaned reply for this message, or None."""
+    if not reply_cache.enabled:
+        return None
+    return reply_cache.get(_cache_key(user_message))
+
+
+async def acached_ollama_reply(user_message):
+    """``cached_ollama_reply`` without blocking the event loop on a shared cache."""
+    if not reply_cache.enabled:
+        return None
+    return await reply_cache.aget(_cache_key(user_message))
+
+
+def remember_ollama_reply(user_message, reply):
+    if reply and reply_cache.enabled:
+        reply_cache.set(_cache_key(user_message), reply)
+
+
+# ==================== ADMISSION CONTROL ====================
+admission = AdmissionController(OLLAMA_MAX_CONCURRENCY, OLLAMA_MAX_QUEUE, OLLAMA_QUEUE_TIMEOUT)
+
+
+def _admitted(ticket, priority, mode):
+    """Record an admission decision; False means answer with the fallback."""
+    OLLAMA_ADMISSIONS.inc(priority=priority, outcome=ticket.outcome)
+    OLLAMA_QUEUE_SECONDS.observe(ticket.waited, priority=priority)
+    if not ticket.admitted:
+        OLLAMA_CALLS.inc(mode=mode, outcome="shed")
+        logger.info("🚦 Ollama busy (%s after %.2fs), using fallback", ticket.outcome, ticket.waited)
+    return ticket.admitted
+
+
+@REGISTRY.gauge("chat_ollama_queue_depth", "Requests waiting for an Ollama slot.", ("priority",)).collect_from
+def _queue_depth():
+    return {(name,): count for name, count in admission.stats()["waiting"].items()}
+
+
+# ==================== REQUEST COALESCING ====================
+flights = SingleFlight()
+# How long a follower waits for someone else's generation before falling
+# back; also the lifetime of a cross-worker lock left by a crashed worker.
+COALESCE_WAIT = OLLAMA_CONNECT_TIMEOUT + OLLAMA_TIMEOUT + 5
+COALESCE_POLL_INTERVAL = 0.1
+_SHARED_COALESCING = OLLAMA_COALESCE and OLLAMA_CACHE_BACKEND == "django"
+
+
+def _claim_shared(key):
+    """Take the cross-worker lock for ``key``, or wait for the worker holding it.
+
+    Returns ``(True, None)`` when this worker should generate (then call
+    ``_release_shared``), or ``(False, reply)`` with the other worker's
+    cached reply (None if none arrived in time).
+    """
+    if not _SHARED_COALESCING:
+        return True, None
+    shared = caches[OLLAMA_CACHE_ALIAS]
+    lock = f"{key}:lock"
+    deadline = time.monotonic() + COALESCE_WAIT
+    while True:
+        if shared.add(lock, os.getpid(), int(COALESCE_WAIT)):
+            # The previous holder may have finished just before we got here.
+            reply = shared.get(key)
+            if reply is None:
+                return True, None
+            shared.delete(lock)
+            return False, reply
+        time.sleep(COALESCE_POLL_INTERVAL)
+        reply = shared.get(key)
+        if reply is not None or time.monotonic() >= deadline:
+            OLLAMA_COALESCED.inc(scope="shared")
+            return False, reply
+
+
+def _release_shared(key):
+    if _SHARED_COALESCING:
+        caches[OLLAMA_CACHE_ALIAS].delete(f"{key}:lock")
+
+
+async def _aclaim_shared(key):
+    """Async ``_claim_shared``: polls without blocking the event loop."""
+    if not _SHARED_COALESCING:
+        return True, None
+    shared = caches[OLLAMA_CACHE_ALIAS]
+    lock = f"{key}:lock"
+    deadline = time.monotonic() + COALESCE_WAIT
+    while True:
+        if await shared.aadd(lock, os.getpid(), int(COALESCE_WAIT)):
+            reply = await shared.aget(key)
+            if reply is None:
+                return True, None
+            await shared.adelete(lock)
+            return False, reply
+        await asyncio.sleep(COALESCE_POLL_INTERVAL)
+        reply = await shared.aget(key)
+        if reply is not None or time.monotonic() >= deadline:
+            OLLAMA_COALESCED.inc(scope="shared")
+            return False, reply
+
+
+async def _arelease_shared(key):
+    if _SHARED_COALESCING:
+        await caches[OLLAMA_CACHE_ALIAS].adelete(f"{key}:lock")
+
+
+def _follow(future):
+    """Reply of the in-flight generation this caller joined (None on timeout)."""
+    OLLAMA_COALESCED.inc(scope="worker")
+    logger.debug("🔗 Waiting for an identical in-flight Ollama generation")
+    try:
+        return future.result(timeout=COALESCE_WAIT)
+    except FutureTimeout:
+        return None
+
+
+async def _afollow(future):
+    OLLAMA_COALESCED.inc(scope="worker")
+    logger.debug("🔗 Waiting for an identical in-flight Ollama generation")
+    try:
+        # shield: timing out must not cancel the leader's future.
+        return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), COALESCE_WAIT)
+    except asyncio.TimeoutError:
+        return None
+
+
+@CACHE_LOOKUPS.collect_from
+def _reply_cache_lookups():
+    stats = reply_cache.stats()
+    return {
+        ("ollama_reply", "hit"): stats["hits"],
+        ("ollama_reply", "shared_hit"): stats["shared_hits"],
+        ("ollama_reply", "miss"): stats["misses"],
+    }
+
+# ==================== CONNECTION POOL ====================
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_POOL_SIZE))
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_POOL_SIZE))
+_SYNC_TIMEOUT = (OLLAMA_CONNECT_TIMEOUT, OLLAMA_TIMEOUT)
+
+
+def _post_generate(payload):
+    response = _session.post(OLLAMA_API_URL, json=payload, timeout=_SYNC_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def _post_warm_up(payload):
+    """``_post_generate`` for warm-up requests, through the circuit breaker.
+
+    Skipped (OllamaUnavailable) while the breaker is open, so a dead Ollama
+    isn't primed every interval; a warm-up's result counts like any call's.
+    """
+    permit = breaker.allow()
+    if not permit:
+        raise OllamaUnavailable("circuit breaker open")
+    try:
+        data = _post_generate(payload)
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return data
+
+
+# ==================== MODEL SESSION ====================
+session = ModelSession(
+    _post_warm_up,
+    OLLAMA_MODEL,
+    SYSTEM_PROMPT,
+    OLLAMA_OPTIONS,
+    keep_alive=OLLAMA_KEEP_ALIVE,
+    warm_interval=OLLAMA_WARM_INTERVAL,
+    reuse_context=OLLAMA_REUSE_CONTEXT,
+    max_tokens={"greeting": OLLAMA_GREETING_MAX_TOKENS},
+)
+
+
+def warm_model():
+    """Load the model and its prompt context now (at server start), not on the first message."""
+    try:
+        session.prime()
+        logger.info("🔥 Ollama model %s warmed up", OLLAMA_MODEL)
+    except Exception as e:
+        logger.warning("⚠️ Ollama warm-up failed: %s", e)
+    session.start()
+
+
+def warm_model_in_background():
+    """``warm_model`` on a thread of this (worker) process, so start-up doesn't wait for it."""
+    if OLLAMA_WARM_INTERVAL > 0:
+        threading.Thread(target=warm_model, name="ollama-warm-up", daemon=True).start()
+
+
+def warm_workers_after_fork():
+    """Warm every worker forked from this process (gunicorn --preload).
+
+    Nothing is opened or started here: a pooled connection or keep-warm
+    thread created in the master would be shared by, or missing from, the
+    forked workers. Without a fork the keep-warm thread starts with the
+    first generation instead.
+    """
+    if OLLAMA_WARM_INTERVAL > 0:
+        os.register_at_fork(after_in_child=warm_model_in_background)
+
+
+def _finished(mode, data):
+    record_generation(mode, data)
+    session.observe(data)
+
+
+def _rejected(error):
+    """Forget the cached prompt context if Ollama refused the request outright."""
+    status = getattr(getattr(error, "response", None), "status_code", None) or 0
+    if 400 <= status < 500:
+        session.forget_context()
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "failures": 0, "in_flight": 0}
+
+
+def _track(key, delta=1):
+    with _stats_lock:
+        _stats[key] += delta
+
+
+REGISTRY.gauge("chat_ollama_in_flight", "Ollama generations in progress.").collect_from(
+    lambda: {(): _stats["in_flight"]}
+)
+REGISTRY.gauge("chat_ollama_breaker_open", "1 while the Ollama circuit breaker is open.").collect_from(
+    lambda: {(): int(breaker.state == CircuitBreaker.OPEN)}
+)
+
+
+def _async_pool_stats():
+    """Usage of each event loop's httpx connection pool (the ASGI paths)."""
+    pools = []
+    for client in list(_async_clients.values()):
+        # httpx has no public pool stats; read them off its httpcore pool.
+        pool = getattr(client._transport, "_pool", None)
+        if pool is None:
+            continue
+        connections = list(pool.connections)
+        pools.append({
+            "connections_opened": len(connections),
+            "idle_connections": sum(conn.is_idle() for conn in connections),
+            # Requests being sent or waiting for a connection.
+            "requests_in_progress": len(getattr(pool, "_requests", ())),
+            "max_size": OLLAMA_POOL_SIZE,
+        })
+    return pools
+
+
+def ollama_metrics():
+    """Counters, connection-pool usage and breaker state for the status endpoint.
+
+    ``pools`` is the requests session used by the blocking and WSGI
+    streaming calls, ``async_pools`` the httpx clients of the ASGI paths.
+    """
+    with _stats_lock:
+        calls = dict(_stats)
+    pools = []
+    for adapter in _session.adapters.values():
+        for key in list(adapter.poolmanager.pools.keys()):
+            pool = adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            pools.append({
+                "host": f"{pool.host}:{pool.port}",
+                "connections_opened": pool.num_connections,
+                "requests_sent": pool.num_requests,
+                # The queue is pre-filled with None placeholders for
+                # connections never opened; only count real ones.
+                "idle_connections": sum(conn is not None for conn in list(pool.pool.queue)) if pool.pool else 0,
+                "max_size": OLLAMA_POOL_SIZE,
+            })
+    return {
+        "calls": calls,
+        "pools": pools,
+        "async_pools": _async_pool_stats(),
+        "breaker": breaker.snapshot(),
+        "cache": reply_cache.stats(),
+        "admission": admission.stats(),
+        "model": session.stats(),
+        "coalescing": {"enabled": OLLAMA_COALESCE, "shared": _SHARED_COALESCING, **flights.stats()},
+    }
+
+
+# ==================== BLOCKING CALL ====================
+def get_ollama_response(user_message, priority=DEFAULT_PRIORITY):
+    """Get Ollama AI response - FIXED PROMPT & TIMEOUT, served from cache when possible
+
+    ``priority`` (see chat.admission) orders the wait for a generation slot;
+    None means the request was shed or Ollama failed, so use the fallback.
+    """
+    cached = cached_ollama_reply(user_message)
+    if cached:
+        logger.debug("💾 Ollama reply served from cache")
+        querylog.note(cache_hit=True)
+        return cached
+    if not OLLAMA_COALESCE:
+        return _generate(user_message, priority)
+
+    key = _cache_key(user_message)
+    future, leader = flights.join(key)
+    if not leader:
+        return _follow(future)
+    reply = None
+    try:
+        lead, reply = _claim_shared(key)
+        if lead:
+            try:
+                reply = _generate(user_message, priority)
+            finally:
+                _release_shared(key)
+        return reply
+    finally:
+        flights.finish(key, future, reply)
+
+
+def _generate(user_message, priority):
+    reply = _call_ollama(user_message, priority)
+    remember_ollama_reply(user_message, reply)
+    return reply
+
+
+def _call_ollama(user_message, priority):
+    permit = breaker.allow()
+    if not permit:
+        OLLAMA_CALLS.inc(mode="blocking", outcome="short_circuit")
+        logger.info("⚡ Ollama circuit open, using fallback")
+        return None
+
+    with admission.slot(priority) as ticket:
+        if not _admitted(ticket, priority, "blocking"):
+            breaker.abandon(permit)
+            return None
+        _track("requests")
+        _track("in_flight")
+        try:
+            with span("ollama"):
+                data = _post_generate(build_payload(user_message, kind=priority))
+            breaker.record_success()
+            OLLAMA_CALLS.inc(mode="blocking", outcome="ok")
+            _finished("blocking", data)
+
+            # 🔥 CLEAN unwanted lines (FIX 1)
+            return clean_reply(data.get("response", ""))
+
+        except requests.exceptions.Timeout:
+            breaker.record_failure()
+            _track("failures")
+            OLLAMA_CALLS.inc(mode="blocking", outcome="timeout")
+            logger.error("❌ Ollama timeout (>%s sec)", OLLAMA_TIMEOUT)
+            return None
+        except Exception as e:
+            breaker.record_failure()
+            _track("failures")
+            OLLAMA_CALLS.inc(mode="blocking", outcome="error")
+            _rejected(e)
+            logger.error("❌ Ollama error: %s", e)
+            return None
+        finally:
+            _track("in_flight", -1)
+
+
+# ==================== STREAMING CALL ====================
+def stream_ollama_response(user_message, priority=DEFAULT_PRIORITY):
+    """Yield raw token strings as Ollama generates them.
+
+    Ollama streams NDJSON, one ``{"response": "...", "done": false}`` object
+    per token. Errors propagate to the caller, which decides on a fallback;
+    the read timeout applies to each chunk, not to the whole generation.
+    Raises OllamaUnavailable without calling out while the breaker is open,
+    and OllamaBusy when the request is shed by admission control.
+    The cleaned reply is cached once the stream completes. A caller that
+    joins an identical in-flight generation gets its finished reply as a
+    single chunk (nothing if it failed).
+    """
+    if not OLLAMA_COALESCE:
+        yield from _stream_and_remember(user_message, priority)
+        return
+
+    key = _cache_key(user_message)
+    future, leader = flights.join(key)
+    if not leader:
+        reply = _follow(future)
+        if reply:
+            yield reply
+        return
+    reply = None
+    try:
+        lead, reply = _claim_shared(key)
+        if not lead:
+            if reply:
+                yield reply
+            return
+        try:
+            reply = yield from _stream_and_remember(user_message, priority)
+        finally:
+            _release_shared(key)
+    finally:
+        flights.finish(key, future, reply)
+
+
+def _stream_and_remember(user_message, priority):
+    """Stream tokens; returns (via StopIteration) the cleaned, cached reply."""
+    tokens = []
+    for token in _stream_tokens(user_message, priority):
+        tokens.append(token)
+        yield token
+    reply = clean_reply("".join(tokens))
+    remember_ollama_reply(user_message, reply)
+    return reply
+
+
+def _stream_tokens(user_message, priority):
+    permit = breaker.allow()
+    if not permit:
+        OLLAMA_CALLS.inc(mode="stream", outcome="short_circuit")
+        raise OllamaUnavailable("Ollama circuit open")
+
+    with admission.slot(priority) as ticket:
+        if not _admitted(ticket, priority, "stream"):
+            breaker.abandon(permit)
+            raise OllamaBusy(f"Ollama busy ({ticket.outcome})")
+        payload = build_payload(user_message, stream=True, kind=priority)
+        _track("requests")
+        _track("in_flight")
+        try:
+            with span("ollama"), _session.post(OLLAMA_API_URL, json=payload, stream=True, timeout=_SYNC_TIMEOUT) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    token = chunk.get("response", "")
+                    if token:
+                        yield token
+                    if chunk.get("done"):
+                        # The last chunk carries the generation timings.
+                        _finished("stream", chunk)
+                        break
+            breaker.record_success()
+            OLLAMA_CALLS.inc(mode="stream", outcome="ok")
+        except GeneratorExit:
+            # Client went away mid-stream; Ollama itself was fine.
+            breaker.record_success()
+            OLLAMA_CALLS.inc(mode="stream", outcome="cancelled")
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            _track("failures")
+            OLLAMA_CALLS.inc(mode="stream", outcome="error")
+            _rejected(e)
+            raise
+        finally:
+            _track("in_flight", -1)
+
+
+# ==================== ASYNC CALL ====================
+# httpx clients are bound to the loop that created them, so keep one per
+# running loop (normally just the ASGI server's).
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _loop_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = httpx.AsyncClient(
+            timeout=httpx.Timeout(OLLAMA_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=OLLAMA_POOL_SIZE, max_keepalive_connections=OLLAMA_POOL_SIZE),
+        )
+    return client
+
+
+async def aget_ollama_response(user_message, priority=DEFAULT_PRIORITY):
+    """Non-blocking get_ollama_response for the ASGI path.
+
+    Requests waiting for a generation slot don't hold a worker thread.
+    """
+    key = _cache_key(user_message)
+    if reply_cache.enabled:
+        cached = await reply_cache.aget(key)
+        if cached:
+            logger.debug("💾 Ollama reply served from cache")
+            querylog.note(cache_hit=True)
+            return cached
+    if not OLLAMA_COALESCE:
+        return await _agenerate(key, user_message, priority)
+
+    future, leader = flights.join(key)
+    if not leader:
+        return await _afollow(future)
+    reply = None
+    try:
+        lead, reply = await _aclaim_shared(key)
+        if lead:
+            try:
+                reply = await _agenerate(key, user_message, priority)
+            finally:
+                await _arelease_shared(key)
+        return reply
+    finally:
+        flights.finish(key, future, reply)
+
+
+async def _agenerate(key, user_message, priority):
+    reply = await _acall_ollama(user_message, priority)
+    if reply and reply_cache.enabled:
+        await reply_cache.aset(key, reply)
+    return reply
+
+
+async def _acall_ollama(user_message, priority):
+    permit = breaker.allow()
+    if not permit:
+        OLLAMA_CALLS.inc(mode="async", outcome="short_circuit")
+        logger.info("⚡ Ollama circuit open, using fallback")
+        return None
+    try:
+        return await _acall_admitted(user_message, priority, permit)
+    except asyncio.CancelledError:
+        # Cancelled while queued or mid-request: no verdict on Ollama.
+        breaker.abandon(permit)
+        raise
+
+
+async def _acall_admitted(user_message, priority, permit):
+    async with admission.aslot(priority) as ticket:
+        if not _admitted(ticket, priority, "async"):
+            breaker.abandon(permit)
+            return None
+        client = _loop_client()
+        _track("requests")
+        _track("in_flight")
+        try:
+            with span("ollama"):
+                response = await client.post(OLLAMA_API_URL, json=build_payload(user_message, kind=priority))
+                response.raise_for_status()
+                data = response.json()
+            breaker.record_success()
+            OLLAMA_CALLS.inc(mode="async", outcome="ok")
+            _finished("async", data)
+            return clean_reply(data.get("response", ""))
+
+        except httpx.TimeoutException:
+            breaker.record_failure()
+            _track("failures")
+            OLLAMA_CALLS.inc(mode="async", outcome="timeout")
+            logger.error("❌ Ollama timeout (>%s sec)", OLLAMA_TIMEOUT)
+            return None
+        except Exception as e:
+            breaker.record_failure()
+            _track("failures")
+            OLLAMA_CALLS.inc(mode="async", outcome="error")
+            _rejected(e)
+            logger.error("❌ Ollama error: %s", e)
+            return None
+        finally:
+            _track("in_flight", -1)
+
+
+# ==================== ASYNC STREAMING CALL ====================
+async def astream_ollama_response(user_message, priority=DEFAULT_PRIORITY):
+    """Async ``stream_ollama_response`` for the ASGI path.
+
+    Tokens are read with httpx as Ollama sends them, so a streaming reply
+    neither holds a worker thread nor gets buffered by Django (which reads a
+    sync generator to the end before sending anything under ASGI). Same
+    breaker, admission, coalescing and caching behaviour as the sync version.
+    """
+    key = _cache_key(user_message)
+    if not OLLAMA_COALESCE:
+        async for token in _astream_and_remember(key, user_message, priority, {}):
+            yield token
+        return
+
+    future, leader = flights.join(key)
+    if not leader:
+        reply = await _afollow(future)
+        if reply:
+            yield reply
+        return
+    result = {}
+    try:
+        lead, result["reply"] = await _aclaim_shared(key)
+        if not lead:
+            if result["reply"]:
+                yield result["reply"]
+            return
+        try:
+            async for token in _astream_and_remember(key, user_message, priority, result):
+                yield token
+        finally:
+            await _arelease_shared(key)
+    finally:
+        flights.finish(key, future, result.get("reply"))
+
+
+async def _astream_and_remember(key, user_message, priority, result):
+    """Stream tokens; the cleaned, cached reply is left in ``result["reply"]``."""
+    tokens = []
+    async for token in _astream_tokens(user_message, priority):
+        tokens.append(token)
+        yield token
+    result["reply"] = clean_reply("".join(tokens))
+    if result["reply"] and reply_cache.enabled:
+        await reply_cache.aset(key, result["reply"])
+
+
+async def _astream_tokens(user_message, priority):
+    permit = breaker.allow()
+    if not permit:
+        OLLAMA_CALLS.inc(mode="stream", outcome="short_circuit")
+        raise OllamaUnavailable("Ollama circuit open")
+    started = answered = False
+    try:
+        async with admission.aslot(priority) as ticket:
+            if not _admitted(ticket, priority, "stream"):
+                breaker.abandon(permit)
+                raise OllamaBusy(f"Ollama busy ({ticket.outcome})")
+            payload = build_payload(user_message, stream=True, kind=priority)
+            _track("requests")
+            _track("in_flight")
+            started = True
+            try:
+                with span("ollama"):
+                    async with _loop_client().stream("POST", OLLAMA_API_URL, json=payload) as response:
+                        response.raise_for_status()
+                        answered = True
+                        async for line in response.aiter_lines():
+                            if not line:
+                                continue
+                            chunk = json.loads(line)
+                            token = chunk.get("response", "")
+                            if token:
+                                yield token
+                            if chunk.get("done"):
+                                _finished("stream", chunk)
+                                break
+                breaker.record_success()
+                OLLAMA_CALLS.inc(mode="stream", outcome="ok")
+            except (GeneratorExit, asyncio.CancelledError):
+                # Client went away mid-stream; Ollama itself was fine if it answered.
+                if answered:
+                    breaker.record_success()
+                else:
+                    breaker.abandon(permit)
+                OLLAMA_CALLS.inc(mode="stream", outcome="cancelled")
+                raise
+            except Exception as e:
+                breaker.record_failure()
+                _track("failures")
+                OLLAMA_CALLS.inc(mode="stream", outcome="error")
+                _rejected(e)
+                raise
+            finally:
+                _track("in_flight", -1)
+    except asyncio.CancelledError:
+        if not started:
+            # Cancelled while waiting for a slot.
+            breaker.abandon(permit)
+        raise
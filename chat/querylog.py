@@ -0,0 +1,190 @@
+"""Chat query log: what users ask and how it was answered, for demand analytics.
+
+A request collects its details while it runs: ``begin()`` starts an entry
+in a context variable, and the pipeline adds the chosen bank and cache hits
+with ``note()``. ``record()`` turns the entry into an unsaved ChatQueryLog
+row and appends it to an in-process buffer. A background thread writes the
+buffer with one ``bulk_create`` per batch, so requests never wait on the
+database and SQLite sees one short write transaction every
+QUERY_LOG_FLUSH_INTERVAL seconds instead of one per message. If the
+database falls behind, the oldest unwritten rows are dropped once
+QUERY_LOG_MAX_BUFFER rows are waiting. Rows still buffered at exit are
+flushed by an atexit hook.
+
+``manage.py rollup_chat_queries`` aggregates the log into hourly rows.
+"""
+import atexit
+import contextvars
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+QUERY_LOG_ENABLED = getattr(settings, "QUERY_LOG_ENABLED", True)
+QUERY_LOG_BATCH_SIZE = getattr(settings, "QUERY_LOG_BATCH_SIZE", 200)
+QUERY_LOG_FLUSH_INTERVAL = getattr(settings, "QUERY_LOG_FLUSH_INTERVAL", 2.0)
+QUERY_LOG_MAX_BUFFER = getattr(settings, "QUERY_LOG_MAX_BUFFER", 10000)
+# Longer messages are stored truncated.
+MESSAGE_MAX_LENGTH = 2000
+# PositiveIntegerField range; a salary outside it ("I earn 99999999999999") is stored as unknown.
+SALARY_MAX = 2147483647
+# Monthly salary bands for the hourly rollup: (upper bound, label)
+SALARY_BANDS = ((25000, "<25k"), (50000, "25k-50k"), (100000, "50k-1L"), (200000, "1L-2L"))
+TOP_SALARY_BAND = "2L+"
+UNKNOWN_SALARY_BAND = "unknown"
+
+QUERY_LOG_ROWS = REGISTRY.counter(
+    "chat_query_log_rows_total", "Query log rows by outcome (written, dropped, failed).", ("outcome",),
+)
+
+_entry = contextvars.ContextVar("chat_query_log_entry", default=None)
+
+
+# ==================== PER-REQUEST ENTRY ====================
+def begin():
+    """Start this request's log entry; returns it (None when logging is off)."""
+    entry = {} if QUERY_LOG_ENABLED else None
+    _entry.set(entry)
+    return entry
+
+
+def resume(entry):
+    """Continue ``entry`` in another context (e.g. a streaming response's generator)."""
+    _entry.set(entry)
+
+
+def note(**fields):
+    """Add details (``bank``, ``cache_hit``) to the current request's entry, if any."""
+    entry = _entry.get()
+    if entry is not None:
+        entry.update(fields)
+
+
+def record(route, message, parsed, seconds):
+    """Queue the current request's log row; ``parsed`` is its (context-merged) classification."""
+    entry = _entry.get()
+    if entry is None:
+        return
+    _entry.set(None)
+    from .models import ChatQueryLog
+
+    buffer.add(ChatQueryLog(
+        created_at=timezone.now(),
+        route=route,
+        message=message[:MESSAGE_MAX_LENGTH],
+        intent=parsed.intent,
+        salary=parsed.salary if parsed.salary is not None and 0 <= parsed.salary <= SALARY_MAX else None,
+        loan_type=parsed.loan_type or "",
+        bank=entry.get("bank") or "",
+        latency_ms=round(seconds * 1000, 3),
+        cache_hit=entry.get("cache_hit", False),
+    ))
+
+
+# ==================== BUFFER ====================
+class QueryLogBuffer:
+    """Bounded row buffer flushed with ``bulk_create`` by a per-process thread."""
+
+    def __init__(self, batch_size=200, interval=2.0, max_rows=10000):
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self._rows = deque(maxlen=max(1, max_rows))
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        atexit.register(self.flush)
+
+    def add(self, row):
+        self._ensure_thread()
+        if len(self._rows) == self._rows.maxlen:
+            # deque(maxlen) drops the oldest row on append.
+            self.dropped += 1
+            QUERY_LOG_ROWS.inc(outcome="dropped")
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self._wake.set()
+
+    def _ensure_thread(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # A forked child inherits the parent's buffer but not its thread.
+            self._pid = os.getpid()
+            self._rows.clear()
+            threading.Thread(target=self._run, name="chat-query-log", daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows written."""
+        with self._flush_lock:
+            total = 0
+            while self._rows:
+                batch = []
+                while self._rows and len(batch) < self.batch_size:
+                    batch.append(self._rows.popleft())
+                total += self._write(batch)
+            return total
+
+    def _write(self, batch):
+        error = self._insert(batch)
+        written = len(batch) if error is None else 0
+        if error is not None and len(batch) > 1:
+            # One bad row shouldn't cost the whole batch: retry them one by one.
+            written = sum(self._insert([row]) is None for row in batch)
+        if written:
+            self.written += written
+            QUERY_LOG_ROWS.inc(written, outcome="written")
+        failed = len(batch) - written
+        if failed:
+            # Typically "no such table" before migrate; don't retry forever.
+            self.failed += failed
+            QUERY_LOG_ROWS.inc(failed, outcome="failed")
+            logger.warning("⚠️ Could not write %d of %d query log rows: %s", failed, len(batch), error)
+        return written
+
+    @staticmethod
+    def _insert(rows):
+        """``bulk_create`` the rows; returns the exception if it failed."""
+        from .models import ChatQueryLog
+
+        try:
+            ChatQueryLog.objects.bulk_create(rows)
+        except Exception as e:
+            close_old_connections()
+            return e
+        return None
+
+    def stats(self):
+        return {
+            "buffered": len(self._rows),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+buffer = QueryLogBuffer(QUERY_LOG_BATCH_SIZE, QUERY_LOG_FLUSH_INTERVAL, QUERY_LOG_MAX_BUFFER)
+
+
+REGISTRY.gauge("chat_query_log_buffered", "Query log rows waiting to be written.").collect_from(
+    lambda: {(): len(buffer._rows)}
+)
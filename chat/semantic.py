@@ -0,0 +1,287 @@
+"""Semantic fallback: answer near-miss phrasings locally instead of asking Ollama.
+
+The keyword classifier (chat.intents) only knows its vocabulary, so "which
+bank is cheapest for a flat" or "how is my monthly instalment worked out"
+used to go to TinyLlama. Before that happens, ``SemanticIndex.match`` looks
+the message up in a small vector index of:
+
+- example phrasings of each loan type ("buy a flat", "wedding expenses"),
+- example questions for canned FAQ answers (EMI, credit score, fees, ...),
+- the catalog's own "Purpose" and "Remarks" text, labelled with the row's
+  loan type.
+
+Embeddings are hashed word, word-pair and character-trigram features
+(signed feature hashing into ``DIMENSIONS`` buckets, TF-weighted and
+L2-normalised), so there is no model to download and the index builds in
+milliseconds on CPU. Lookup is one NumPy matrix-vector product and a top-k.
+A match is used only when the best score clears ``threshold`` and beats the
+best entry with a different label by ``margin``; everything else still goes
+to the LLM.
+"""
+import hashlib
+import math
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+DIMENSIONS = 2048
+TOP_K = 5
+# Feature weights: whole words carry the meaning, word pairs keep a little
+# order, character trigrams catch inflections and typos ("cheapest"/"cheap").
+WORD_WEIGHT = 1.0
+PAIR_WEIGHT = 0.5
+TRIGRAM_WEIGHT = 0.3
+
+STOPWORDS = frozenset("""
+a an the is are am be to of for in on at by with and or it its this that
+i me my we our you your can could do does did should would will shall
+which what who whom how when where there here please tell about any some
+need needed want get take give required much many
+""".split())
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# label -> example messages. "loan:<Type>" answers from the catalog (or asks
+# for the salary); "faq:<key>" answers with FAQ_ANSWERS[key].
+EXAMPLES = {
+    "loan:Home": (
+        "which bank is cheapest for a flat",
+        "loan to buy a flat",
+        "buying an apartment",
+        "purchase a house",
+        "property purchase loan",
+        "construct a house on my plot",
+        "buy a 2bhk or 3bhk",
+        "home renovation",
+        "mortgage",
+        "housing finance",
+    ),
+    "loan:Car": (
+        "buy a new car",
+        "finance for a vehicle",
+        "loan for an suv",
+        "four wheeler finance",
+        "second hand car",
+        "buy a bike or scooter",
+        "two wheeler",
+        "auto finance",
+    ),
+    "loan:Personal": (
+        "loan for my wedding",
+        "wedding expenses",
+        "medical emergency funds",
+        "need cash for travel",
+        "pay for a vacation",
+        "consolidate my debts",
+        "urgent cash requirement",
+        "personal finance for any purpose",
+    ),
+    "faq:emi": (
+        "what is emi",
+        "how is emi calculated",
+        "monthly instalment meaning",
+        "how much will i pay every month",
+    ),
+    "faq:credit_score": (
+        "what is a credit score",
+        "what is cibil",
+        "how to improve my cibil score",
+        "minimum credit score needed",
+    ),
+    "faq:processing_fee": (
+        "what is a processing fee",
+        "are there any charges to apply",
+        "processing charges",
+    ),
+    "faq:prepayment": (
+        "can i prepay my loan",
+        "foreclose the loan early",
+        "part payment before tenure ends",
+        "prepayment penalty",
+    ),
+    "faq:documents": (
+        "what documents are required",
+        "documents needed to apply",
+        "which papers should i submit",
+        "what papers do i need",
+        "kyc documents",
+    ),
+    "faq:interest_type": (
+        "fixed or floating interest which is better",
+        "difference between fixed and floating rate",
+        "what is a floating rate",
+    ),
+    "faq:tenure": (
+        "how does loan tenure work",
+        "longest repayment period",
+        "how many years can i take to repay",
+    ),
+    "faq:compare": (
+        "which bank has the lowest interest rate",
+        "compare banks for me",
+        "best bank for a loan",
+        "cheapest lender",
+    ),
+}
+
+FAQ_ANSWERS = {
+    "emi": (
+        "An EMI (Equated Monthly Instalment) is the fixed amount you repay every month. "
+        "It covers that month's interest plus part of the principal, so the interest share "
+        "shrinks as the loan is paid down. Tell me your salary and loan type and I'll show "
+        "the EMI for the best offers! 😊"
+    ),
+    "credit_score": (
+        "Your credit (CIBIL) score runs from 300 to 900 and shows lenders how reliably "
+        "you've repaid before. A higher score gets more approvals and better rates. Paying "
+        "EMIs and card bills on time and keeping card usage low improve it. Mention your "
+        "score (e.g. \"CIBIL 720\") and I'll only show offers you qualify for."
+    ),
+    "processing_fee": (
+        "A processing fee is a one-time charge, usually a percentage of the loan amount, "
+        "for handling your application. My comparisons already include it in the total cost "
+        "of every offer."
+    ),
+    "prepayment": (
+        "Prepayment means repaying part or all of your loan before the tenure ends, which "
+        "saves interest. Each bank has its own rules, some only after a lock-in period, so "
+        "check the prepayment terms of the offer you pick."
+    ),
+    "documents": (
+        "Banks usually ask for ID proof, address proof, recent salary slips and bank "
+        "statements; home loans also need property papers. Ask about a specific loan and "
+        "I'll show each bank's exact list."
+    ),
+    "interest_type": (
+        "A fixed rate keeps your EMI the same for the whole tenure. A floating rate follows "
+        "the market, so the EMI can go down or up. Fixed suits a tight budget; floating is "
+        "often cheaper when rates are falling."
+    ),
+    "tenure": (
+        "The tenure is how long you take to repay. A longer tenure lowers the EMI but you "
+        "pay more interest overall; a shorter one costs less in total. Each offer I show "
+        "lists its allowed tenure range."
+    ),
+    "compare": (
+        "I can compare every bank in my list for you! Tell me your monthly salary and the "
+        "loan you need (car, home or personal), e.g. \"I earn 40000, need home loan\"."
+    ),
+}
+
+Match = namedtuple("Match", "label score text")
+
+
+# ==================== EMBEDDINGS ====================
+@lru_cache(maxsize=65536)
+def _bucket(feature):
+    """(index, sign) of a feature; stable across processes, unlike hash()."""
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % DIMENSIONS, 1.0 if value >> 63 else -1.0
+
+
+def features(text):
+    """{feature: weight} for a message: content words, word pairs and character trigrams."""
+    words = [w for w in _WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+    weights = {}
+
+    def add(feature, weight):
+        weights[feature] = weights.get(feature, 0.0) + weight
+
+    for word in words:
+        add(f"w:{word}", WORD_WEIGHT)
+        padded = f"#{word}#"
+        grams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+        for gram in grams:
+            add(f"c:{gram}", TRIGRAM_WEIGHT / math.sqrt(len(grams)))
+    for first, second in zip(words, words[1:]):
+        add(f"p:{first} {second}", PAIR_WEIGHT)
+    return weights
+
+
+def embed(texts):
+    """L2-normalised hashed embeddings, one row per text (float32 matrix)."""
+    # Imported here so workers boot without NumPy (see chat/catalog.py).
+    import numpy as np
+
+    matrix = np.zeros((len(texts), DIMENSIONS), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feature, weight in features(text).items():
+            index, sign = _bucket(feature)
+            # Sublinear TF: repeating a word shouldn't dominate the vector.
+            matrix[row, index] += sign * (1.0 + math.log(weight)) if weight > 1.0 else sign * weight
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def catalog_examples(catalog):
+    """(text, "loan:<Type>") pairs from the catalog's Purpose and Remarks columns.
+
+    Text sharing a word with another loan type's text ("Insurance required"
+    vs "Insurance optional") says nothing about which one the user wants,
+    so it is left out.
+    """
+    if catalog is None or catalog.empty or not catalog.has_column("Loan Type"):
+        return []
+    seen = {}
+    for row_id in range(len(catalog)):
+        row = catalog.row(row_id)
+        loan_type = str(row.get("Loan Type", "")).strip().title()
+        if not loan_type:
+            continue
+        for column in ("Purpose", "Remarks"):
+            text = str(row.get(column, "")).strip()
+            if _WORD_RE.search(text.lower()):
+                seen.setdefault(text.lower(), set()).add(loan_type)
+    word_types = {}
+    for text, types in seen.items():
+        for word in set(_WORD_RE.findall(text)) - STOPWORDS:
+            word_types.setdefault(word, set()).update(types)
+    return [
+        (text, f"loan:{next(iter(types))}")
+        for text, types in seen.items()
+        if all(word_types[word] == types for word in set(_WORD_RE.findall(text)) - STOPWORDS) and len(types) == 1
+    ]
+
+
+# ==================== INDEX ====================
+class SemanticIndex:
+    """Labelled example texts with their embeddings; ``match`` finds the nearest label."""
+
+    def __init__(self, examples, threshold=0.4, margin=0.08):
+        self.texts = [text for text, _ in examples]
+        self.labels = [label for _, label in examples]
+        self.threshold = threshold
+        self.margin = margin
+        self.vectors = embed(self.texts)
+
+    @classmethod
+    def build(cls, catalog=None, threshold=0.4, margin=0.08):
+        examples = [(text, label) for label, texts in EXAMPLES.items() for text in texts]
+        return cls(examples + catalog_examples(catalog), threshold, margin)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def search(self, message, k=TOP_K):
+        """The ``k`` nearest examples as ``Match`` tuples, best first (cosine similarity)."""
+        import numpy as np
+
+        if not self.texts:
+            return []
+        scores = self.vectors @ embed([message])[0]
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [Match(self.labels[i], float(scores[i]), self.texts[i]) for i in top]
+
+    def match(self, message):
+        """Best ``Match`` if it is confident enough, else None."""
+        hits = self.search(message)
+        if not hits or hits[0].score < self.threshold:
+            return None
+        best = hits[0]
+        runner_up = next((hit.score for hit in hits[1:] if hit.label != best.label), 0.0)
+        if best.score - runner_up < self.margin:
+            return None
+        return best
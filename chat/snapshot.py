@@ -0,0 +1,233 @@
+"""Compact binary snapshot of the loan catalog.
+
+``manage.py build_loan_catalog`` compiles the CSV into one file::
+
+    b"LOANCAT\\0" | u32 format | u32 header length | JSON header | column blocks
+
+Numeric columns are fixed-width little-endian arrays: int64, float64 (NaN
+for missing) and int8 for booleans (-1 for missing). Text columns are
+dictionary-encoded as int32 codes (-1 for missing) plus a table of the
+distinct strings: uint32 offsets into one UTF-8 blob. Every block starts on
+an 8-byte boundary.
+
+The file is memory-mapped read-only, so all workers on a host share one
+physical copy of its pages. Rows only become dicts when a request asks for
+them. The header records the SHA-1 of the CSV it was built from, and
+``CatalogLoader`` ignores a snapshot that no longer matches the CSV.
+"""
+import json
+import math
+import mmap
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"LOANCAT\x00"
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGN = 8
+
+
+class SnapshotError(Exception):
+    """The file is not a catalog snapshot this code can read."""
+
+
+def _column_kind(values):
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, bool) for v in present):
+        return "bool"
+    if present and all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        # pandas can't hold a missing int either; it becomes a float column.
+        return "int" if len(present) == len(values) else "float"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return "float"
+    return "str"
+
+
+def _encode_column(values, kind):
+    """(header fields, [byte blocks]) for one column."""
+    if kind == "int":
+        return {}, [np.asarray(values, dtype="<i8").tobytes()]
+    if kind == "float":
+        return {}, [np.array([math.nan if v is None else v for v in values], dtype="<f8").tobytes()]
+    if kind == "bool":
+        return {}, [np.array([-1 if v is None else int(v) for v in values], dtype="<i1").tobytes()]
+
+    codes, table = [], {}
+    for value in values:
+        codes.append(-1 if value is None else table.setdefault(str(value), len(table)))
+    encoded = [text.encode("utf-8") for text in table]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    blocks = [np.asarray(codes, dtype="<i4").tobytes(), offsets.tobytes(), b"".join(encoded)]
+    return {"strings": len(encoded)}, blocks
+
+
+def write_snapshot(path, columns, records, source_digest):
+    """Write ``records`` (dicts, missing cells omitted) as a snapshot at ``path``.
+
+    The file is written next to ``path`` and renamed over it, so processes
+    that already mapped the old snapshot keep reading it unharmed.
+    """
+    layout, payload = [], []
+    for name in columns:
+        values = [record.get(name) for record in records]
+        kind = _column_kind(values)
+        fields, blocks = _encode_column(values, kind)
+        layout.append(dict(fields, name=name, kind=kind, sizes=[len(b) for b in blocks]))
+        payload.extend(blocks)
+
+    header = {"format": FORMAT_VERSION, "rows": len(records), "source_digest": source_digest, "columns": layout}
+    header_bytes = json.dumps(header).encode("utf-8")
+    start = _PREAMBLE.size + len(header_bytes)
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as fh:
+        fh.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        fh.write(header_bytes)
+        position = start
+        for block in payload:
+            pad = -position % _ALIGN
+            fh.write(b"\x00" * pad + block)
+            position += pad + len(block)
+    os.replace(tmp_path, path)
+    return position
+
+
+def _read_header(buffer):
+    if len(buffer) < _PREAMBLE.size:
+        raise SnapshotError("file too short")
+    magic, version, header_len = _PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise SnapshotError("not a loan catalog snapshot")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"snapshot format {version}, expected {FORMAT_VERSION}")
+    header = json.loads(bytes(buffer[_PREAMBLE.size:_PREAMBLE.size + header_len]))
+    return header, _PREAMBLE.size + header_len
+
+
+def snapshot_digest(path):
+    """SHA-1 of the CSV a snapshot was built from, without mapping the data."""
+    with open(path, "rb") as fh:
+        preamble = fh.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            raise SnapshotError("file too short")
+        header_len = _PREAMBLE.unpack(preamble)[2]
+        header, _ = _read_header(preamble + fh.read(header_len))
+    return header["source_digest"]
+
+
+class _TextColumn:
+    """Dictionary-encoded strings, decoded on first use per process."""
+
+    def __init__(self, codes, offsets, blob):
+        self.codes = codes
+        self._offsets = offsets
+        self._blob = blob
+        self._decoded = {}
+
+    def value(self, code):
+        text = self._decoded.get(code)
+        if text is None:
+            text = bytes(self._blob[self._offsets[code]:self._offsets[code + 1]]).decode("utf-8")
+            self._decoded[code] = text
+        return text
+
+    def __getitem__(self, row):
+        code = int(self.codes[row])
+        return None if code < 0 else self.value(code)
+
+    def tolist(self):
+        return [None if code < 0 else self.value(code) for code in self.codes.tolist()]
+
+
+class SnapshotRecords:
+    """Read-only, sequence-of-dicts view over a memory-mapped snapshot."""
+
+    def __init__(self, path):
+        with open(path, "rb") as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        header, position = _read_header(buffer)
+        self.source_digest = header["source_digest"]
+        self._rows = header["rows"]
+        self.columns = []
+        self._data = {}
+        self._kinds = {}
+
+        def take(size, dtype=None, count=None):
+            nonlocal position
+            position += -position % _ALIGN
+            start, position = position, position + size
+            if dtype is None:
+                return buffer[start:position]
+            return np.frombuffer(self._mmap, dtype=dtype, count=count, offset=start)
+
+        n = self._rows
+        for column in header["columns"]:
+            name, kind, sizes = column["name"], column["kind"], column["sizes"]
+            if kind == "int":
+                data = take(sizes[0], "<i8", n)
+            elif kind == "float":
+                data = take(sizes[0], "<f8", n)
+            elif kind == "bool":
+                data = take(sizes[0], "<i1", n)
+            elif kind == "str":
+                codes = take(sizes[0], "<i4", n)
+                offsets = take(sizes[1], "<u4", column["strings"] + 1)
+                data = _TextColumn(codes, offsets, take(sizes[2]))
+            else:
+                raise SnapshotError(f"unknown column kind {kind!r}")
+            self.columns.append(name)
+            self._data[name] = data
+            self._kinds[name] = kind
+
+    def __len__(self):
+        return self._rows
+
+    def _value(self, name, row):
+        kind, data = self._kinds[name], self._data[name]
+        if kind == "str":
+            return data[row]
+        value = data[row]
+        if kind == "int":
+            return int(value)
+        if kind == "bool":
+            return None if value < 0 else bool(value)
+        return None if math.isnan(value) else float(value)
+
+    def __getitem__(self, row):
+        if not 0 <= row < self._rows:
+            raise IndexError(row)
+        record = {}
+        for name in self.columns:
+            value = self._value(name, row)
+            if value is not None:
+                record[name] = value
+        return record
+
+    def __iter__(self):
+        for row in range(self._rows):
+            yield self[row]
+
+    def column_values(self, name):
+        """All values of one column as Python objects (None where missing)."""
+        data = self._data.get(name)
+        if data is None:
+            return [None] * self._rows
+        kind = self._kinds[name]
+        if kind == "str":
+            return data.tolist()
+        if kind == "bool":
+            return [None if v < 0 else bool(v) for v in data.tolist()]
+        if kind == "float":
+            return [None if math.isnan(v) else v for v in data.tolist()]
+        return data.tolist()
+
+    def numeric_column(self, name):
+        """float64 array of a numeric column (NaN where missing), or None."""
+        kind = self._kinds.get(name)
+        if kind in ("int", "float"):
+            return self._data[name].astype(np.float64)
+        return None
@@ -0,0 +1,318 @@
+// DOM Elements
+const chatMessages = document.getElementById('chatMessages');
+const userInput = document.getElementById('userInput');
+const sendBtn = document.getElementById('sendBtn');
+
+const typingIndicator = document.createElement('div');
+typingIndicator.className = 'typing-indicator';
+typingIndicator.id = 'typingIndicator';
+typingIndicator.innerHTML = '<span class="typing-dot"></span><span class="typing-dot"></span><span class="typing-dot"></span>';
+
+// Get CSRF Token
+function getCookie(name) {
+    let cookieValue = null;
+    if (document.cookie && document.cookie !== '') {
+        const cookies = document.cookie.split(';');
+        for (let i = 0; i < cookies.length; i++) {
+            const cookie = cookies[i].trim();
+            if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                break;
+            }
+        }
+    }
+    return cookieValue;
+}
+
+// Update Status
+function setStatus(online) {
+    document.getElementById('headerStatus').textContent = online ? 'Online' : 'Offline';
+}
+
+// Add Message
+function addMessage(text, isUser) {
+    const msgDiv = document.createElement('div');
+    msgDiv.className = 'message ' + (isUser ? 'user' : 'bot');
+
+    const contentDiv = document.createElement('div');
+    contentDiv.className = 'message-content';
+
+    if (isUser) {
+        contentDiv.textContent = text;
+    } else {
+        contentDiv.innerHTML = text;
+    }
+
+    msgDiv.appendChild(contentDiv);
+    chatMessages.appendChild(msgDiv);
+
+    // If it's a user message, add typing indicator after it
+    if (isUser) {
+        typingIndicator.style.display = 'block';
+        chatMessages.appendChild(typingIndicator);
+    }
+
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+    return contentDiv;
+}
+
+// Show/Hide Typing
+function showTyping() {
+    typingIndicator.style.display = 'block';
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+function hideTyping() {
+    typingIndicator.style.display = 'none';
+}
+
+// Render structured replies (application/vnd.chat+json) into chat HTML
+function esc(value) {
+    return String(value ?? 'N/A').replace(/[&<>"']/g, c => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' }[c]));
+}
+
+function num(value) {
+    return Number(value).toLocaleString('en-US');
+}
+
+const GREETING_FALLBACK = `<div class="ai-response">
+<p><strong>Hello! 👋 I'm Neuro, your banking assistant.</strong></p>
+<p>I can help you find the best loans! Just tell me your salary and loan type.</p>
+<p style="margin-top: 10px; font-size: 13px;"><strong>Example:</strong> "I earn 30000, need car loan"</p>
+</div>`;
+
+const LOAN_GUIDANCE = `<div class="ai-response">
+<p>I'd love to help! Please tell me:</p>
+<ul class="chat-list">
+<li>Your monthly salary (e.g., "I earn 35000")</li>
+<li>What loan you need: Car / Home / Personal</li>
+</ul>
+<p style="margin-top: 10px;"><strong>Example:</strong> "I earn 40000, need home loan"</p>
+</div>`;
+
+// Same text as LOAN_TYPE_GUIDANCE in chat/views.py.
+function loanTypeGuidance(loanType) {
+    return `<div class="ai-response">
+<p>Looking for a ${esc(loanType.toLowerCase())} loan? Tell me your monthly salary and I'll compare the best offers!</p>
+<p style="margin-top: 10px;"><strong>Example:</strong> "I earn 40000"</p>
+</div>`;
+}
+
+const GENERAL_FALLBACK = `<div class="ai-response">
+<p>I'm here to help with loans! 😊 Ask me about car loans, home loans, or personal loans.</p>
+</div>`;
+
+function describeCriteria(criteria) {
+    const labels = { age: v => `age ${v}`, credit_score: v => `credit score ${v}`, employment: v => `${v} employment` };
+    const parts = Object.entries(criteria || {}).map(([name, value]) => labels[name](esc(value)));
+    if (!parts.length) return '';
+    return parts.slice(0, -1).map(p => `, ${p}`).join('') + ` and ${parts[parts.length - 1]}`;
+}
+
+function renderOffers(data) {
+    const best = data.offers[0];
+    const rec = data.recommendation;
+    const rows = data.offers.map((o, i) => `
+    <tr class="${i === 0 ? 'highlight' : ''}">
+        <td>${i + 1}. ${esc(o.bank)}</td>
+        <td class="interest-cell">${esc(o.interest_rate)}%</td>
+        <td>${esc(o.tenure)}</td>
+        <td class="fee-cell">${esc(o.processing_fee)}%</td>
+        <td>₹${esc(o.max_loan_amount)}</td>
+        <td>${o.total_repaid_per_lakh == null ? 'N/A' : `₹${num(o.total_repaid_per_lakh)} (${o.comparison_years} yrs)`}</td>
+    </tr>`).join('');
+    const documents = data.documents.length
+        ? `<ul style='margin: 8px 0; padding-left: 20px;'>${data.documents.map(d => `<li style='margin: 4px 0;'>${esc(d)}</li>`).join('')}</ul>`
+        : 'N/A';
+    const recommendation = rec.total != null
+        ? `${esc(rec.bank)} has the lowest total cost: ${esc(best.interest_rate)}% with a ${esc(best.processing_fee)}% processing fee, an EMI of ₹${num(rec.emi)} and ₹${num(rec.total)} repaid per ₹1,00,000 over ${rec.years} years.
+Your salary of ₹${num(data.salary)} supports an EMI of up to ${rec.emi_percent}% of income, which qualifies you for up to ₹${num(rec.affordable_amount)} over ${rec.max_years} years. 🚀`
+        : `${esc(rec.bank)} is the best match for your profile.
+Your salary of ₹${num(data.salary)} qualifies you for up to ₹${num(rec.affordable_amount)} loan. 🚀`;
+
+    return `<div class="ai-response">
+<p><strong>✅ Best ${esc(data.loan_type)} Loan for You:</strong></p>
+<table class="bank-table">
+<thead>
+<tr><th>Bank</th><th>Interest Rate</th><th>Tenure</th><th>Processing Fee</th><th>Max Loan</th><th>Min Salary</th></tr>
+</thead>
+<tbody>
+<tr class="highlight">
+    <td><strong>${esc(best.bank)}</strong></td>
+    <td class="interest-cell"><strong>${esc(best.interest_rate)}%</strong> (${esc(best.interest_type ?? 'Fixed')})</td>
+    <td>${esc(best.tenure)} years</td>
+    <td class="fee-cell">${esc(best.processing_fee)}%</td>
+    <td>₹${esc(best.max_loan_amount)}</td>
+    <td>₹${esc(best.min_salary)}</td>
+</tr>
+</tbody>
+</table>
+<div class="comparison-section">
+<p><strong>📊 Top ${data.offers.length} ${esc(data.loan_type)} Loans Comparison:</strong></p>
+<table class="bank-table">
+<thead>
+    <tr><th>Bank</th><th>Interest Rate</th><th>Tenure</th><th>Processing Fee</th><th>Max Loan</th><th>Total Repaid per ₹1L</th></tr>
+</thead>
+<tbody>${rows}</tbody>
+</table>
+</div>
+<p><strong>📋 Documents Needed:</strong><br>${documents}</p>
+<p><strong>💡 Recommendation:</strong> ${recommendation}</p>
+<p style="font-size: 12px; color: #666; margin-top: 10px;">
+<i>Note: Rates are subject to change. Contact bank for latest details.</i>
+</p>
+</div>`;
+}
+
+function renderReply(data) {
+    switch (data.type) {
+        case 'offers':
+            return renderOffers(data);
+        case 'no_offers':
+            return `<div class='ai-response'>
+<p><strong>⚠️ No ${esc(data.loan_type).toLowerCase()} loans found matching your salary of ₹${num(data.salary)}${describeCriteria(data.criteria)}.</strong></p>
+<p>Try a different loan type or consider a co-applicant! 😊</p>
+</div>`;
+        case 'guidance':
+            return data.loan_type ? loanTypeGuidance(data.loan_type) : LOAN_GUIDANCE;
+        case 'text':
+            if (data.intent === 'greeting') {
+                return data.text ? `<div class="ai-response">
+<p>${esc(data.text)}</p>
+<p style="margin-top: 12px;"><strong>💡 I can help with:</strong> Car loans, Home loans, Personal loans!</p>
+<p style="font-size: 13px; color: #666;">Try: "I earn 35000, need car loan"</p>
+</div>` : GREETING_FALLBACK;
+            }
+            return data.text ? `<div class="ai-response"><p>${esc(data.text)}</p></div>` : GENERAL_FALLBACK;
+        case 'status':
+            return `<p>✅ ${esc(data.text)}</p>`;
+        default:
+            return `<div class='warning-box'><strong>⚠️ Error:</strong> ${esc(data.error)}</div>`;
+    }
+}
+
+// Stream a reply from /chat-stream/ (NDJSON: {"token"} events, then a final {"data"})
+async function streamReply(msg, csrftoken) {
+    const response = await fetch('/chat-stream/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'application/x-ndjson, application/vnd.chat+json',
+            'X-CSRFToken': csrftoken,
+        },
+        body: JSON.stringify({ message: msg, format: 'json' })
+    });
+
+    // Errors and pings come back as a single structured JSON reply
+    const contentType = response.headers.get('Content-Type') || '';
+    if (!response.body || !contentType.includes('application/x-ndjson')) {
+        const data = await response.json();
+        return { reply: renderReply(data), bubble: null };
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let bubble = null;
+    let reply = null;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            const event = JSON.parse(line);
+            if (event.token !== undefined) {
+                // First token: swap the typing dots for a live bubble
+                if (!bubble) {
+                    hideTyping();
+                    bubble = addMessage('<div class="ai-response"><p></p></div>', false);
+                }
+                bubble.querySelector('p').textContent += event.token;
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            } else if (event.data !== undefined) {
+                reply = renderReply(event.data);
+            }
+        }
+    }
+    return { reply, bubble };
+}
+
+// Send Message to Django Backend
+async function sendMessage() {
+    const msg = userInput.value.trim();
+    if (!msg || sendBtn.disabled) return;
+
+    addMessage(msg, true);
+    userInput.value = '';
+    sendBtn.disabled = true;
+    showTyping();
+
+    try {
+        const csrftoken = getCookie('csrftoken');
+        const { reply, bubble } = await streamReply(msg, csrftoken);
+        hideTyping();
+
+        const html = reply || "<p>I apologize for the inconvenience. Our professional banking service is currently experiencing technical difficulties. Please try again shortly.</p>";
+        if (bubble) {
+            // Replace the raw streamed tokens with the final formatted reply
+            bubble.innerHTML = html;
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+        } else {
+            addMessage(html, false);
+        }
+        setStatus(true);
+
+    } catch (error) {
+        hideTyping();
+        console.error('Error:', error);
+        addMessage('<p>Unable to connect to the service. Please check your connection and try again.</p>', false);
+        setStatus(false);
+    }
+
+    sendBtn.disabled = false;
+    userInput.focus();
+}
+
+// Ask Question
+function askQuestion(q) {
+    userInput.value = q;
+    sendMessage();
+}
+
+// Key Press
+function handleKeyPress(e) {
+    if (e.key === 'Enter') sendMessage();
+}
+
+// Check Health
+async function checkHealth() {
+    try {
+        const csrftoken = getCookie('csrftoken');
+        const response = await fetch('/chat-api/', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': csrftoken,
+            },
+            body: JSON.stringify({ message: 'ping' })
+        });
+        setStatus(response.ok);
+    } catch {
+        setStatus(false);
+    }
+}
+
+// Initialize
+window.addEventListener('load', () => {
+    checkHealth();
+    userInput.focus();
+    hideTyping();
+});
+
+// Periodic check
+setInterval(checkHealth, 30000);
@@ -1,3 +1,1490 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import AsyncClient, Client, RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from chat import ollama, querylog, views
+from chat.admission import AdmissionController
+from chat.affordability import OfferMath
+from chat.cache import ResponseCache, SingleFlight, normalize_message
+from chat.catalog import (
+    LEADERBOARD_SIZE,
+    CatalogLoader,
+    LoanCatalog,
+    _file_digest,
+    employment_types,
+    normalize_employment,
+    read_catalog_csv,
+    split_documents,
+)
+from chat.context import COOKIE_NAME
+from chat.intents import classify, classify_many
+from chat.metrics import CONTENT_TYPE, Histogram
+from chat.middleware import AsyncWhiteNoiseMiddleware
+from chat.model_session import STOP_SEQUENCES, ModelSession, duration_seconds
+from chat.models import ChatQueryHourly, ChatQueryLog
+from chat.ollama import CircuitBreaker
+from chat.semantic import FAQ_ANSWERS, SemanticIndex
+from chat.snapshot import SnapshotRecords, write_snapshot
+from chat.views import handle_bank_query
+
+CSV_PATH = os.path.join(settings.BASE_DIR, "chat", "bank_loans.csv")
+
+
+RECORD_COLUMNS = [
+    "Bank", "Loan Type", "Interest Rate (%)", "Min Salary", "Tenure", "Processing Fee (%)",
+    "Min Age", "Max Age", "Credit Score Requirement", "Employment Type",
+]
+EMPLOYMENT_CELLS = ("Salaried", "Self-employed", "Salaried/Self-employed", "Business or Salaried")
+
+
+def random_records(count, seed=0):
+    """Catalog rows with a few loan types, repeated rates and missing cells."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        record = {
+            "Bank": f"Bank {i}",
+            "Loan Type": rng.choice(("Car", "Home", "Personal")),
+            "Interest Rate (%)": rng.choice((8.5, 9.0, 9.5, 10.5, 11.0, 12.0)),
+            "Min Salary": rng.choice((10000, 15000, 25000, 40000, 60000)),
+            "Tenure": rng.choice(("1-5", "1-7", "5-20")),
+            "Processing Fee (%)": rng.choice((0.5, 1, 2)),
+            "Min Age": rng.choice((18, 21, 23, 25)),
+            "Max Age": rng.choice((55, 58, 60, 65)),
+            "Credit Score Requirement": rng.choice((650, 700, 720, 750)),
+            "Employment Type": rng.choice(EMPLOYMENT_CELLS),
+        }
+        for column in ("Interest Rate (%)", "Min Salary", "Min Age", "Max Age", "Credit Score Requirement",
+                       "Employment Type"):
+            if rng.random() < 0.1:
+                del record[column]
+        records.append(record)
+    return records
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+# ==================== CLASSIFIER ====================
+# The keyword checks classify() replaced, as they were in views.py.
+def legacy_extract_salary(text):
+    patterns = [
+        r'earning\s+(\d+)',
+        r'earn[s]?\s+(?:rs\.?|₹)?\s*(\d+)',
+        r'salary[:\s]*(?:rs\.?|₹)?\s*(\d+)',
+        r'(\d{5,6})\s*(?:per\s+month|monthly|salary)?'
+    ]
+    text_lower = text.lower()
+    for pattern in patterns:
+        match = re.search(pattern, text_lower)
+        if match:
+            salary = int(match.group(1))
+            if 'k' in text_lower and salary < 1000:
+                salary *= 1000
+            elif salary < 1000:
+                salary *= 1000
+            return salary
+    return None
+
+
+def legacy_detect_loan_type(text):
+    text_lower = text.lower()
+    if any(word in text_lower for word in ['car', 'vehicle', 'auto', 'buy car']):
+        return "Car"
+    if any(word in text_lower for word in ['home', 'house', 'property', 'housing']):
+        return "Home"
+    if any(word in text_lower for word in ['personal']):
+        return "Personal"
+    return None
+
+
+def legacy_is_greeting(text):
+    greetings = ['hi', 'hello', 'hey', 'good morning', 'good afternoon',
+                 'good evening', 'namaste', 'hola', 'sup', 'yo', 'hii', 'helloo']
+    text_lower = text.lower().strip()
+    text_clean = text_lower.replace('!', '').replace('?', '').replace('.', '').strip()
+    words = text_clean.split()
+    if len(words) <= 3:
+        has_greeting = any(greet == word for greet in greetings for word in words)
+        has_loan_keyword = any(keyword in text_clean for keyword in ['loan', 'emi', 'borrow', 'salary', 'earn', 'need'])
+        return has_greeting and not has_loan_keyword
+    return False
+
+
+def legacy_is_loan_query(text):
+    text_lower = text.lower()
+    has_loan_keyword = any(word in text_lower for word in ['loan', 'emi', 'borrow', 'finance', 'need buy', 'want buy'])
+    has_type = any(word in text_lower for word in ['car', 'home', 'personal', 'vehicle', 'house'])
+    has_salary = any(char.isdigit() for char in text) or any(word in text_lower for word in ['salary', 'earn', 'income'])
+    return (has_loan_keyword or has_type) and has_salary
+
+
+def legacy_intent(text):
+    if legacy_is_greeting(text):
+        return "greeting"
+    if legacy_is_loan_query(text):
+        return "loan"
+    if "all banks" in text.lower() or "compare" in text.lower():
+        return "compare"
+    return "general"
+
+
+CLASSIFIER_MESSAGES = [
+    "hi", "Hello!", "hey there", "good morning", "yo sup", "hi need loan", "hello, earn",
+    "hi.", "ne.ed hi", "hi loa.n", "namaste ji how are you today",
+    "I earn 35000, need car loan", "salary: 25000 home loan", "earning 45 need house loan",
+    "I earn 30k need car", "earns rs 22000 want a home", "personal loan 100000",
+    "I need vehicle loan, salary: 26000", "need personal loan 18000", "compare all banks car 50000",
+    "compare all banks", "which is better, compare", "what is emi?", "scary movie", "loaneed 5",
+    "My income is good, want buy a house", "need buy 2 cars", "finance 40000", "borrow 7 lakh",
+    "auto 12", "property", "tell me a joke", "", "   ", "HOUSING salary ₹ 55000 monthly",
+    "I am 30 years old, cibil 750, self employed, need car loan 60000",
+]
+
+
+def random_messages(count, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [
+        "hi", "hello", "hey", "yo", "need", "loan", "emi", "borrow", "finance", "buy", "want",
+        "car", "home", "house", "personal", "vehicle", "auto", "property", "housing", "salary",
+        "earn", "earning", "earns", "income", "compare", "all", "banks", "rs", "₹", "k", "30k",
+        "45", "25000", "123456", "per month", "monthly", "the", "scary", "homework", "loaneed",
+        "!", "?", ".", ",", ":",
+    ]
+    return [
+        " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 7)))
+        for _ in range(count)
+    ]
+
+
+class ClassifierTests(SimpleTestCase):
+    def assert_matches_legacy(self, message):
+        parsed = classify(message)
+        self.assertEqual(
+            (parsed.intent, parsed.salary, parsed.loan_type, parsed.is_greeting, parsed.is_loan_query),
+            (legacy_intent(message), legacy_extract_salary(message), legacy_detect_loan_type(message),
+             legacy_is_greeting(message), legacy_is_loan_query(message)),
+            message,
+        )
+
+    def test_matches_legacy_keyword_chain(self):
+        for message in CLASSIFIER_MESSAGES:
+            self.assert_matches_legacy(message)
+
+    def test_matches_legacy_keyword_chain_on_random_messages(self):
+        for message in random_messages(3000):
+            self.assert_matches_legacy(message)
+
+    def test_applicant_details(self):
+        parsed = classify("I am 30 years old, cibil 750, self employed, need car loan 60000")
+        self.assertEqual((parsed.age, parsed.credit_score, parsed.employment), (30, 750, "self-employed"))
+        parsed = classify("I earn 40000, need car loan")
+        self.assertEqual((parsed.age, parsed.credit_score, parsed.employment), (None, None, None))
+
+    def test_classify_many_keeps_order(self):
+        messages = CLASSIFIER_MESSAGES + ["need car loan " + "x" * 300 + " 45000"]
+        self.assertEqual(classify_many(messages), [classify(message) for message in messages])
+        self.assertEqual(classify_many(messages)[-1].salary, 45000)
+        self.assertEqual(classify_many([]), [])
+
+
+
+# Other tests' requests would queue query log rows that the background writer
+# flushes after the test database is gone; QueryLogTests turns it back on.
+_query_log_off = mock.patch.object(querylog, "QUERY_LOG_ENABLED", False)
+
+
+# Keep the per-request chat log lines out of the test output.
+_chat_logger = logging.getLogger("chat")
+
+
+def setUpModule():
+    _query_log_off.start()
+    _chat_logger.setLevel(logging.WARNING)
+
+
+def tearDownModule():
+    _query_log_off.stop()
+    _chat_logger.setLevel(settings.CHAT_LOG_LEVEL)
+
+
+# ==================== CATALOG ====================
+class LoanCatalogTests(SimpleTestCase):
+    def setUp(self):
+        self.records = random_records(300)
+        self.catalog = LoanCatalog(RECORD_COLUMNS, self.records)
+
+    def rank_key(self, row_id):
+        rate = self.records[row_id].get("Interest Rate (%)")
+        return (rate is None, self.catalog.terms.rank_key(row_id), rate or 0.0, row_id)
+
+    def brute_force(self, loan_type, salary, limit, age=None, credit_score=None, employment=None):
+        """Best offers by scanning every row: every stated threshold met, cheapest first."""
+        def eligible(record):
+            if record["Loan Type"].lower() != loan_type:
+                return False
+            if salary is not None and record.get("Min Salary", float("inf")) > salary:
+                return False
+            if age is not None and not record.get("Min Age", 0) <= age <= record.get("Max Age", 200):
+                return False
+            if credit_score is not None and record.get("Credit Score Requirement", 0) > credit_score:
+                return False
+            if employment is not None and "Employment Type" in record:
+                return employment in employment_types(record["Employment Type"])
+            return True
+
+        rows = [row_id for row_id, record in enumerate(self.records) if eligible(record)]
+        return [self.records[row_id] for row_id in sorted(rows, key=self.rank_key)[:limit]]
+
+    def test_best_offers_match_a_full_scan(self):
+        for loan_type in ("car", "home", "personal"):
+            for salary in (None, 5000, 10000, 24999, 25000, 40000, 1000000):
+                for limit in (1, 3, LEADERBOARD_SIZE, LEADERBOARD_SIZE + 3):
+                    self.assertEqual(
+                        self.catalog.best_offers(loan_type, salary, limit),
+                        self.brute_force(loan_type, salary, limit),
+                        (loan_type, salary, limit),
+                    )
+
+    def test_eligibility_filters_match_a_full_scan(self):
+        rng = random.Random(1)
+        for _ in range(500):
+            loan_type = rng.choice(("car", "home", "personal"))
+            salary = rng.choice((None, 12000, 25000, 50000))
+            criteria = {
+                "age": rng.choice((None, 19, 22, 57, 62, 70)),
+                "credit_score": rng.choice((None, 640, 700, 760)),
+                "employment": rng.choice((None, "salaried", "self-employed", "Self Employed", "retired")),
+            }
+            limit = rng.choice((1, 3, LEADERBOARD_SIZE, 20))
+            expected = self.brute_force(loan_type, salary, limit, **{
+                **criteria, "employment": criteria["employment"] and normalize_employment(criteria["employment"]),
+            })
+            self.assertEqual(self.catalog.best_offers(loan_type, salary, limit, **criteria), expected,
+                             (loan_type, salary, limit, criteria))
+
+    def test_total_cost_beats_headline_rate(self):
+        records = [
+            {"Bank": "Low rate, high fee", "Loan Type": "Car", "Interest Rate (%)": 9.0,
+             "Processing Fee (%)": 5, "Tenure": "5", "Min Salary": 10000},
+            {"Bank": "No fee", "Loan Type": "Car", "Interest Rate (%)": 9.2,
+             "Processing Fee (%)": 0, "Tenure": "5", "Min Salary": 10000},
+        ]
+        catalog = LoanCatalog(RECORD_COLUMNS, records)
+        self.assertEqual([offer["Bank"] for offer in catalog.best_offers("car", 40000)], ["No fee", "Low rate, high fee"])
+
+    def test_loan_type_is_case_insensitive(self):
+        self.assertEqual(self.catalog.best_offers("CAR", 40000), self.catalog.best_offers("car", 40000))
+        self.assertEqual(self.catalog.count("Car"), sum(r["Loan Type"] == "Car" for r in self.records))
+
+    def test_unknown_loan_type(self):
+        self.assertEqual(self.catalog.best_offers("boat", 40000), [])
+        self.assertEqual(self.catalog.count("boat"), 0)
+
+    def test_old_column_names_are_aliased(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        path = os.path.join(tmp, "old.csv")
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write("Bank Name,Loan_Type,Interest_Rate,Min_Salary\nA,Car,9.5,20000\nB,Car,8.5,30000\n")
+        catalog = LoanCatalog.from_csv(path)
+        self.assertTrue(catalog.has_column("Interest Rate (%)"))
+        self.assertEqual([offer["Bank"] for offer in catalog.best_offers("car", 40000)], ["B", "A"])
+        self.assertEqual([offer["Bank"] for offer in catalog.best_offers("car", 25000)], ["A"])
+
+
+
+class OfferMathTests(SimpleTestCase):
+    @staticmethod
+    def annuity(rate, years):
+        """Closed form: principal repaid by ₹1 of monthly EMI."""
+        monthly = rate / 1200
+        return (1 - (1 + monthly) ** -(12 * years)) / monthly
+
+    def test_quote_matches_the_closed_form(self):
+        catalog = LoanCatalog.from_csv(CSV_PATH)
+        icici = next(r for r in catalog.ranked_rows("car") if catalog.row(r)["Bank"] == "ICICI")
+        quote = catalog.terms.quote(icici)
+        # ICICI car loan: 10.5%, 1% fee, compared over 5 of its 1-7 years.
+        self.assertEqual((quote.years, quote.emi, quote.total, quote.max_years), (5, 2149, 129963, 7))
+        emi = 100000 / self.annuity(10.5, 5)
+        self.assertEqual(quote.emi, round(emi))
+        self.assertEqual(quote.total, round(60 * emi + 1000))
+
+    def test_affordable_matches_the_closed_form_and_is_capped_by_max_loan(self):
+        records = [
+            {"Interest Rate (%)": 12.0, "Tenure": "1-5", "EMI Percentage of Salary": 50, "Max Loan Amount": 5000000},
+            {"Interest Rate (%)": 12.0, "Tenure": "1-5", "EMI Percentage of Salary": 50, "Max Loan Amount": 500000},
+            {"Interest Rate (%)": 9.0, "Tenure": "5-20"},
+        ]
+        terms = OfferMath(records)
+        expected = [
+            20000 * self.annuity(12.0, 5),
+            500000,
+            # No stated cap: half the salary over the longest tenure.
+            20000 * self.annuity(9.0, 20),
+        ]
+        for offer_id, amount in enumerate(expected):
+            self.assertAlmostEqual(float(terms.affordable(offer_id, 40000)), amount, places=4)
+        self.assertEqual(list(terms.affordable([0, 1], [1000000, 1000000])), [5000000, 500000])
+        self.assertEqual(float(terms.affordable(0, 0)), 0.0)
+
+class CatalogLoaderTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.csv_path = os.path.join(self.tmp, "bank_loans.csv")
+        self.snapshot_path = os.path.join(self.tmp, "bank_loans.catalog")
+        shutil.copy(CSV_PATH, self.csv_path)
+
+    def build_snapshot(self):
+        columns, records = read_catalog_csv(self.csv_path)
+        write_snapshot(self.snapshot_path, columns, records, _file_digest(self.csv_path))
+
+    def rewrite_rate(self, bank, loan_type, rate):
+        with open(self.csv_path, encoding="utf-8") as fh:
+            lines = fh.read().splitlines()
+        prefix = f'"{bank}","{loan_type}","'
+        lines = [
+            prefix + f'{rate}"' + line[line.index('"', len(prefix)) + 1:] if line.startswith(prefix) else line
+            for line in lines
+        ]
+        self.write_csv("\n".join(lines) + "\n")
+
+    def write_csv(self, text):
+        with open(self.csv_path, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        # Make sure the (mtime, size) signature moves even on coarse clocks.
+        os.utime(self.csv_path, ns=(time.time_ns(), time.time_ns() + 10**9))
+
+    def test_hot_reload(self):
+        loader = CatalogLoader(self.csv_path, check_interval=0)
+        before = loader.get()
+
+        def sbi_car_rate(catalog):
+            return next(o["Interest Rate (%)"] for o in catalog.best_offers("car", 100000, 10) if o["Bank"] == "SBI")
+
+        old_rate = sbi_car_rate(before)
+        self.assertNotEqual(old_rate, 7.5)
+
+        self.rewrite_rate("SBI", "Car", 7.5)
+        wait_until(lambda: loader.get() is not before)
+
+        after = loader.get()
+        self.assertNotEqual(after.version, before.version)
+        self.assertEqual(sbi_car_rate(after), 7.5)
+        self.assertEqual(after.best_offers("car", 100000, 1)[0]["Bank"], "SBI")
+        # Requests still holding the old snapshot keep seeing the old rates.
+        self.assertEqual(sbi_car_rate(before), old_rate)
+
+    def test_unchanged_content_keeps_the_catalog(self):
+        loader = CatalogLoader(self.csv_path, check_interval=0)
+        before = loader.get()
+        os.utime(self.csv_path, ns=(time.time_ns(), time.time_ns() + 10**9))
+        self.assertIs(loader.reload(), before)
+
+    def test_nothing_is_read_until_first_use(self):
+        with mock.patch.object(LoanCatalog, "from_csv", wraps=LoanCatalog.from_csv) as from_csv:
+            loader = CatalogLoader(self.csv_path, check_interval=60)
+            from_csv.assert_not_called()
+            catalog = loader.get()
+            self.assertIs(loader.preload(), catalog)
+        from_csv.assert_called_once()
+        self.assertFalse(catalog.empty)
+
+    def test_csv_cells_are_typed_like_pandas(self):
+        self.write_csv(
+            "Bank Name,Min_Salary,Max Age,Interest_Rate,Topup,Remarks\n"
+            "A,25000,60,10.5,True,1_000\n"
+            "B,30000,,9,False,-\n"
+        )
+        columns, records = read_catalog_csv(self.csv_path)
+        self.assertEqual(columns, ["Bank", "Min Salary", "Max Age", "Interest Rate (%)", "Topup", "Remarks"])
+        self.assertEqual(records, [
+            {"Bank": "A", "Min Salary": 25000, "Max Age": 60.0, "Interest Rate (%)": 10.5, "Topup": True,
+             "Remarks": "1_000"},
+            {"Bank": "B", "Min Salary": 30000, "Interest Rate (%)": 9.0, "Topup": False, "Remarks": "-"},
+        ])
+        self.assertIs(type(records[0]["Min Salary"]), int)
+
+    def test_snapshot_round_trip_matches_csv(self):
+        self.build_snapshot()
+        from_csv = LoanCatalog.from_csv(self.csv_path, version=_file_digest(self.csv_path))
+        mapped = LoanCatalog.from_snapshot(self.snapshot_path)
+        self.assertEqual(mapped.version, from_csv.version)
+        self.assertEqual(mapped.columns, from_csv.columns)
+        self.assertEqual(len(mapped), len(from_csv))
+        for row_id in range(len(from_csv)):
+            self.assertEqual(dict(mapped.row(row_id)), from_csv.row(row_id))
+        self.assertEqual(sorted(mapped.loan_types()), sorted(from_csv.loan_types()))
+        for loan_type in from_csv.loan_types():
+            for salary in (None, 10000, 25000, 40000, 100000):
+                for criteria in ({}, {"age": 22, "credit_score": 700}, {"employment": "self-employed"}):
+                    self.assertEqual(
+                        mapped.best_offer_ids(loan_type, salary, 5, **criteria),
+                        from_csv.best_offer_ids(loan_type, salary, 5, **criteria),
+                    )
+
+    def test_loader_maps_a_matching_snapshot_and_ignores_a_stale_one(self):
+        self.build_snapshot()
+        loader = CatalogLoader(self.csv_path, check_interval=60, snapshot_path=self.snapshot_path)
+        self.assertIsInstance(loader.get()._records, SnapshotRecords)
+
+        self.rewrite_rate("ICICI", "Car", 9.1)
+        catalog = loader.reload()
+        self.assertEqual(catalog.version, _file_digest(self.csv_path))
+        self.assertIsInstance(catalog._records, list)
+        self.assertEqual(catalog.best_offers("car", 40000, 1)[0]["Interest Rate (%)"], 9.1)
+
+    def test_unreadable_snapshot_falls_back_to_the_csv(self):
+        with open(self.snapshot_path, "wb") as fh:
+            fh.write(b"not a snapshot")
+        catalog = CatalogLoader(self.csv_path, snapshot_path=self.snapshot_path).get()
+        self.assertIsInstance(catalog._records, list)
+        self.assertFalse(catalog.empty)
+
+    def test_build_command(self):
+        call_command("build_loan_catalog", source=self.csv_path, output=self.snapshot_path, stdout=io.StringIO())
+        catalog = CatalogLoader(self.csv_path, snapshot_path=self.snapshot_path).get()
+        self.assertIsInstance(catalog._records, SnapshotRecords)
+
+    def test_failed_parse_keeps_the_previous_catalog(self):
+        loader = CatalogLoader(self.csv_path, check_interval=0)
+        before = loader.get()
+        with open(self.csv_path, "wb") as fh:
+            fh.write(b"Bank,Loan Type\n\xff\xfe,Car\n")
+        self.assertIs(loader.reload(), before)
+
+
+class BankQueryTests(SimpleTestCase):
+    def test_recommends_the_best_eligible_offer(self):
+        reply = handle_bank_query("I earn 40000, need car loan")
+        best = LoanCatalog.from_csv(CSV_PATH).best_offers("car", 40000, 1)[0]
+        self.assertIn(f"<strong>{best['Bank']}</strong>", reply)
+
+    def test_applicant_details_filter_the_offers(self):
+        # HDFC's car loan has a Max Age of 55; the other car offers allow 60.
+        self.assertIn("HDFC", handle_bank_query("I earn 40000, need car loan"))
+        self.assertNotIn("HDFC", handle_bank_query("I am 58 years old, I earn 40000, need car loan"))
+        self.assertIn("No car loans found", handle_bank_query("I am 62 years old, I earn 40000, need car loan"))
+
+    def test_no_eligible_offer(self):
+        self.assertIn("No car loans found", handle_bank_query("I earn 1000, need car loan"))
+
+    def test_needs_a_loan_type(self):
+        self.assertIsNone(handle_bank_query("I earn 40000"))
+
+    def test_needs_a_salary(self):
+        self.assertIsNone(handle_bank_query("I need a car loan"))
+
+
+# ==================== STREAMING ====================
+class ChatStreamTests(SimpleTestCase):
+    def stream(self, message):
+        response = Client().post("/chat-stream/", json.dumps({"message": message}), content_type="application/json")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        return [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+
+    def test_catalog_answer_is_a_single_final_event(self):
+        events = self.stream("I earn 40000, need car loan")
+        self.assertEqual(len(events), 1)
+        self.assertTrue(events[0]["done"])
+        self.assertEqual(events[0]["reply"], handle_bank_query("I earn 40000, need car loan"))
+
+    def test_tokens_then_cleaned_reply(self):
+        tokens = ["Paris", " is the", " capital.", "\nUser: and Spain?"]
+        with mock.patch.object(views, "stream_ollama_response", return_value=iter(tokens)):
+            events = self.stream("what is the capital of france")
+        self.assertEqual([event["token"] for event in events[:-1]], tokens)
+        self.assertTrue(events[-1]["done"])
+        self.assertEqual(events[-1]["reply"], views.wrap_ollama_reply("general", "Paris is the capital."))
+
+    def test_stream_failure_falls_back(self):
+        def broken(message, *args):
+            yield "Par"
+            raise ConnectionError("ollama went away")
+
+        with mock.patch.object(views, "stream_ollama_response", broken):
+            events = self.stream("what is the capital of france")
+        self.assertEqual(events[0], {"token": "Par"})
+        self.assertEqual(events[-1], {"reply": views.GENERAL_FALLBACK, "done": True})
+
+    async def test_asgi_streams_from_an_async_generator(self):
+        async def tokens(message, *args):
+            for token in ("Paris", " is the", " capital."):
+                yield token
+
+        with mock.patch.object(views, "astream_ollama_response", tokens), \
+                mock.patch.object(views, "acached_ollama_reply", mock.AsyncMock(return_value=None)):
+            response = await AsyncClient().post(
+                "/chat-stream/", {"message": "what is the capital of france"}, content_type="application/json",
+            )
+            self.assertTrue(response.is_async)
+            lines = [line async for line in response.streaming_content]
+        events = [json.loads(line) for line in b"".join(lines).decode().splitlines()]
+        self.assertEqual([event["token"] for event in events[:-1]], ["Paris", " is the", " capital."])
+        self.assertEqual(events[-1]["reply"], views.wrap_ollama_reply("general", "Paris is the capital."))
+
+    async def test_asgi_stream_failure_falls_back(self):
+        async def broken(message, *args):
+            yield "Par"
+            raise ConnectionError("ollama went away")
+
+        with mock.patch.object(views, "astream_ollama_response", broken), \
+                mock.patch.object(views, "acached_ollama_reply", mock.AsyncMock(return_value=None)):
+            response = await AsyncClient().post(
+                "/chat-stream/", {"message": "what is the capital of france"}, content_type="application/json",
+            )
+            lines = [line async for line in response.streaming_content]
+        events = [json.loads(line) for line in b"".join(lines).decode().splitlines()]
+        self.assertEqual(events[0], {"token": "Par"})
+        self.assertEqual(events[-1], {"reply": views.GENERAL_FALLBACK, "done": True})
+
+
+# ==================== ASYNC CHAT API ====================
+class AsyncChatApiTests(SimpleTestCase):
+    async def ask(self, message):
+        response = await AsyncClient().post("/chat-api/", {"message": message}, content_type="application/json")
+        return response.status_code, response.json()["reply"]
+
+    def test_view_is_a_coroutine(self):
+        self.assertTrue(asyncio.iscoroutinefunction(views.chat_api))
+
+    async def test_catalog_answer(self):
+        self.assertEqual(
+            await self.ask("I earn 40000, need car loan"),
+            (200, handle_bank_query("I earn 40000, need car loan")),
+        )
+
+    async def test_general_question_awaits_ollama(self):
+        with mock.patch.object(views, "aget_ollama_response", mock.AsyncMock(return_value="Paris.")) as generate:
+            status, reply = await self.ask("what is the capital of france")
+        generate.assert_awaited_once_with("what is the capital of france", "general")
+        self.assertEqual((status, reply), (200, views.wrap_ollama_reply("general", "Paris.")))
+
+    async def test_empty_message(self):
+        status, _ = await self.ask("   ")
+        self.assertEqual(status, 400)
+
+    async def test_async_client_posts_the_blocking_payload(self):
+        seen = []
+
+        def handler(request):
+            seen.append(json.loads(request.content))
+            return httpx.Response(200, json={"response": "Hello!\nUser: more", "done": True})
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with mock.patch.object(ollama, "_loop_client", return_value=client), \
+                mock.patch.object(ollama, "reply_cache", ResponseCache()):
+            reply = await ollama.aget_ollama_response("hi")
+        await client.aclose()
+        self.assertEqual(reply, "Hello!")
+        self.assertEqual(seen, [ollama.build_payload("hi")])
+
+
+# ==================== OLLAMA CIRCUIT BREAKER ====================
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_threshold_and_probes_once(self):
+        breaker = CircuitBreaker(threshold=2, reset_timeout=0)
+        self.assertIs(breaker.allow(), True)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        self.assertEqual(breaker.allow(), CircuitBreaker.PROBE)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.allow(), CircuitBreaker.PROBE)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.times_opened, 2)
+
+    def test_open_until_reset_timeout(self):
+        breaker = CircuitBreaker(threshold=1, reset_timeout=60)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.short_circuited, 1)
+        self.assertGreater(breaker.snapshot()["retry_in_seconds"], 0)
+
+    def test_abandoned_probe_lets_the_next_call_probe(self):
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        permit = breaker.allow()
+        breaker.abandon(permit)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.allow(), CircuitBreaker.PROBE)
+
+    def test_abandoning_a_closed_permit_changes_nothing(self):
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+        breaker.abandon(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_open_breaker_skips_ollama(self):
+        breaker = CircuitBreaker(threshold=1, reset_timeout=60)
+        breaker.record_failure()
+        with mock.patch.object(ollama, "breaker", breaker), mock.patch.object(ollama, "reply_cache", ResponseCache()), \
+                mock.patch.object(ollama._session, "post") as post:
+            self.assertIsNone(ollama.get_ollama_response("hi"))
+            with self.assertRaises(ollama.OllamaUnavailable):
+                next(ollama.stream_ollama_response("hi"))
+        post.assert_not_called()
+
+    @override_settings(MONITORING_API_KEY="test-key")
+    def test_status_endpoint(self):
+        self.assertEqual(Client().get("/ollama-status/").status_code, 401)
+        status = Client().get("/ollama-status/", HTTP_X_API_KEY="test-key").json()
+        self.assertLessEqual({"calls", "pools", "breaker"}, set(status))
+        self.assertEqual(status["breaker"]["state"], ollama.breaker.state)
+
+    def test_status_reports_the_async_pools(self):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        async def request_then_stats():
+            client = ollama._loop_client()
+            await client.get(f"http://127.0.0.1:{server.server_port}/")
+            pools = ollama.ollama_metrics()["async_pools"]
+            await client.aclose()
+            return pools
+
+        with mock.patch.object(ollama, "_async_clients", weakref.WeakKeyDictionary()):
+            pools = asyncio.run(request_then_stats())
+        self.assertEqual(pools, [{
+            "connections_opened": 1, "idle_connections": 1, "requests_in_progress": 0,
+            "max_size": ollama.OLLAMA_POOL_SIZE,
+        }])
+
+
+
+class ShedProbeTests(SimpleTestCase):
+    """A probe that never reaches Ollama must not leave the breaker half-open."""
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+        self.breaker.record_failure()
+        self.admission = AdmissionController(max_concurrency=1, max_queue=1, timeout=0.05)
+        # Every slot is busy, so the probe is shed.
+        self.held = self.admission.acquire("loan")
+        self.addCleanup(self.admission._release)
+        for name, value in (("breaker", self.breaker), ("admission", self.admission)):
+            patcher = mock.patch.object(ollama, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        post = mock.patch.object(ollama, "_post_generate", side_effect=AssertionError("Ollama called"))
+        post.start()
+        self.addCleanup(post.stop)
+
+    def assert_probe_available(self):
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.allow(), CircuitBreaker.PROBE)
+
+    def test_shed_blocking_call(self):
+        self.assertIsNone(ollama._call_ollama("tell me a joke", "general"))
+        self.assert_probe_available()
+
+    def test_shed_stream(self):
+        with self.assertRaises(ollama.OllamaBusy):
+            list(ollama._stream_tokens("tell me a joke", "general"))
+        self.assert_probe_available()
+
+    def test_shed_async_call(self):
+        self.assertIsNone(asyncio.run(ollama._acall_ollama("tell me a joke", "general")))
+        self.assert_probe_available()
+
+    def test_cancelled_async_call(self):
+        self.admission.timeout = 5
+
+        async def cancel_while_queued():
+            task = asyncio.ensure_future(ollama._acall_ollama("tell me a joke", "general"))
+            while not self.admission.stats()["waiting"]["general"]:
+                await asyncio.sleep(0.001)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_while_queued())
+        self.assertEqual(self.admission.stats()["waiting"]["general"], 0)
+        self.assert_probe_available()
+
+# ==================== REPLY CACHE ====================
+class ResponseCacheTests(SimpleTestCase):
+    def test_key_ignores_case_punctuation_and_spacing(self):
+        cache = ResponseCache()
+        self.assertEqual(normalize_message("  Hi!!  THERE 👋"), "hi there")
+        self.assertEqual(cache.key("Hi!!", "tinyllama"), cache.key("hi", "tinyllama"))
+        self.assertNotEqual(cache.key("hi", "tinyllama"), cache.key("hi", "llama3"))
+
+    def test_hit_and_expiry(self):
+        cache = ResponseCache(ttl=60)
+        key = cache.key("hello")
+        with mock.patch("chat.cache.time.monotonic", return_value=1000.0):
+            self.assertIsNone(cache.get(key))
+            cache.set(key, "Hi there!")
+            self.assertEqual(cache.get(key), "Hi there!")
+        with mock.patch("chat.cache.time.monotonic", return_value=1061.0):
+            self.assertIsNone(cache.get(key))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 2, 0))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResponseCache(max_entries=2)
+        for name in ("a", "b"):
+            cache.set(name, name.upper())
+        cache.get("a")
+        cache.set("c", "C")
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), ("A", None, "C"))
+
+    def test_shared_layer_fills_the_local_one(self):
+        writer = ResponseCache(django_alias="default", prefix="test-reply")
+        reader = ResponseCache(django_alias="default", prefix="test-reply")
+        key = writer.key("what is an emi")
+        writer.set(key, "A fixed monthly payment.")
+        self.addCleanup(caches["default"].delete, key)
+        self.assertEqual(reader.get(key), "A fixed monthly payment.")
+        self.assertEqual(reader.get(key), "A fixed monthly payment.")
+        self.assertEqual((reader.stats()["shared_hits"], reader.stats()["hits"]), (1, 1))
+
+    def test_repeated_question_skips_ollama(self):
+        with mock.patch.object(ollama, "reply_cache", ResponseCache()), \
+                mock.patch.object(ollama, "_call_ollama", return_value="Hello!") as call:
+            self.assertEqual(ollama.get_ollama_response("Hello"), "Hello!")
+            self.assertEqual(ollama.get_ollama_response("hello!!"), "Hello!")
+        call.assert_called_once_with("Hello", "general")
+
+
+# ==================== RENDER CACHE ====================
+class RenderCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.catalog = views.CATALOG_LOADER.get()
+        self.catalog.render_cache.clear()
+        self.addCleanup(self.catalog.render_cache.clear)
+
+    def test_salary_is_the_only_thing_substituted(self):
+        # Two salaries that clear the same car offers share one rendered entry.
+        salaries = [s for s in range(30000, 200001, 5000) if self.catalog.best_offer_ids("car", s, 5)]
+        first, second = next(
+            (a, b) for a, b in zip(salaries, salaries[1:])
+            if self.catalog.best_offer_ids("car", a, 5) == self.catalog.best_offer_ids("car", b, 5)
+        )
+        with mock.patch.object(views, "render_loan_fragments", wraps=views.render_loan_fragments) as render:
+            reply_a = handle_bank_query(f"I earn {first}, need car loan")
+            reply_b = handle_bank_query(f"I earn {second}, need car loan")
+        render.assert_called_once()
+        self.assertEqual(len(self.catalog.render_cache), 1)
+
+        head, middle, tail = next(iter(self.catalog.render_cache.values()))
+        self.assertNotIn(views.SALARY_SLOT, head + middle + tail)
+        self.assertNotIn(views.AFFORDABLE_SLOT, head + middle + tail)
+        best = self.catalog.best_offer_ids("car", first, 5)[0]
+        for salary, reply in ((first, reply_a), (second, reply_b)):
+            affordable = int(self.catalog.terms.affordable(best, salary))
+            self.assertEqual(reply, f"{head}{salary:,}{middle}{affordable:,}{tail}")
+        self.assertIn(f"Your salary of ₹{first:,} ", reply_a)
+
+    def test_cached_reply_matches_a_fresh_render(self):
+        handle_bank_query("I earn 40000, need car loan")
+        cached = handle_bank_query("I earn 40000, need car loan")
+        self.assertEqual(len(self.catalog.render_cache), 1)
+        self.catalog.render_cache.clear()
+        self.assertEqual(handle_bank_query("I earn 40000, need car loan"), cached)
+
+
+# ==================== BATCH MATCHING ====================
+@override_settings(BATCH_MATCH_API_KEY="test-key")
+class BatchMatchTests(SimpleTestCase):
+    def post(self, body, content_type="application/json", key="test-key", query=""):
+        headers = {"HTTP_X_API_KEY": key} if key else {}
+        if content_type == "application/json":
+            body = json.dumps(body)
+        return self.client.post(f"/batch-match/{query}", body, content_type=content_type, **headers)
+
+    def expected_banks(self, loan_type, salary, limit=3, **criteria):
+        catalog = views.CATALOG_LOADER.get()
+        return [catalog.row(r)["Bank"] for r in catalog.best_offer_ids(loan_type, salary, limit, **criteria)]
+
+    def test_requires_api_key(self):
+        self.assertEqual(self.post([], key=None).status_code, 401)
+        self.assertEqual(self.post([], key="wrong").status_code, 401)
+        with override_settings(BATCH_MATCH_API_KEY=""):
+            self.assertEqual(self.post([], key="").status_code, 401)
+
+    def test_matches_like_the_chat(self):
+        applicants = [
+            {"salary": 40000, "loan_type": "car"},
+            {"income": "30000", "type": "house"},
+            {"monthly_salary": 100000, "product": "Personal"},
+            {"salary": 30000, "loan_type": "Home", "employment": "self employed"},
+            {"salary": 100000, "loan_type": "personal", "employment": "Salaried", "credit_score": 650},
+        ]
+        response = self.post({"applicants": applicants, "limit": 2})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(
+            [(r["index"], r["loan_type"]) for r in results],
+            [(0, "Car"), (1, "Home"), (2, "Personal"), (3, "Home"), (4, "Personal")],
+        )
+        self.assertEqual([o["bank"] for o in results[0]["offers"]], self.expected_banks("car", 40000, 2))
+        self.assertEqual([o["bank"] for o in results[1]["offers"]], self.expected_banks("home", 30000, 2))
+        self.assertEqual([o["bank"] for o in results[2]["offers"]], self.expected_banks("personal", 100000, 2))
+        self.assertEqual(
+            [o["bank"] for o in results[3]["offers"]],
+            self.expected_banks("home", 30000, 2, employment="self-employed"),
+        )
+        self.assertEqual(
+            [o["bank"] for o in results[4]["offers"]],
+            self.expected_banks("personal", 100000, 2, employment="salaried", credit_score=650),
+        )
+
+    def test_age_and_credit_score_filter(self):
+        catalog = views.CATALOG_LOADER.get()
+
+        def eligible(row):
+            return (
+                float(row["Min Salary"]) <= 26000
+                and float(row["Min Age"]) <= 23 <= float(row["Max Age"])
+                and float(row["Credit Score Requirement"]) <= 720
+            )
+
+        expected = [catalog.row(r)["Bank"] for r in catalog.ranked_rows("car") if eligible(catalog.row(r))][:3]
+        results = self.post([{"salary": 26000, "loan_type": "car", "age": 23, "cibil": 720}]).json()["results"]
+        self.assertEqual([o["bank"] for o in results[0]["offers"]], expected)
+
+    def test_rows_without_salary_or_loan_type_get_an_error(self):
+        results = self.post([{"loan_type": "car"}, {"salary": 40000, "loan_type": "boat"}]).json()["results"]
+        self.assertEqual(results[0]["error"], "missing or invalid salary")
+        self.assertEqual(results[1]["error"], "unknown or missing loan type")
+        self.assertEqual([r["offers"] for r in results], [[], []])
+
+    def test_csv_body(self):
+        response = self.post("salary,loan_type\n40000,car\n15000,personal\n", content_type="text/csv", query="?limit=1")
+        results = response.json()["results"]
+        self.assertEqual([o["bank"] for o in results[0]["offers"]], self.expected_banks("car", 40000, 1))
+        self.assertEqual([o["bank"] for o in results[1]["offers"]], self.expected_banks("personal", 15000, 1))
+
+    def test_invalid_limit(self):
+        for limit in ([2], {"n": 2}, True, 2.5, "two", 0, 11):
+            response = self.post({"applicants": [], "limit": limit})
+            self.assertEqual(response.status_code, 400, limit)
+
+    def test_body_size_cap(self):
+        with mock.patch("chat.views.BATCH_MAX_BYTES", 16):
+            response = self.post([{"salary": 40000, "loan_type": "car"}])
+        self.assertEqual(response.status_code, 413)
+
+    def test_applicant_cap(self):
+        with mock.patch("chat.views.BATCH_MAX_APPLICANTS", 1):
+            response = self.post([{"salary": 40000, "loan_type": "car"}] * 2)
+        self.assertEqual(response.status_code, 413)
+
+
+# ==================== STRUCTURED REPLIES ====================
+class StructuredReplyTests(SimpleTestCase):
+    def ask(self, message, **headers):
+        body = {"message": message}
+        if not headers:
+            body["format"] = "json"
+        # A fresh client each time, so no conversation context carries over.
+        return Client().post("/chat-api/", json.dumps(body), content_type="application/json", **headers)
+
+    def test_offers(self):
+        response = self.ask("I am 30, I earn 40000, need car loan")
+        self.assertEqual(response["Content-Type"], views.STRUCTURED_MEDIA_TYPE)
+        self.assertEqual(response["Vary"], "Accept")
+        reply = response.json()
+        catalog = views.CATALOG_LOADER.get()
+        offer_ids = catalog.best_offer_ids("car", 40000, 5, age=30)
+        self.assertEqual(
+            {key: reply[key] for key in ("type", "intent", "loan_type", "salary", "criteria")},
+            {"type": "offers", "intent": "loan", "loan_type": "Car", "salary": 40000, "criteria": {"age": 30}},
+        )
+        self.assertEqual([offer["bank"] for offer in reply["offers"]], [catalog.row(r)["Bank"] for r in offer_ids])
+        self.assertEqual(reply["recommendation"]["bank"], reply["offers"][0]["bank"])
+        self.assertEqual(
+            reply["recommendation"]["affordable_amount"], int(catalog.terms.affordable(offer_ids[0], 40000))
+        )
+        self.assertTrue(reply["documents"])
+
+    def test_documents_are_split_like_the_html_reply(self):
+        self.assertEqual(split_documents("ID Proof; Salary Slip,  PAN ,"), ["ID Proof", "Salary Slip", "PAN"])
+        self.assertEqual(split_documents(None), [])
+        documents = self.ask("I earn 40000, need car loan").json()["documents"]
+        html = handle_bank_query("I earn 40000, need car loan")
+        self.assertEqual(re.findall(r"<li style='margin: 4px 0;'>([^<]*)</li>", html), documents)
+
+    def test_accept_header(self):
+        response = self.ask("I earn 40000, need car loan", HTTP_ACCEPT=views.STRUCTURED_MEDIA_TYPE)
+        self.assertEqual(response.json()["type"], "offers")
+
+    def test_no_offers_and_guidance(self):
+        self.assertEqual(self.ask("I earn 1000, need car loan").json()["type"], "no_offers")
+        self.assertEqual(self.ask("my salary is good, need a car loan").json(), {"type": "guidance", "intent": "loan"})
+
+    def test_ollama_text(self):
+        with mock.patch.object(views, "aget_ollama_response", mock.AsyncMock(return_value="Paris.")):
+            reply = self.ask("what is the capital of france").json()
+        self.assertEqual(reply, {"type": "text", "intent": "general", "text": "Paris."})
+
+    def test_html_stays_the_default(self):
+        response = self.client.post("/chat-api/", json.dumps({"message": "I earn 40000, need car loan"}),
+                                    content_type="application/json")
+        self.assertEqual(response.json()["reply"], handle_bank_query("I earn 40000, need car loan"))
+
+    def test_stream(self):
+        response = self.client.post(
+            "/chat-stream/", json.dumps({"message": "I earn 40000, need car loan", "format": "json"}),
+            content_type="application/json",
+        )
+        events = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["data"]["type"], "offers")
+        self.assertTrue(events[0]["done"])
+
+
+# ==================== METRICS ====================
+def metric_value(text, series):
+    """Value of one exposition line, e.g. ``chat_stage_seconds_count{stage="catalog"}``; 0 if absent."""
+    for line in text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+@override_settings(MONITORING_API_KEY="test-key")
+class MetricsTests(SimpleTestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("test_seconds", "Test.", ("route",), buckets=(1, 5))
+        for value in (0.5, 3, 10):
+            histogram.observe(value, route="a")
+        self.assertEqual(histogram.render(), [
+            "# HELP test_seconds Test.",
+            "# TYPE test_seconds histogram",
+            'test_seconds_bucket{route="a",le="1.0"} 1',
+            'test_seconds_bucket{route="a",le="5.0"} 2',
+            'test_seconds_bucket{route="a",le="+Inf"} 3',
+            'test_seconds_sum{route="a"} 13.5',
+            'test_seconds_count{route="a"} 3',
+        ])
+
+    def test_endpoint_reports_chat_requests(self):
+        series = (
+            'chat_request_seconds_count{route="chat_api",intent="loan"}',
+            'chat_stage_seconds_count{stage="catalog"}',
+            'chat_stage_seconds_count{stage="classify"}',
+        )
+        before = self.client.get("/metrics/", HTTP_X_API_KEY="test-key").content.decode()
+        self.client.post("/chat-api/", json.dumps({"message": "I earn 40000, need car loan"}),
+                         content_type="application/json")
+        response = self.client.get("/metrics/", HTTP_X_API_KEY="test-key")
+        self.assertEqual(response["Content-Type"], CONTENT_TYPE)
+        after = response.content.decode()
+        for name in series:
+            self.assertEqual(metric_value(after, name), metric_value(before, name) + 1, name)
+        self.assertIn("# TYPE chat_cache_lookups_total counter", after)
+        self.assertIn('chat_cache_lookups_total{cache="classify",result="hit"}', after)
+
+    def test_endpoint_requires_api_key(self):
+        self.assertEqual(self.client.get("/metrics/").status_code, 401)
+        self.assertEqual(self.client.get("/metrics/", HTTP_X_API_KEY="wrong").status_code, 401)
+        with override_settings(MONITORING_API_KEY=""):
+            self.assertEqual(self.client.get("/metrics/", HTTP_X_API_KEY="").status_code, 401)
+
+
+# ==================== CONVERSATION CONTEXT ====================
+class ContextTests(SimpleTestCase):
+    def ask(self, client, message):
+        response = client.post(
+            "/chat-api/", json.dumps({"message": message, "format": "json"}), content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response, response.json()
+
+    def test_follow_up_uses_earlier_salary(self):
+        client = Client()
+        response, first = self.ask(client, "I earn 40000, need car loan")
+        self.assertEqual(first["type"], "offers")
+        self.assertIn(COOKIE_NAME, response.cookies)
+        self.assertTrue(response.cookies[COOKIE_NAME]["httponly"])
+
+        _, follow_up = self.ask(client, "and a home loan for 20 years?")
+        self.assertEqual(follow_up["type"], "offers")
+        self.assertEqual((follow_up["loan_type"], follow_up["salary"]), ("Home", 40000))
+
+    def test_repeated_query_reuses_the_remembered_offers(self):
+        client = Client()
+        _, first = self.ask(client, "I earn 40000, need car loan")
+        with mock.patch.object(LoanCatalog, "best_offer_ids") as best_offer_ids:
+            _, again = self.ask(client, "compare all banks car 40000")
+        best_offer_ids.assert_not_called()
+        self.assertEqual(again["offers"], first["offers"])
+
+    def test_applicant_details_carry_over_to_follow_ups_only(self):
+        client = Client()
+        _, first = self.ask(client, "I am 62 years old, cibil 640, I earn 40000, need car loan")
+        self.assertEqual(first["criteria"], {"age": 62, "credit_score": 640})
+
+        _, follow_up = self.ask(client, "my cibil is 760")
+        self.assertEqual(follow_up["criteria"], {"age": 62, "credit_score": 760})
+
+        _, new_query = self.ask(client, "compare all banks car 50000")
+        _, fresh = self.ask(Client(), "compare all banks car 50000")
+        self.assertEqual(new_query, fresh)
+        _, after = self.ask(client, "and a home loan for 20 years?")
+        self.assertEqual((after["salary"], after.get("criteria")), (50000, fresh.get("criteria")))
+
+    def test_without_context_a_follow_up_asks_for_the_salary(self):
+        _, reply = self.ask(Client(), "and a home loan for 20 years?")
+        self.assertEqual(reply, {"type": "guidance", "intent": "loan"})
+
+    def test_general_questions_still_go_to_ollama(self):
+        client = Client()
+        self.ask(client, "I earn 40000, need car loan")
+        with mock.patch.object(views, "aget_ollama_response", mock.AsyncMock(return_value="Paris.")):
+            _, reply = self.ask(client, "what is the capital of france")
+        self.assertEqual(reply["type"], "text")
+
+    def test_tampered_cookie_is_ignored(self):
+        client = Client()
+        self.ask(client, "I earn 40000, need car loan")
+        client.cookies[COOKIE_NAME] = client.cookies[COOKIE_NAME].value.replace("4", "9")
+        _, reply = self.ask(client, "and a home loan for 20 years?")
+        self.assertEqual(reply["type"], "guidance")
+
+    @override_settings(CHAT_CONTEXT_TTL=0)
+    def test_disabled(self):
+        client = Client()
+        response, _ = self.ask(client, "I earn 40000, need car loan")
+        self.assertNotIn(COOKIE_NAME, response.cookies)
+        _, reply = self.ask(client, "and a home loan for 20 years?")
+        self.assertEqual(reply["type"], "guidance")
+
+
+# ==================== OLLAMA COALESCING ====================
+class SingleFlightTests(SimpleTestCase):
+    def test_followers_share_the_leaders_result(self):
+        flights = SingleFlight()
+        future, leader = flights.join("key")
+        same, follower = flights.join("key")
+        self.assertTrue(leader)
+        self.assertFalse(follower)
+        self.assertIs(same, future)
+
+        flights.finish("key", future, "reply")
+        self.assertEqual(same.result(timeout=0), "reply")
+        _, leader = flights.join("key")
+        self.assertTrue(leader)
+        self.assertEqual(flights.stats(), {"in_flight": 1, "leaders": 2, "followers": 1})
+
+    def test_identical_concurrent_generations_are_coalesced(self):
+        flights = SingleFlight()
+        calls = []
+        release = threading.Event()
+        followers = 4
+
+        def generate(user_message, *args):
+            calls.append(user_message)
+            release.wait(2)
+            return "one reply"
+
+        replies = []
+        with mock.patch.object(ollama, "flights", flights), \
+                mock.patch.object(ollama, "_generate", side_effect=generate), \
+                mock.patch.object(ollama, "cached_ollama_reply", return_value=None):
+            threads = [
+                threading.Thread(target=lambda: replies.append(ollama.get_ollama_response("coalesce me")))
+                for _ in range(followers + 1)
+            ]
+            for thread in threads:
+                thread.start()
+            wait_until(lambda: flights.stats()["followers"] == followers)
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(calls, ["coalesce me"])
+        self.assertEqual(replies, ["one reply"] * (followers + 1))
+        self.assertEqual(flights.stats()["in_flight"], 0)
+
+
+# ==================== OLLAMA ADMISSION ====================
+class AdmissionTests(SimpleTestCase):
+    def test_admits_up_to_max_concurrency(self):
+        controller = AdmissionController(max_concurrency=2, max_queue=0, timeout=0.05)
+        self.assertTrue(controller.acquire().admitted)
+        self.assertTrue(controller.acquire().admitted)
+        ticket = controller.acquire()
+        self.assertFalse(ticket.admitted)
+        self.assertEqual(ticket.outcome, "shed_full")
+
+    def test_waiters_are_served_by_priority(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=4, timeout=2)
+        order = []
+
+        def request(priority):
+            with controller.slot(priority) as ticket:
+                order.append((priority, ticket.outcome))
+
+        with controller.slot("loan"):
+            threads = []
+            for priority in ("greeting", "general", "loan"):
+                thread = threading.Thread(target=request, args=(priority,))
+                thread.start()
+                threads.append(thread)
+                wait_until(lambda: controller.stats()["waiting"][priority] == 1)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, [("loan", "queued"), ("general", "queued"), ("greeting", "queued")])
+        self.assertEqual(controller.stats()["active"], 0)
+
+    def test_full_queue_pushes_out_a_lower_priority_waiter(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=1, timeout=2)
+        controller.acquire("loan")
+        tickets = {}
+        greeting = threading.Thread(target=lambda: tickets.update(greeting=controller.acquire("greeting")))
+        greeting.start()
+        wait_until(lambda: controller.stats()["waiting"]["greeting"] == 1)
+
+        self.assertEqual(controller.acquire("greeting", budget=0.05).outcome, "shed_full")
+        loan = threading.Thread(target=lambda: tickets.update(loan=controller.acquire("loan")))
+        loan.start()
+        greeting.join()
+        self.assertEqual(tickets["greeting"].outcome, "shed_full")
+        controller._release(0.01)
+        loan.join()
+        self.assertEqual(tickets["loan"].outcome, "queued")
+
+    def test_sheds_after_budget(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=4, timeout=0.05)
+        controller.acquire()
+        ticket = controller.acquire()
+        self.assertEqual(ticket.outcome, "shed_timeout")
+        self.assertEqual(controller.stats()["waiting"]["general"], 0)
+
+    def test_sheds_at_once_when_the_queue_cannot_drain_in_time(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=4, timeout=0.5)
+        controller.service_time = 10.0
+        controller.acquire()
+        started = time.monotonic()
+        self.assertEqual(controller.acquire().outcome, "shed_estimate")
+        self.assertLess(time.monotonic() - started, 0.1)
+
+    def test_shed_generation_falls_back_without_calling_ollama(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=0, timeout=0.05)
+        held = controller.acquire()
+        self.assertTrue(held.admitted)
+        with mock.patch.object(ollama, "admission", controller), \
+                mock.patch.object(ollama, "breaker", CircuitBreaker(threshold=1, reset_timeout=0)), \
+                mock.patch.object(ollama, "reply_cache", ResponseCache()), \
+                mock.patch.object(ollama._session, "post") as post:
+            self.assertIsNone(ollama.get_ollama_response("shed me", "greeting"))
+            with self.assertRaises(ollama.OllamaBusy):
+                list(ollama.stream_ollama_response("shed me too", "greeting"))
+        post.assert_not_called()
+
+    def test_async_waiter(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=4, timeout=2)
+        controller.acquire()
+
+        async def wait_for_slot():
+            waiter = asyncio.ensure_future(controller.aacquire("loan"))
+            while not controller.stats()["waiting"]["loan"]:
+                await asyncio.sleep(0.001)
+            controller._release(0.01)
+            return await waiter
+
+        self.assertEqual(asyncio.run(wait_for_slot()).outcome, "queued")
+
+
+# ==================== OLLAMA MODEL SESSION ====================
+class ModelSessionTests(SimpleTestCase):
+    def session(self, **kwargs):
+        self.sent = []
+
+        def post(payload):
+            self.sent.append(payload)
+            # Ollama returns the prompt's tokens followed by the one it generated.
+            return {"response": ".", "context": [1, 2, 3, 4, 99], "eval_count": 1, "load_duration": 2e9}
+
+        options = {"temperature": 0.7, "num_predict": 120, "num_ctx": 512}
+        return ModelSession(post, "tinyllama", "Be brief.", options, keep_alive="30m",
+                            max_tokens={"greeting": 40}, **kwargs)
+
+    def test_prime_keeps_the_system_prompt_context(self):
+        session = self.session(reuse_context=True)
+        session.prime()
+        self.assertEqual(self.sent[0]["prompt"], "Be brief.\n\n")
+        self.assertTrue(self.sent[0]["raw"])
+        self.assertEqual(self.sent[0]["options"]["num_predict"], 1)
+        self.assertEqual(session.context, [1, 2, 3, 4])
+        self.assertEqual((session.stats()["primes"], session.stats()["cold_loads"]), (1, 1))
+
+    def test_payload_reuses_the_context(self):
+        session = self.session(reuse_context=True)
+        cold = session.payload("hi", kind="greeting")
+        self.assertEqual(cold["prompt"], "Be brief.\n\nUser: hi\nAssistant:")
+        self.assertNotIn("context", cold)
+
+        session.prime()
+        warm = session.payload("what is an emi?", stream=True)
+        self.assertEqual(warm["prompt"], "User: what is an emi?\nAssistant:")
+        self.assertEqual(warm["context"], [1, 2, 3, 4])
+        self.assertTrue(warm["raw"] and warm["stream"])
+        self.assertEqual(warm["keep_alive"], "30m")
+        self.assertEqual(warm["options"]["stop"], list(STOP_SEQUENCES))
+        self.assertEqual((cold["options"]["num_predict"], warm["options"]["num_predict"]), (40, 120))
+
+        session.forget_context()
+        self.assertNotIn("context", session.payload("what is an emi?"))
+
+    def test_without_context_reuse_the_prompt_is_templated(self):
+        session = self.session()
+        session.prime()
+        self.assertNotIn("raw", self.sent[0])
+        payload = session.payload("hi")
+        self.assertIsNone(session.context)
+        self.assertEqual(payload["prompt"], "Be brief.\n\nUser: hi\nAssistant:")
+        self.assertNotIn("raw", payload)
+        self.assertNotIn("stop", payload["options"])
+
+    def test_context_reuse_is_opt_in(self):
+        self.assertFalse(ollama.OLLAMA_REUSE_CONTEXT)
+        self.assertNotIn("raw", ollama.session.payload("hi"))
+
+    def test_warm_up_goes_through_the_breaker(self):
+        breaker = CircuitBreaker(threshold=1, reset_timeout=60)
+        with mock.patch.object(ollama, "breaker", breaker), \
+                mock.patch.object(ollama, "_post_generate", side_effect=ConnectionError("refused")) as post:
+            with self.assertRaises(ConnectionError):
+                ollama._post_warm_up({})
+            self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+            # Open: no more warm-up requests until the reset timeout.
+            with self.assertRaises(ollama.OllamaUnavailable):
+                ollama._post_warm_up({})
+            self.assertEqual(post.call_count, 1)
+
+            breaker.reset_timeout = 0
+            post.side_effect = None
+            post.return_value = {"response": "."}
+            self.assertEqual(ollama._post_warm_up({}), {"response": "."})
+            self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_long_messages_are_cut_to_fit_the_context_window(self):
+        session = self.session()
+        message = session.payload("x" * 5000)["prompt"]
+        self.assertLess(len(message), 512 * 3)
+        self.assertIn("…", message)
+
+    def test_keep_alive_durations(self):
+        self.assertEqual(duration_seconds("30m"), 1800.0)
+        self.assertEqual(duration_seconds("90s"), 90.0)
+        self.assertEqual(duration_seconds(300), 300.0)
+        self.assertIsNone(duration_seconds(-1))
+
+    def test_workers_are_warmed_after_fork_only(self):
+        with mock.patch.object(ollama.os, "register_at_fork") as register, \
+                mock.patch.object(ollama.threading, "Thread") as thread:
+            with mock.patch.object(ollama, "OLLAMA_WARM_INTERVAL", 0):
+                ollama.warm_workers_after_fork()
+            register.assert_not_called()
+            with mock.patch.object(ollama, "OLLAMA_WARM_INTERVAL", 60):
+                ollama.warm_workers_after_fork()
+            register.assert_called_once_with(after_in_child=ollama.warm_model_in_background)
+            thread.assert_not_called()
+
+
+# ==================== SEMANTIC FALLBACK ====================
+class SemanticIndexTests(SimpleTestCase):
+    def test_match_needs_the_threshold(self):
+        index = SemanticIndex([("buy a new car", "loan:Car"), ("what is cibil", "faq:credit_score")], threshold=0.4)
+        self.assertEqual(index.match("I want to buy a new car").label, "loan:Car")
+        self.assertIsNone(index.match("tell me a joke about cats"))
+        strict = SemanticIndex([("buy a new car", "loan:Car")], threshold=1.01)
+        self.assertIsNone(strict.match("buy a new car"))
+
+    def test_match_needs_the_margin_over_other_labels(self):
+        examples = [("loan for my wedding", "loan:Personal"), ("loan for my wedding car", "loan:Car")]
+        self.assertIsNone(SemanticIndex(examples, threshold=0.1, margin=0.5).match("loan for my wedding"))
+        self.assertEqual(
+            SemanticIndex(examples, threshold=0.1, margin=0.0).match("loan for my wedding").label, "loan:Personal"
+        )
+        # Several hits for the same label are not competitors.
+        same = [("loan for my wedding", "loan:Personal"), ("loan for my wedding expenses", "loan:Personal")]
+        self.assertEqual(SemanticIndex(same, threshold=0.1, margin=0.5).match("loan for my wedding").label, "loan:Personal")
+
+    def test_search_is_best_first(self):
+        index = SemanticIndex.build()
+        scores = [hit.score for hit in index.search("which bank is cheapest for a flat")]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(index.search("which bank is cheapest for a flat")[0].label, "loan:Home")
+
+    @mock.patch.object(views, "get_ollama_response")
+    def test_near_miss_question_is_answered_locally(self, ollama_reply):
+        def ask(message):
+            body = json.dumps({"message": message})
+            return Client().post("/chat-api/", body, content_type="application/json").json()["reply"]
+
+        self.assertIn(FAQ_ANSWERS["credit_score"], ask("what is CIBIL?"))
+        self.assertIn("car loan", ask("finance for a vehicle"))
+        ollama_reply.assert_not_called()
+
+
+# ==================== CHAT PAGE ====================
+# Tests don't run collectstatic, so there is no manifest of hashed names.
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+@mock.patch.object(views, "_chat_page", None)
+class ChatPageTests(SimpleTestCase):
+    def test_revalidation_gets_a_304(self):
+        response = Client().get("/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertIn("chat/chat.js", response.content.decode())
+        etag = response["ETag"]
+
+        again = Client().get("/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+        self.assertEqual(Client().get("/", HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+
+# ==================== STATIC FILES ====================
+class AsyncWhiteNoiseTests(SimpleTestCase):
+    @override_settings(WHITENOISE_AUTOREFRESH=True, WHITENOISE_USE_FINDERS=True)
+    async def test_async_mode_serves_files_and_passes_the_rest_on(self):
+        async def view(request):
+            return HttpResponse("view")
+
+        middleware = AsyncWhiteNoiseMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get("/static/chat/chat.css"))
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        with open(os.path.join(settings.BASE_DIR, "chat", "static", "chat", "chat.css"), "rb") as fh:
+            self.assertEqual(body, fh.read())
+        response = await middleware(RequestFactory().get("/chat-api/"))
+        self.assertEqual(response.content, b"view")
+
+
+# ==================== QUERY LOG ====================
+class QueryLogTests(TransactionTestCase):
+    def setUp(self):
+        self.buffer = querylog.QueryLogBuffer(batch_size=2, interval=60, max_rows=100)
+        # No background writer: the tests flush from their own thread.
+        patcher = mock.patch.object(self.buffer, "_ensure_thread")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name, value in (("buffer", self.buffer), ("QUERY_LOG_ENABLED", True)):
+            patcher = mock.patch.object(querylog, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def log(self, message, **notes):
+        querylog.begin()
+        querylog.note(**notes)
+        querylog.record("chat_api", message, classify(message), 0.012)
+
+    def test_flush_writes_buffered_rows_in_batches(self):
+        self.log("I earn 40000, need car loan", bank="ICICI")
+        self.log("hello", cache_hit=True)
+        self.log("what is emi?")
+        self.assertEqual(ChatQueryLog.objects.count(), 0)
+
+        with mock.patch.object(ChatQueryLog.objects, "bulk_create", wraps=ChatQueryLog.objects.bulk_create) as bulk:
+            self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual([len(call.args[0]) for call in bulk.call_args_list], [2, 1])
+        row = ChatQueryLog.objects.get(message="I earn 40000, need car loan")
+        self.assertEqual((row.intent, row.salary, row.loan_type, row.bank), ("loan", 40000, "Car", "ICICI"))
+        self.assertTrue(ChatQueryLog.objects.get(message="hello").cache_hit)
+        self.assertEqual(self.buffer.stats(), {"buffered": 0, "written": 3, "dropped": 0, "failed": 0})
+
+    def test_full_buffer_drops_the_oldest_rows(self):
+        small = querylog.QueryLogBuffer(batch_size=10, interval=60, max_rows=2)
+        with mock.patch.object(small, "_ensure_thread"), mock.patch.object(querylog, "buffer", small):
+            for message in ("one", "two", "three"):
+                self.log(message)
+            self.assertEqual(small.flush(), 2)
+        self.assertEqual(sorted(ChatQueryLog.objects.values_list("message", flat=True)), ["three", "two"])
+        self.assertEqual(small.stats()["dropped"], 1)
+
+    def test_hourly_rollup(self):
+        two_hours_ago = timezone.now() - timedelta(hours=2)
+        for message, latency in (("I earn 40000, need car loan", 10), ("I earn 45000, need car loan", 30),
+                                 ("hello", 5)):
+            parsed = classify(message)
+            ChatQueryLog.objects.create(
+                created_at=two_hours_ago, route="chat_api", message=message, intent=parsed.intent,
+                salary=parsed.salary, loan_type=parsed.loan_type or "", latency_ms=latency,
+            )
+        call_command("rollup_chat_queries", stdout=io.StringIO())
+        rows = {(row.intent, row.salary_band): row for row in ChatQueryHourly.objects.all()}
+        self.assertEqual(set(rows), {("loan", "25k-50k"), ("greeting", "unknown")})
+        loan = rows["loan", "25k-50k"]
+        self.assertEqual((loan.queries, loan.avg_latency_ms, loan.max_latency_ms), (2, 20.0, 30.0))
+
+        # Re-running recomputes nothing new.
+        call_command("rollup_chat_queries", stdout=io.StringIO())
+        self.assertEqual(ChatQueryHourly.objects.count(), 2)
+
+    def test_out_of_range_salary_is_stored_as_unknown(self):
+        self.log("I earn 99999999999999999999, need home loan")
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertIsNone(ChatQueryLog.objects.get().salary)
+
+    def test_a_bad_row_does_not_cost_the_batch(self):
+        self.log("I earn 40000, need car loan")
+        self.buffer.add(ChatQueryLog(route="chat_api", message="bad", intent="loan", salary=10**20, latency_ms=1))
+        self.log("hello")
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(
+            sorted(ChatQueryLog.objects.values_list("message", flat=True)),
+            ["I earn 40000, need car loan", "hello"],
+        )
+        self.assertEqual(self.buffer.stats()["failed"], 1)
+
+    def test_disabled(self):
+        with mock.patch.object(querylog, "QUERY_LOG_ENABLED", False):
+            self.log("hello")
+        self.assertEqual(self.buffer.stats()["buffered"], 0)
@@ -4,4 +4,8 @@ from . import views
 urlpatterns = [
     path('', views.chat_page, name='chat_page'),
     path('chat-api/', views.chat_api, name='chat_api'),  # ← IMPORTANT!
+    path('chat-stream/', views.chat_stream_api, name='chat_stream_api'),
+    path('ollama-status/', views.ollama_status, name='ollama_status'),
+    path('batch-match/', views.batch_match_api, name='batch_match_api'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
\ No newline at end of file
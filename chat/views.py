@@ -1,215 +1,174 @@
-from django.shortcuts import render
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.template.loader import render_to_string
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-import requests
+from django.views.decorators.http import condition
+from django.conf import settings
+import hashlib
+import hmac
 import json
-import pandas as pd
 import logging
 import os
-import re
-import traceback
+import time
+
+from . import querylog
+from .catalog import CatalogLoader, offer_summary, split_documents
+from .context import apply_context, cached_offers, load_context, remember, remember_offers, save_context
+from .intents import classify, classify_cache_info, mentions_loans
+from .logs import sample_request
+from .metrics import (
+    CACHE_LOOKUPS,
+    CONTENT_TYPE,
+    CONTEXT_FOLLOWUPS,
+    REQUEST_SECONDS,
+    SEMANTIC_MATCHES,
+    render_metrics,
+    span,
+)
+from .ollama import (
+    OllamaUnavailable,
+    acached_ollama_reply,
+    aget_ollama_response,
+    astream_ollama_response,
+    cached_ollama_reply,
+    clean_reply,
+    get_ollama_response,
+    ollama_metrics,
+    stream_ollama_response,
+)
+from .semantic import FAQ_ANSWERS, SemanticIndex
 
 logger = logging.getLogger(__name__)
 
 # ==================== BASE DIR ====================
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# ==================== OLLAMA CONFIG ====================
-OLLAMA_API_URL = "http://127.0.0.1:11434/api/generate"
-OLLAMA_MODEL = "tinyllama"
-
-SYSTEM_PROMPT = (
-    "You are Neuro, a friendly banking assistant. "
-    "Reply in a warm, conversational tone. "
-    "Keep responses short (2-4 sentences). "
-    "Use emojis occasionally. "
-    "Never make up bank data."
-)
-
 # ==================== LOAD CSV ====================
 CSV_PATH = os.path.join(BASE_DIR, "chat", "bank_loans.csv")
-try:
-    BANKS_DATA = pd.read_csv(CSV_PATH)
-    print(f"✅ Loaded {len(BANKS_DATA)} bank records")
-    print(f"✅ Columns: {list(BANKS_DATA.columns)}")
-except Exception as e:
-    print(f"❌ Error loading CSV: {e}")
-    BANKS_DATA = pd.DataFrame()
+# Indexed on first use (or at server start, see bank_chatbot/asgi.py) so
+# requests never touch a DataFrame; the loader swaps in a rebuilt catalog in
+# the background whenever the CSV changes on disk.
+CATALOG_LOADER = CatalogLoader(
+    getattr(settings, "LOAN_CATALOG_PATH", CSV_PATH),
+    check_interval=getattr(settings, "LOAN_CATALOG_CHECK_INTERVAL", 5.0),
+    snapshot_path=getattr(settings, "LOAN_CATALOG_SNAPSHOT", None),
+)
 
 # ==================== CHAT PAGE ====================
+# The page's CSS and JS are static files (chat/static/chat/), served by
+# WhiteNoise from hashed, precompressed copies with far-future cache headers.
+# What's left is the same for every visitor, so it is rendered once per
+# process and sent with an ETag: repeat visits get a 304 with no body.
+# DEBUG renders it every time so template edits show up at once.
+_chat_page = None  # (body, etag)
+
+def chat_page_content():
+    """The rendered chat page and its ETag."""
+    global _chat_page
+    if _chat_page is None or settings.DEBUG:
+        body = render_to_string("chat.html").encode("utf-8")
+        _chat_page = (body, hashlib.sha1(body).hexdigest())
+    return _chat_page
+
+@condition(etag_func=lambda request: chat_page_content()[1])
 def chat_page(request):
-    return render(request, "chat.html")
+    response = HttpResponse(chat_page_content()[0])
+    # Cache, but check the ETag before every reuse.
+    response["Cache-Control"] = "no-cache"
+    return response
 
 # ==================== HELPER FUNCTIONS ====================
+# Thin wrappers over chat.intents.classify, kept for callers that only need
+# one answer; request handling classifies once and passes the result along.
 def extract_salary(text):
     """Extract salary from text - more robust"""
-    try:
-        patterns = [
-            r'earning\s+(\d+)',
-            r'earn[s]?\s+(?:rs\.?|₹)?\s*(\d+)',
-            r'salary[:\s]*(?:rs\.?|₹)?\s*(\d+)',
-            r'(\d{5,6})\s*(?:per\s+month|monthly|salary)?'
-        ]
-        
-        text_lower = text.lower()
-        for pattern in patterns:
-            match = re.search(pattern, text_lower)
-            if match:
-                salary = int(match.group(1))
-                # Handle 'k' notation
-                if 'k' in text_lower and salary < 1000:
-                    salary *= 1000
-                # If less than 1000, assume it's in thousands
-                elif salary < 1000:
-                    salary *= 1000
-                return salary
-    except Exception as e:
-        print(f"Error extracting salary: {e}")
-    return None
+    return classify(text).salary
 
 def detect_loan_type(text):
     """Detect loan type from text"""
-    try:
-        text_lower = text.lower()
-        if any(word in text_lower for word in ['car', 'vehicle', 'auto', 'buy car']):
-            return "Car"
-        if any(word in text_lower for word in ['home', 'house', 'property', 'housing']):
-            return "Home"
-        if any(word in text_lower for word in ['personal']):
-            return "Personal"
-    except Exception as e:
-        print(f"Error detecting loan type: {e}")
-    return None
+    return classify(text).loan_type
 
 def is_greeting(text):
     """Check if message is just a greeting"""
-    try:
-        greetings = ['hi', 'hello', 'hey', 'good morning', 'good afternoon', 
-                     'good evening', 'namaste', 'hola', 'sup', 'yo', 'hii', 'helloo']
-        text_lower = text.lower().strip()
-        text_clean = text_lower.replace('!', '').replace('?', '').replace('.', '').strip()
-        
-        words = text_clean.split()
-        if len(words) <= 3:
-            has_greeting = any(greet == word for greet in greetings for word in words)
-            has_loan_keyword = any(keyword in text_clean for keyword in ['loan', 'emi', 'borrow', 'salary', 'earn', 'need'])
-            return has_greeting and not has_loan_keyword
-    except Exception as e:
-        print(f"Error in greeting check: {e}")
-    return False
+    return classify(text).is_greeting
 
 def is_loan_query(text):
     """Check if message is about loans"""
-    try:
-        text_lower = text.lower()
-        has_loan_keyword = any(word in text_lower for word in ['loan', 'emi', 'borrow', 'finance', 'need buy', 'want buy'])
-        has_type = any(word in text_lower for word in ['car', 'home', 'personal', 'vehicle', 'house'])
-        has_salary = any(char.isdigit() for char in text) or any(word in text_lower for word in ['salary', 'earn', 'income'])
-        
-        return (has_loan_keyword or has_type) and has_salary
-    except Exception as e:
-        print(f"Error in loan query check: {e}")
-    return False
-
-# ==================== CSV LOGIC ====================
-def handle_bank_query(user_message):
-    """Handle bank queries with CSV data - WITH TABLES"""
-    try:
-        if BANKS_DATA.empty:
-            print("❌ BANKS_DATA is empty!")
-            return None
-        
-        salary = extract_salary(user_message)
-        loan_type = detect_loan_type(user_message)
-        
-        print(f"🔍 Extracted - Salary: {salary}, Loan Type: {loan_type}")
-
-        if not loan_type:
-            print("❌ No loan type detected")
-            return None
-
-        # Filter by loan type - handle both column name possibilities
-        if "Loan_Type" in BANKS_DATA.columns:
-            df = BANKS_DATA[BANKS_DATA["Loan_Type"].str.lower() == loan_type.lower()].copy()
-        elif "Loan Type" in BANKS_DATA.columns:
-            df = BANKS_DATA[BANKS_DATA["Loan Type"].str.lower() == loan_type.lower()].copy()
-        else:
-            print(f"❌ Loan type column not found! Available columns: {list(BANKS_DATA.columns)}")
-            return None
-
-        print(f"📊 Found {len(df)} loans of type {loan_type}")
-
-        # Filter by salary if provided
-        if salary:
-            if "Min_Salary" in df.columns:
-                df = df[pd.to_numeric(df["Min_Salary"], errors='coerce') <= salary]
-            elif "Min Salary" in df.columns:
-                df = df[pd.to_numeric(df["Min Salary"], errors='coerce') <= salary]
-
-        if df.empty:
-            print(f"❌ No loans found matching criteria")
-            return f"""<div class='ai-response'>
-<p><strong>⚠️ No {loan_type.lower()} loans found matching your salary of ₹{salary:,}.</strong></p>
-<p>Try a different loan type or consider a co-applicant! 😊</p>
-</div>"""
-
-        # Sort by interest rate
-        interest_col = "Interest_Rate" if "Interest_Rate" in df.columns else "Interest Rate (%)"
-        if interest_col in df.columns:
-            df = df.sort_values(by=interest_col)
-        best = df.iloc[0]
-        
-        print(f"✅ Best loan found: {best.get('Bank', 'Unknown Bank')}")
-
-        # Build response with safe column access
-        def safe_get(row, *possible_names, default="N/A"):
-            for name in possible_names:
-                if name in row and pd.notna(row[name]):
-                    return row[name]
-            return default
-
-        # Create table for best loan details
-        bank_name = safe_get(best, "Bank")
-        interest_rate = safe_get(best, "Interest_Rate", "Interest Rate (%)")
-        interest_type = safe_get(best, "Interest_Type", "Interest Type", default="Fixed")
-        tenure = safe_get(best, "Tenure")
-        processing_fee = safe_get(best, "Processing_Fee", "Processing Fee (%)")
-        max_loan = safe_get(best, "Max_Loan_Amount", "Max Loan Amount")
-        min_salary = safe_get(best, "Min_Salary", "Min Salary")
+    return classify(text).is_loan_query
+
+# ==================== HTML RENDERING ====================
+# Mark where the per-request figures go in a rendered comparison.
+SALARY_SLOT = "\x00salary\x00"
+AFFORDABLE_SLOT = "\x00affordable\x00"
+
+def render_loan_fragments(loan_type, offers, quotes):
+    """Render the comparison for ``offers`` (best first) as (head, middle, tail).
+
+    ``quotes`` are the matching ``affordability.Quote``s (or None). The reply
+    is ``head + salary + middle + affordable amount + tail``; nothing else in
+    it depends on the salary, so the fragments can be cached per offer set.
+    """
+    best = offers[0]
+    best_quote = quotes[0]
+
+    # Build response with safe column access
+    def safe_get(row, *possible_names, default="N/A"):
+        for name in possible_names:
+            if name in row:
+                return row[name]
+        return default
+
+    # Create table for best loan details
+    bank_name = safe_get(best, "Bank")
+    interest_rate = safe_get(best, "Interest Rate (%)")
+    interest_type = safe_get(best, "Interest Type", default="Fixed")
+    tenure = safe_get(best, "Tenure")
+    processing_fee = safe_get(best, "Processing Fee (%)")
+    max_loan = safe_get(best, "Max Loan Amount")
+    min_salary = safe_get(best, "Min Salary")
+    
+    # Create comparison table for top 3-5 loans
+    top_n = len(offers)
+    comparison_rows = ""
+    for i, (bank, quote) in enumerate(zip(offers, quotes)):
+        row_class = "highlight" if i == 0 else ""
+        bank_name_val = safe_get(bank, "Bank")
+        interest_val = safe_get(bank, "Interest Rate (%)")
+        fee_val = safe_get(bank, "Processing Fee (%)")
+        tenure_val = safe_get(bank, "Tenure")
+        max_loan_val = safe_get(bank, "Max Loan Amount")
+        cost_val = f"₹{quote.total:,} ({quote.years} yrs)" if quote else "N/A"
         
-        # Create comparison table for top 3-5 loans
-        top_n = min(5, len(df))
-        comparison_rows = ""
-        for i in range(top_n):
-            bank = df.iloc[i]
-            row_class = "highlight" if i == 0 else ""
-            bank_name_val = safe_get(bank, "Bank", "Bank Name", "Bank")
-            interest_val = safe_get(bank, "Interest_Rate", "Interest Rate (%)")
-            fee_val = safe_get(bank, "Processing_Fee", "Processing Fee (%)")
-            tenure_val = safe_get(bank, "Tenure")
-            max_loan_val = safe_get(bank, "Max_Loan_Amount", "Max Loan Amount")
-            
-            comparison_rows += f"""
+        comparison_rows += f"""
             <tr class="{row_class}">
                 <td>{i+1}. {bank_name_val}</td>
                 <td class="interest-cell">{interest_val}%</td>
                 <td>{tenure_val}</td>
                 <td class="fee-cell">{fee_val}%</td>
                 <td>₹{str(max_loan_val).replace('.0', '')}</td>
+                <td>{cost_val}</td>
             </tr>
             """
 
-        # Create documents list if available
-        documents = safe_get(best, "Required_Documents", "Required Documents")
-        documents_html = ""
-        if documents and documents != "N/A":
-            doc_items = documents.split(",") if "," in documents else [documents]
-            documents_html = "<ul style='margin: 8px 0; padding-left: 20px;'>"
-            for doc in doc_items:
-                documents_html += f"<li style='margin: 4px 0;'>{doc.strip()}</li>"
-            documents_html += "</ul>"
-
-        response = f"""<div class="ai-response">
+    # Create documents list if available
+    documents = safe_get(best, "Required Documents")
+    documents_html = ""
+    if documents and documents != "N/A":
+        documents_html = "<ul style='margin: 8px 0; padding-left: 20px;'>"
+        for doc in split_documents(documents):
+            documents_html += f"<li style='margin: 4px 0;'>{doc}</li>"
+        documents_html += "</ul>"
+
+    # Recommendation from the cost engine: all-in cost at the comparison
+    # tenure, and how much of the loan the salary can service.
+    if best_quote:
+        recommendation = f"""<p><strong>💡 Recommendation:</strong> {bank_name} has the lowest total cost: {interest_rate}% with a {processing_fee}% processing fee, an EMI of ₹{best_quote.emi:,} and ₹{best_quote.total:,} repaid per ₹1,00,000 over {best_quote.years} years. 
+Your salary of ₹{SALARY_SLOT} supports an EMI of up to {best_quote.emi_percent:g}% of income, which qualifies you for up to ₹{AFFORDABLE_SLOT} over {best_quote.max_years} years. 🚀</p>"""
+    else:
+        recommendation = f"""<p><strong>💡 Recommendation:</strong> {bank_name} is the best match for your profile. 
+Your salary of ₹{SALARY_SLOT} qualifies you for up to ₹{AFFORDABLE_SLOT} loan. 🚀</p>"""
+
+    response = f"""<div class="ai-response">
 <p><strong>✅ Best {loan_type} Loan for You:</strong></p>
 
 <table class="bank-table">
@@ -245,6 +204,7 @@ def handle_bank_query(user_message):
                 <th>Tenure</th>
                 <th>Processing Fee</th>
                 <th>Max Loan</th>
+                <th>Total Repaid per ₹1L</th>
             </tr>
         </thead>
         <tbody>
@@ -256,86 +216,208 @@ def handle_bank_query(user_message):
 <p><strong>📋 Documents Needed:</strong><br>
 {documents_html if documents_html else documents}</p>
 
-<p><strong>💡 Recommendation:</strong> {bank_name} offers the best rate at {interest_rate}%. 
-Your salary of ₹{salary:,} qualifies you for up to ₹{str(max_loan).replace('.0', '')} loan. 🚀</p>
+{recommendation}
 
 <p style="font-size: 12px; color: #666; margin-top: 10px;">
     <i>Note: Rates are subject to change. Contact bank for latest details.</i>
 </p>
 </div>"""
-        
-        return response
+    
+    head, rest = response.split(SALARY_SLOT)
+    middle, tail = rest.split(AFFORDABLE_SLOT)
+    return head, middle, tail
 
-    except Exception as e:
-        print(f"❌ ERROR in handle_bank_query: {e}")
-        print(f"❌ Full traceback: {traceback.format_exc()}")
+def describe_criteria(criteria):
+    """ ", age 62 and credit score 640" for the details the user gave, else ""."""
+    labels = {"age": "age {}", "credit_score": "credit score {}", "employment": "{} employment"}
+    parts = [labels[name].format(value) for name, value in criteria.items() if value is not None]
+    return "".join(f", {part}" for part in parts[:-1]) + (f" and {parts[-1]}" if parts else "")
+
+# ==================== CSV LOGIC ====================
+@span("catalog")
+def match_offers(parsed, context=None):
+    """Find the best offers for a classified loan message.
+
+    Returns ``(catalog, offer_ids, criteria)``, or None when the CSV can't
+    answer (empty catalog, no loan type, missing column). Shared by the HTML
+    and structured replies. With a conversation ``context``, a repeat of the
+    previous query reuses its offers and a new one is remembered.
+    """
+    catalog = CATALOG_LOADER.get()
+    if catalog.empty:
+        logger.warning("❌ Loan catalog is empty!")
         return None
 
-# ==================== OLLAMA FALLBACK (FIXED) ====================
-def get_ollama_response(user_message):
-    """Get Ollama AI response - FIXED PROMPT & TIMEOUT"""
-    try:
-        payload = {
-            "model": OLLAMA_MODEL,
-            "prompt": f"{SYSTEM_PROMPT}\n\nUser: {user_message}\nAssistant:",
-            "stream": False,
-            "options": {
-                "temperature": 0.7,
-                "num_predict": 120,
-                "num_ctx": 512,
-            }
-        }
+    salary = parsed.salary
+    loan_type = parsed.loan_type
+    
+    criteria = {"age": parsed.age, "credit_score": parsed.credit_score, "employment": parsed.employment}
+
+    logger.debug("🔍 Extracted - Salary: %s, Loan Type: %s", salary, loan_type)
+    if any(value is not None for value in criteria.values()):
+        logger.debug("🔍 Eligibility - Age: %s, Credit Score: %s, Employment: %s", parsed.age, parsed.credit_score, parsed.employment)
+
+    if not loan_type:
+        logger.debug("❌ No loan type detected")
+        return None
 
-        response = requests.post(OLLAMA_API_URL, json=payload, timeout=30)
-        response.raise_for_status()
+    if not catalog.has_column("Loan Type"):
+        logger.error("❌ Loan type column not found! Available columns: %s", catalog.columns)
+        return None
 
-        reply = response.json().get("response", "").strip()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("📊 Found %d loans of type %s", catalog.count(loan_type), loan_type)
+
+    # Best offers by total cost, filtered by salary and any age / credit
+    # score / employment details the user gave
+    query = (loan_type, salary, parsed.age, parsed.credit_score, parsed.employment)
+    offer_ids = cached_offers(context, query, catalog.version)
+    if context is not None:
+        CACHE_LOOKUPS.inc(cache="conversation", result="miss" if offer_ids is None else "hit")
+        if offer_ids is not None:
+            querylog.note(cache_hit=True)
+    if offer_ids is None:
+        offer_ids = catalog.best_offer_ids(loan_type, salary, limit=5, **criteria)
+        if context is not None:
+            remember_offers(context, query, catalog.version, offer_ids)
+    if not offer_ids:
+        logger.debug("❌ No loans found matching criteria")
+    else:
+        bank = catalog.row(offer_ids[0]).get('Bank', 'Unknown Bank')
+        querylog.note(bank=bank)
+        logger.debug("✅ Best loan found: %s", bank)
+    return catalog, offer_ids, criteria
+
+def handle_bank_query(user_message, parsed=None, context=None):
+    """Handle bank queries with CSV data - WITH TABLES"""
+    try:
+        parsed = parsed or classify(user_message)
+        if parsed.salary is None:
+            # Without a salary the user gets guidance (see plan_response).
+            return None
+        match = match_offers(parsed, context)
+        if match is None:
+            return None
+        catalog, offer_ids, criteria = match
+        salary = parsed.salary
+        loan_type = parsed.loan_type
 
-        # 🔥 CLEAN unwanted lines (FIX 1)
-        reply = re.sub(r"(User:.*|Neuro:.*|Assistant:.*)", "", reply, flags=re.IGNORECASE).strip()
+        if not offer_ids:
+            return f"""<div class='ai-response'>
+<p><strong>⚠️ No {loan_type.lower()} loans found matching your salary of ₹{salary:,}{describe_criteria(criteria)}.</strong></p>
+<p>Try a different loan type or consider a co-applicant! 😊</p>
+</div>"""
 
-        return reply if reply else None
+        # Everything but the salary figure depends only on the offer set, so
+        # the rendered fragments live on the catalog snapshot and are dropped
+        # with it when the CSV reloads.
+        with span("render"):
+            key = (loan_type, offer_ids)
+            fragments = catalog.render_cache.get(key)
+            CACHE_LOOKUPS.inc(cache="offer_html", result="miss" if fragments is None else "hit")
+            if fragments is not None:
+                querylog.note(cache_hit=True)
+            else:
+                fragments = render_loan_fragments(
+                    loan_type,
+                    [catalog.row(i) for i in offer_ids],
+                    [catalog.terms.quote(i) for i in offer_ids],
+                )
+                catalog.render_cache[key] = fragments
+            head, middle, tail = fragments
+            affordable = int(catalog.terms.affordable(offer_ids[0], salary))
+
+            return f"{head}{salary:,}{middle}{affordable:,}{tail}"
 
-    except requests.exceptions.Timeout:
-        print(f"❌ Ollama timeout (>30 sec)")
-        logger.error("Ollama timeout")
-        return None
     except Exception as e:
-        print(f"❌ Ollama error: {e}")
-        logger.error(f"Ollama error: {e}")
+        logger.exception("❌ ERROR in handle_bank_query: %s", e)
         return None
 
-# ==================== HYBRID RESPONSE ====================
-def generate_response(user_message):
-    """Generate hybrid response with full error handling"""
+# ==================== STRUCTURED REPLIES ====================
+# Clients that send this Accept type (or {"format": "json"}) get compact JSON
+# they render themselves instead of the HTML reply.
+STRUCTURED_MEDIA_TYPE = "application/vnd.chat+json"
+COMPACT_JSON = {"separators": (",", ":"), "ensure_ascii": False}
+
+def wants_structured(request, data=None):
+    return (data or {}).get("format") == "json" or STRUCTURED_MEDIA_TYPE in request.headers.get("Accept", "")
+
+def structured_response(payload, status=200):
+    response = JsonResponse(payload, status=status, content_type=STRUCTURED_MEDIA_TYPE, json_dumps_params=COMPACT_JSON)
+    response["Vary"] = "Accept"
+    return response
+
+def _offer_set_payload(catalog, loan_type, offer_ids):
+    """Salary-independent part of a structured loan reply, cached per offer set."""
+    key = ("json", loan_type, offer_ids)
+    cached = catalog.render_cache.get(key)
+    CACHE_LOOKUPS.inc(cache="offer_json", result="miss" if cached is None else "hit")
+    if cached is not None:
+        querylog.note(cache_hit=True)
+    else:
+        offers = []
+        for row_id in offer_ids:
+            offer = offer_summary(catalog.row(row_id))
+            quote = catalog.terms.quote(row_id)
+            offer["total_repaid_per_lakh"] = quote.total if quote else None
+            offer["comparison_years"] = quote.years if quote else None
+            offers.append(offer)
+        best_quote = catalog.terms.quote(offer_ids[0])
+        documents = catalog.row(offer_ids[0]).get("Required Documents")
+        cached = {
+            "offers": offers,
+            "quote": best_quote._asdict() if best_quote else None,
+            "documents": split_documents(documents),
+        }
+        catalog.render_cache[key] = cached
+    return cached
+
+def loan_payload(user_message, parsed=None, context=None):
+    """Structured counterpart of handle_bank_query (None when the CSV can't answer)."""
     try:
-        print(f"\n📨 Processing message: {user_message}")
-        
-        # 1️⃣ Greeting → Ollama
-        if is_greeting(user_message):
-            print("✅ Detected as greeting")
-            ollama_reply = get_ollama_response(user_message)
-            if ollama_reply:
-                return f"""<div class="ai-response">
-<p>{ollama_reply}</p>
-<p style="margin-top: 12px;"><strong>💡 I can help with:</strong> Car loans, Home loans, Personal loans!</p>
-<p style="font-size: 13px; color: #666;">Try: "I earn 35000, need car loan"</p>
-</div>"""
-            return """<div class="ai-response">
+        parsed = parsed or classify(user_message)
+        if parsed.salary is None:
+            # Same as the HTML reply: without a salary the user gets guidance.
+            return None
+        match = match_offers(parsed, context)
+        if match is None:
+            return None
+        catalog, offer_ids, criteria = match
+        payload = {
+            "intent": parsed.intent,
+            "loan_type": parsed.loan_type,
+            "salary": parsed.salary,
+            "criteria": {name: value for name, value in criteria.items() if value is not None},
+        }
+        if not offer_ids:
+            return {"type": "no_offers", **payload}
+
+        with span("render"):
+            offer_set = _offer_set_payload(catalog, parsed.loan_type, offer_ids)
+            recommendation = {"bank": offer_set["offers"][0]["bank"]}
+            if offer_set["quote"]:
+                recommendation.update(offer_set["quote"])
+            recommendation["affordable_amount"] = int(catalog.terms.affordable(offer_ids[0], parsed.salary))
+            return {
+                "type": "offers",
+                **payload,
+                "offers": offer_set["offers"],
+                "recommendation": recommendation,
+                "documents": offer_set["documents"],
+            }
+
+    except Exception as e:
+        logger.exception("❌ ERROR in loan_payload: %s", e)
+        return None
+
+# ==================== CANNED REPLIES ====================
+GREETING_FALLBACK = """<div class="ai-response">
 <p><strong>Hello! 👋 I'm Neuro, your banking assistant.</strong></p>
 <p>I can help you find the best loans! Just tell me your salary and loan type.</p>
 <p style="margin-top: 10px; font-size: 13px;"><strong>Example:</strong> "I earn 30000, need car loan"</p>
 </div>"""
-        
-        # 2️⃣ Loan Query → CSV with Tables
-        if is_loan_query(user_message):
-            print("✅ Detected as loan query")
-            csv_reply = handle_bank_query(user_message)
-            if csv_reply:
-                return csv_reply
-            
-            print("⚠️ No CSV match, providing guidance")
-            return """<div class="ai-response">
+
+LOAN_GUIDANCE = """<div class="ai-response">
 <p>I'd love to help! Please tell me:</p>
 <ul class="chat-list">
 <li>Your monthly salary (e.g., "I earn 35000")</li>
@@ -343,61 +425,551 @@ def generate_response(user_message):
 </ul>
 <p style="margin-top: 10px;"><strong>Example:</strong> "I earn 40000, need home loan"</p>
 </div>"""
+
+GENERAL_FALLBACK = """<div class="ai-response">
+<p>I'm here to help with loans! 😊 Ask me about car loans, home loans, or personal loans.</p>
+</div>"""
+
+LOAN_TYPE_GUIDANCE = """<div class="ai-response">
+<p>Looking for a {loan_type} loan? Tell me your monthly salary and I'll compare the best offers!</p>
+<p style="margin-top: 10px;"><strong>Example:</strong> "I earn 40000"</p>
+</div>"""
+
+# ==================== SEMANTIC FALLBACK ====================
+SEMANTIC_FALLBACK = getattr(settings, "SEMANTIC_FALLBACK", True)
+# (catalog version, SemanticIndex); rebuilt when the CSV changes
+_semantic_index = (None, None)
+
+def semantic_index(catalog):
+    """The semantic index (see chat.semantic) for the current catalog."""
+    global _semantic_index
+    version, index = _semantic_index
+    if index is None or version != catalog.version:
+        index = SemanticIndex.build(
+            catalog,
+            threshold=getattr(settings, "SEMANTIC_THRESHOLD", 0.4),
+            margin=getattr(settings, "SEMANTIC_MARGIN", 0.08),
+        )
+        _semantic_index = (catalog.version, index)
+        logger.debug("🧭 Semantic index built with %d examples", len(index))
+    return index
+
+def semantic_reply(user_message, parsed, structured=False, context=None, loans_only=False):
+    """Answer a message the keyword rules missed from its nearest known question.
+
+    A loan-type match is answered from the CSV when the salary is known
+    (from this message or earlier ones) and asks for it otherwise; an FAQ
+    match gets its canned answer (unless ``loans_only``). Returns None when
+    nothing is close enough, so the message goes to Ollama.
+    """
+    if not SEMANTIC_FALLBACK:
+        return None
+    with span("semantic"):
+        match = semantic_index(CATALOG_LOADER.get()).match(user_message)
+    if match is None:
+        SEMANTIC_MATCHES.inc(outcome="miss")
+        return None
+    kind, _, value = match.label.partition(":")
+    if loans_only and kind != "loan":
+        SEMANTIC_MATCHES.inc(outcome="miss")
+        return None
+    SEMANTIC_MATCHES.inc(outcome=kind)
+    logger.debug("🧭 Semantic match %s (%.2f, like \"%s\")", match.label, match.score, match.text)
+    if kind == "faq":
+        return finish_ollama_reply("faq", FAQ_ANSWERS[value], structured)
+
+    parsed = parsed._replace(loan_type=value)
+    if context is not None:
+        parsed = apply_context(parsed, context)
+        remember(context, parsed)
+    if parsed.salary is not None:
+        answer = loan_payload if structured else handle_bank_query
+        csv_reply = answer(user_message, parsed._replace(intent="loan", is_loan_query=True), context)
+        if csv_reply:
+            return csv_reply
+    if structured:
+        return {"type": "guidance", "intent": "loan", "loan_type": value}
+    return LOAN_TYPE_GUIDANCE.format(loan_type=value.lower())
+
+# ==================== HYBRID RESPONSE ====================
+def plan_response(user_message, structured=False, context=None):
+    """Decide how to answer a message.
+
+    Returns ``("reply", reply)`` when the CSV or a canned reply answers it,
+    or ``("ollama", kind)`` with kind ``"greeting"``/``"general"`` when the
+    LLM should. ``reply`` is HTML, or a dict when ``structured``. Shared by
+    the blocking and streaming endpoints. ``context`` (see chat.context)
+    fills in details from earlier messages and is updated in place.
+    """
+    logger.debug("📨 Processing message: %s", user_message)
+    with span("classify"):
+        parsed = stated = classify(user_message)
+        if context is not None:
+            merged = apply_context(parsed, context)
+            if merged != parsed:
+                logger.debug("🧠 Follow-up - Salary: %s, Loan Type: %s from earlier messages", merged.salary, merged.loan_type)
+                CONTEXT_FOLLOWUPS.inc(intent=merged.intent)
+            parsed = merged
+            remember(context, parsed)
+    answer = loan_payload if structured else handle_bank_query
+    
+    # 1️⃣ Greeting → Ollama
+    if parsed.intent == "greeting":
+        logger.debug("✅ Detected as greeting")
+        return "ollama", "greeting"
+    
+    # 2️⃣ Loan Query → CSV with Tables
+    if parsed.intent == "loan":
+        logger.debug("✅ Detected as loan query")
+        if stated.loan_type is None:
+            # "I earn 40000, need a loan for my wedding": the loan type is only implied
+            semantic = semantic_reply(user_message, parsed, structured, context, loans_only=True)
+            if semantic:
+                return "reply", semantic
+        csv_reply = answer(user_message, parsed, context)
+        if csv_reply:
+            return "reply", csv_reply
         
-        # 3️⃣ If asking for all banks
-        if "all banks" in user_message.lower() or "compare" in user_message.lower():
-            print("✅ Detected as compare banks query")
-            csv_reply = handle_bank_query(user_message)
-            if csv_reply:
-                return csv_reply
-        
-        # 4️⃣ General Question → Ollama
-        print("✅ Treating as general question")
-        ollama_reply = get_ollama_response(user_message)
+        logger.debug("⚠️ No CSV match, providing guidance")
+        return "reply", {"type": "guidance", "intent": "loan"} if structured else LOAN_GUIDANCE
+    
+    # 3️⃣ If asking for all banks
+    if parsed.intent == "compare":
+        logger.debug("✅ Detected as compare banks query")
+        csv_reply = answer(user_message, parsed, context)
+        if csv_reply:
+            return "reply", csv_reply
+    
+    # 4️⃣ Close to a known question → CSV or canned answer
+    semantic = semantic_reply(user_message, parsed, structured, context)
+    if semantic:
+        return "reply", semantic
+    
+    # 5️⃣ General Question → Ollama
+    logger.debug("✅ Treating as general question")
+    return "ollama", "general"
+
+def wrap_ollama_reply(kind, ollama_reply):
+    """Wrap a cleaned Ollama reply (or None on failure) in the chat HTML."""
+    if kind == "greeting":
         if ollama_reply:
-            return f'<div class="ai-response"><p>{ollama_reply}</p></div>'
-        
-        return """<div class="ai-response">
-<p>I'm here to help with loans! 😊 Ask me about car loans, home loans, or personal loans.</p>
+            return f"""<div class="ai-response">
+<p>{ollama_reply}</p>
+<p style="margin-top: 12px;"><strong>💡 I can help with:</strong> Car loans, Home loans, Personal loans!</p>
+<p style="font-size: 13px; color: #666;">Try: "I earn 35000, need car loan"</p>
 </div>"""
+        return GREETING_FALLBACK
+    
+    if ollama_reply:
+        return f'<div class="ai-response"><p>{ollama_reply}</p></div>'
+    return GENERAL_FALLBACK
+
+def ollama_priority(user_message, kind, context=None):
+    """Admission priority (see chat.admission) for a message going to Ollama.
+
+    Questions about loans, or from someone already discussing one, are
+    served before other general questions, and small talk goes last.
+    """
+    if kind == "greeting":
+        return "greeting"
+    if context or mentions_loans(user_message):
+        return "loan"
+    return "general"
+
+def finish_ollama_reply(kind, ollama_reply, structured=False):
+    """HTML via wrap_ollama_reply, or ``{"type": "text"}`` (text None = use the fallback)."""
+    if structured:
+        return {"type": "text", "intent": kind, "text": ollama_reply or None}
+    return wrap_ollama_reply(kind, ollama_reply)
+
+def error_reply(e, structured=False):
+    if structured:
+        return {"type": "error", "error": str(e)}
+    return f"<div class='warning-box'><strong>Error:</strong> {str(e)}</div>"
+
+def generate_response(user_message, structured=False, context=None):
+    """Generate hybrid response with full error handling"""
+    try:
+        action, value = plan_response(user_message, structured, context)
+        if action == "reply":
+            return value
+        priority = ollama_priority(user_message, value, context)
+        return finish_ollama_reply(value, get_ollama_response(user_message, priority), structured)
         
     except Exception as e:
-        print(f"❌ ERROR in generate_response: {e}")
-        print(f"❌ Full traceback: {traceback.format_exc()}")
-        return f"<div class='warning-box'><strong>Error:</strong> {str(e)}</div>"
+        logger.exception("❌ ERROR in generate_response: %s", e)
+        return error_reply(e, structured)
+
+async def agenerate_response(user_message, structured=False, context=None):
+    """Async generate_response: the CSV path runs inline, only Ollama is awaited"""
+    try:
+        action, value = plan_response(user_message, structured, context)
+        if action == "reply":
+            return value
+        priority = ollama_priority(user_message, value, context)
+        return finish_ollama_reply(value, await aget_ollama_response(user_message, priority), structured)
+        
+    except Exception as e:
+        logger.exception("❌ ERROR in agenerate_response: %s", e)
+        return error_reply(e, structured)
+
+def stream_response(user_message, structured=False, sampled=None, context=None, log_entry=None, asynchronous=False):
+    """NDJSON events for the streaming endpoint.
+
+    Ollama tokens are forwarded as ``{"token": "..."}`` as soon as they
+    arrive; the last event is always ``{"reply": "<html>", "done": true}``
+    with the cleaned, fully wrapped answer the client should keep, or
+    ``{"data": {...}, "done": true}`` when ``structured``.
+
+    The reply is planned before the first event, so ``context`` is already
+    updated when the view sets its cookie; only the Ollama generation is
+    streamed. ``sampled`` carries the view's log-sampling decision and
+    ``log_entry`` its query log entry (see chat.querylog) into the generator.
+    With ``asynchronous`` the events come from an async generator, which
+    Django streams under ASGI (it buffers sync generators there).
+    """
+    started = time.perf_counter()
+    try:
+        plan = plan_response(user_message, structured, context)
+    except Exception as e:
+        logger.exception("❌ ERROR in stream_response: %s", e)
+        plan = ("reply", error_reply(e, structured))
+    events = _astream_events if asynchronous else _stream_events
+    return events(user_message, structured, plan, sampled, started, context, log_entry)
+
+class _StreamEvents:
+    """Event building shared by the sync and async streaming paths.
+
+    Both paths drive it the same way and differ only in how they look up
+    the cached reply and iterate Ollama's tokens: ``needs_ollama()``, then
+    ``use_cached()``, ``token()`` per token (``failed()`` if the stream
+    breaks), ``final()`` and, whatever happened, ``close()``.
+    """
+
+    def __init__(self, user_message, structured, plan, sampled, started, context, log_entry):
+        # Runs in the generator, i.e. where the response body is produced.
+        sample_request(sampled)
+        querylog.resume(log_entry)
+        self.user_message = user_message
+        self.structured = structured
+        self.started = started
+        self.context = context
+        action, self.value = plan
+        self.reply = self.value if action == "reply" else None
+        self.tokens = []
+        self.stream_failed = False
+
+    def needs_ollama(self):
+        return self.reply is None
+
+    @property
+    def priority(self):
+        return ollama_priority(self.user_message, self.value, self.context)
+
+    def use_cached(self, cached):
+        """Answer with a cached Ollama reply; False if there is none."""
+        if not cached:
+            return False
+        logger.debug("💾 Ollama reply served from cache")
+        querylog.note(cache_hit=True)
+        self.reply = finish_ollama_reply(self.value, cached, self.structured)
+        return True
+
+    def token(self, token):
+        self.tokens.append(token)
+        return json.dumps({"token": token}) + "\n"
+
+    def failed(self, error):
+        if isinstance(error, OllamaUnavailable):
+            logger.info("⚡ %s, using fallback", error)
+        else:
+            logger.error("❌ Ollama stream error: %s", error)
+        self.stream_failed = True
+
+    def final(self, reply=None):
+        if reply is None:
+            reply = self.reply
+        if reply is None:
+            ollama_reply = None if self.stream_failed else clean_reply("".join(self.tokens))
+            reply = finish_ollama_reply(self.value, ollama_reply, self.structured)
+        field = "data" if self.structured else "reply"
+        return json.dumps({field: reply, "done": True}, **(COMPACT_JSON if self.structured else {})) + "\n"
+
+    def error(self, error):
+        logger.exception("❌ ERROR in stream_response: %s", error)
+        return self.final(error_reply(error, self.structured))
+
+    def close(self):
+        observe_request("chat_stream", self.user_message, self.started, self.context)
+
+def _stream_events(user_message, structured, plan, sampled, started, context, log_entry):
+    events = _StreamEvents(user_message, structured, plan, sampled, started, context, log_entry)
+    try:
+        if events.needs_ollama() and not events.use_cached(cached_ollama_reply(events.user_message)):
+            try:
+                for token in stream_ollama_response(events.user_message, events.priority):
+                    yield events.token(token)
+            except Exception as e:
+                events.failed(e)
+        yield events.final()
+    except Exception as e:
+        yield events.error(e)
+    finally:
+        events.close()
+
+async def _astream_events(user_message, structured, plan, sampled, started, context, log_entry):
+    events = _StreamEvents(user_message, structured, plan, sampled, started, context, log_entry)
+    try:
+        if events.needs_ollama() and not events.use_cached(await acached_ollama_reply(events.user_message)):
+            try:
+                async for token in astream_ollama_response(events.user_message, events.priority):
+                    yield events.token(token)
+            except Exception as e:
+                events.failed(e)
+        yield events.final()
+    except Exception as e:
+        yield events.error(e)
+    finally:
+        events.close()
+
+def observe_request(route, user_message, started, context=None):
+    """Record a finished chat request in chat_request_seconds{route, intent} and the query log."""
+    elapsed = time.perf_counter() - started
+    # Memoised by classify, so this is a cache lookup; the context gives
+    # the intent follow-ups were actually answered as.
+    parsed = apply_context(classify(user_message), context)
+    REQUEST_SECONDS.observe(elapsed, route=route, intent=parsed.intent)
+    querylog.record(route, user_message, parsed, elapsed)
+    logger.info("📤 %s reply (%s) in %.1f ms", route, parsed.intent, elapsed * 1000)
 
 # ==================== CHAT API (FIXED) ====================
-@csrf_exempt
-def chat_api(request):
-    """Chat API endpoint with full error handling"""
+async def chat_api(request):
+    """Chat API endpoint with full error handling.
+
+    Async so that under ASGI (see Procfile) a slow Ollama generation only
+    parks a coroutine; CSV-only loan queries never wait behind it. Still
+    works under WSGI, where Django runs it in its own event loop.
+
+    Send ``Accept: application/vnd.chat+json`` or ``"format": "json"`` to
+    get the structured reply (intent, offers, recommendation) instead of HTML.
+    """
+    started = time.perf_counter()
+    sample_request()
+    structured = wants_structured(request)
     try:
         if request.method != 'POST':
+            if structured:
+                return structured_response({"type": "error", "error": "Method not allowed."}, status=405)
             return JsonResponse({"reply": "<p>Method not allowed.</p>"}, status=405)
         
-        data = json.loads(request.body.decode("utf-8"))
+        with span("parse"):
+            data = json.loads(request.body.decode("utf-8"))
+        structured = wants_structured(request, data)
         user_message = data.get("message", "").strip()
         
         if not user_message:
+            if structured:
+                return structured_response({"type": "error", "error": "Please type a message!"}, status=400)
             return JsonResponse({"reply": "<p>Please type a message! 😊</p>"}, status=400)
 
         # 🔧 FIX 3: Handle ping properly (don't send to Ollama)
         if user_message.lower() == "ping":
+            if structured:
+                return structured_response({"type": "status", "text": "Connected"})
             return JsonResponse({"reply": "<p>✅ Connected</p>"})
 
-        print(f"\n{'='*50}")
-        print(f"📥 Received message: {user_message}")
+        logger.info("📥 Received message: %s", user_message)
         
-        response = generate_response(user_message)
+        querylog.begin()
+        context = load_context(request)
+        response = await agenerate_response(user_message, structured, context)
+        observe_request("chat_api", user_message, started, context)
         
-        print(f"📤 Sending response: {response[:100]}...")
-        print(f"{'='*50}\n")
+        if structured:
+            logger.debug("📤 Sending structured response: %s", response.get('type'))
+            return save_context(structured_response(response), context)
+
+        logger.debug("📤 Sending response: %s...", response[:100])
         
-        return JsonResponse({"reply": response})
+        return save_context(JsonResponse({"reply": response}), context)
         
     except Exception as e:
-        print(f"❌ FATAL ERROR in chat_api: {e}")
-        print(f"❌ Full traceback: {traceback.format_exc()}")
-        logger.error(f"Fatal error: {e}")
+        logger.exception("❌ FATAL ERROR in chat_api: %s", e)
+        if structured:
+            return structured_response({"type": "error", "error": f"Server Error: {e}"}, status=500)
         return JsonResponse({
             "reply": f"<div class='warning-box'><strong>⚠️ Server Error:</strong> {str(e)}</div>"
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+# Django 4.2's @csrf_exempt wraps views in a sync function, which would hide
+# that chat_api is a coroutine; set the flag the middleware checks directly.
+chat_api.csrf_exempt = True
+
+# ==================== STREAMING CHAT API ====================
+async def chat_stream_api(request):
+    """Streaming variant of chat_api: NDJSON events, tokens first, final reply last.
+
+    Under ASGI the events come from an async generator reading Ollama with
+    httpx, so tokens reach the client as they are generated without holding
+    a thread; under WSGI a sync generator does the same.
+    """
+    sampled = sample_request()
+    structured = wants_structured(request)
+    try:
+        if request.method != 'POST':
+            if structured:
+                return structured_response({"type": "error", "error": "Method not allowed."}, status=405)
+            return JsonResponse({"reply": "<p>Method not allowed.</p>"}, status=405)
+        
+        with span("parse"):
+            data = json.loads(request.body.decode("utf-8"))
+        structured = wants_structured(request, data)
+        user_message = data.get("message", "").strip()
+        
+        if not user_message:
+            if structured:
+                return structured_response({"type": "error", "error": "Please type a message!"}, status=400)
+            return JsonResponse({"reply": "<p>Please type a message! 😊</p>"}, status=400)
+
+        if user_message.lower() == "ping":
+            if structured:
+                return structured_response({"type": "status", "text": "Connected"})
+            return JsonResponse({"reply": "<p>✅ Connected</p>"})
+
+        logger.info("📥 Received message (stream): %s", user_message)
+
+        log_entry = querylog.begin()
+        context = load_context(request)
+        events = stream_response(
+            user_message, structured, sampled, context, log_entry, asynchronous=isinstance(request, ASGIRequest),
+        )
+        response = StreamingHttpResponse(events, content_type="application/x-ndjson")
+        response["Cache-Control"] = "no-cache"
+        # Stop reverse proxies (nginx) from buffering the token stream.
+        response["X-Accel-Buffering"] = "no"
+        return save_context(response, context)
+        
+    except Exception as e:
+        logger.exception("❌ FATAL ERROR in chat_stream_api: %s", e)
+        if structured:
+            return structured_response({"type": "error", "error": f"Server Error: {e}"}, status=500)
+        return JsonResponse({
+            "reply": f"<div class='warning-box'><strong>⚠️ Server Error:</strong> {str(e)}</div>"
+        }, status=500)
+
+chat_stream_api.csrf_exempt = True
+
+# ==================== BATCH MATCH API ====================
+BATCH_MAX_APPLICANTS = getattr(settings, "BATCH_MATCH_MAX_APPLICANTS", 100000)
+BATCH_MAX_BYTES = getattr(settings, "BATCH_MATCH_MAX_BYTES", 20 * 1024 * 1024)
+BATCH_MAX_LIMIT = 10
+
+def _has_api_key(request, setting):
+    """True if the request's X-API-Key header matches ``settings.<setting>`` (never while it is empty)."""
+    expected = getattr(settings, setting, "")
+    supplied = request.headers.get("X-API-Key", "")
+    return bool(expected) and hmac.compare_digest(supplied.encode(), expected.encode())
+
+def _batch_limit(value):
+    """Offers per applicant from the query string or JSON body (default 3)."""
+    if value is None or value == "":
+        return 3
+    # int() also takes floats and bools; a list would be a TypeError (500).
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError("limit must be an integer")
+    return int(value)
+
+# API-key authenticated, no session cookie, so CSRF doesn't apply.
+@csrf_exempt
+def batch_match_api(request):
+    """Best offers for many applicants at once.
+
+    Accepts a JSON array of applicants, ``{"applicants": [...], "limit": 3}``,
+    a ``text/csv`` body, or a multipart upload in the ``file`` field. Each
+    applicant has ``salary`` and ``loan_type`` and optionally ``age``,
+    ``credit_score`` and ``employment``. Callers authenticate with an
+    ``X-API-Key`` header matching BATCH_MATCH_API_KEY.
+    """
+    if request.method != 'POST':
+        return JsonResponse({"error": "Method not allowed."}, status=405)
+    if not _has_api_key(request, "BATCH_MATCH_API_KEY"):
+        return JsonResponse({"error": "Invalid or missing API key."}, status=401)
+    # The CSV and JSON bodies are read directly (tens of thousands of rows are
+    # well over DATA_UPLOAD_MAX_MEMORY_SIZE), so enforce our own cap first.
+    try:
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        return JsonResponse({"error": "Invalid Content-Length."}, status=400)
+    if length > BATCH_MAX_BYTES:
+        return JsonResponse({"error": f"Request body is larger than {BATCH_MAX_BYTES} bytes"}, status=413)
+    started = time.perf_counter()
+
+    # Imported here so chat workers that never batch don't load NumPy early.
+    from .matching import ApplicantError, match_applicants, parse_applicants_csv
+
+    try:
+        limit = request.GET.get("limit")
+        if "file" in request.FILES:
+            applicants = parse_applicants_csv(request.FILES["file"].read().decode("utf-8-sig"))
+        else:
+            # Content-Length can be absent (chunked bodies): never read past the cap.
+            body = request.read(BATCH_MAX_BYTES + 1)
+            if len(body) > BATCH_MAX_BYTES:
+                return JsonResponse({"error": f"Request body is larger than {BATCH_MAX_BYTES} bytes"}, status=413)
+            if request.content_type == "text/csv":
+                applicants = parse_applicants_csv(body.decode("utf-8-sig"))
+            else:
+                data = json.loads(body.decode("utf-8"))
+                if isinstance(data, dict):
+                    limit = data.get("limit", limit)
+                    applicants = data.get("applicants")
+                else:
+                    applicants = data
+        if not isinstance(applicants, list):
+            raise ApplicantError("expected a list of applicants")
+        limit = _batch_limit(limit)
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({"error": f"Invalid request: {e}"}, status=400)
+
+    if not 1 <= limit <= BATCH_MAX_LIMIT:
+        return JsonResponse({"error": f"limit must be between 1 and {BATCH_MAX_LIMIT}"}, status=400)
+    if len(applicants) > BATCH_MAX_APPLICANTS:
+        return JsonResponse({"error": f"At most {BATCH_MAX_APPLICANTS} applicants per request"}, status=413)
+
+    try:
+        with span("batch_match"):
+            results = match_applicants(CATALOG_LOADER.get(), applicants, limit=limit)
+    except ApplicantError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except Exception as e:
+        logger.exception("❌ ERROR in batch_match_api: %s", e)
+        return JsonResponse({"error": "Server error"}, status=500)
+
+    REQUEST_SECONDS.observe(time.perf_counter() - started, route="batch_match", intent="batch")
+    return JsonResponse({"count": len(results), "results": results})
+
+# ==================== OLLAMA STATUS ====================
+def ollama_status(request):
+    """Connection-pool usage and circuit-breaker state for the Ollama backend.
+
+    Needs an ``X-API-Key`` header matching MONITORING_API_KEY.
+    """
+    if not _has_api_key(request, "MONITORING_API_KEY"):
+        return JsonResponse({"error": "Invalid or missing API key."}, status=401)
+    return JsonResponse(ollama_metrics())
+
+# ==================== METRICS ====================
+# Intent classification is memoised; report its hit ratio with the others.
+CACHE_LOOKUPS.collect_from(lambda: {
+    ("classify", "hit"): classify_cache_info().hits,
+    ("classify", "miss"): classify_cache_info().misses,
+})
+
+def metrics(request):
+    """Prometheus text format: latency histograms, cache and Ollama counters.
+
+    Needs an ``X-API-Key`` header matching MONITORING_API_KEY.
+    """
+    if not _has_api_key(request, "MONITORING_API_KEY"):
+        return JsonResponse({"error": "Invalid or missing API key."}, status=401)
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)